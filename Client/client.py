@@ -1,7 +1,10 @@
 import requests
+import json
 import os
+import sys
 import threading
 import time
+from urllib.parse import urljoin
 from Client.config import Config
 
 
@@ -9,6 +12,8 @@ class CloudComputeClient:
 
 	def __init__(self):
 		self.api_url = Config.API_URL
+		self.stream_url = Config.STREAM_URL
+		self.batch_url = Config.BATCH_URL
 		self.api_key = Config.API_KEY
 		self.tasks_folder = Config.TASKS_FOLDER
 
@@ -28,6 +33,133 @@ class CloudComputeClient:
 
 		return result
 
+	def stream_code(self, file_path, on_event=None):
+		"""
+		Sends a single file to the streaming endpoint, passing every output chunk
+		to `on_event` as soon as it arrives. Returns the final result (errors and files).
+		"""
+		if on_event is None:
+			on_event = self.print_event
+
+		with open(file_path, "rb") as f:
+			files = {"file": f}
+			headers = {"Authorization": f"Bearer {self.api_key}"}
+
+			start_time = time.time()
+			result = {"error": "", "files": []}
+
+			with requests.post(self.stream_url,
+			                   files=files,
+			                   headers=headers,
+			                   stream=True) as response:
+				for line in response.iter_lines(decode_unicode=True):
+					if not line:
+						continue
+
+					event = json.loads(line)
+					if event.get("event") == "done":
+						result = event
+					else:
+						on_event(event)
+
+			end_time = time.time()
+
+		result["execution_time_ms"] = (end_time - start_time) * 1000
+
+		return result
+
+	def download_artifact(self, file, folder):
+		"""
+		Downloads a created file returned by URL into `folder` and returns its path.
+		Files inlined into the result are written from their content.
+		"""
+		path = os.path.join(folder, os.path.basename(file["filename"]))
+
+		if "url" not in file:
+			with open(path, "w", encoding="utf-8") as f:
+				f.write(file["content"])
+			return path
+
+		self._download(file["url"], path)
+		return path
+
+	def download_bundle(self, result, folder):
+		"""Downloads all created files of a result as one .tar.gz into `folder`, returns its path or None."""
+		if not result.get("bundle_url"):
+			return None
+
+		path = os.path.join(folder, os.path.basename(result["bundle_url"]))
+		self._download(result["bundle_url"], path)
+		return path
+
+	def _download(self, url, path):
+		headers = {"Authorization": f"Bearer {self.api_key}"}
+		with requests.get(urljoin(self.api_url, url), headers=headers,
+		                  stream=True) as response:
+			response.raise_for_status()
+			with open(path, "wb") as f:
+				for chunk in response.iter_content(chunk_size=64 * 1024):
+					f.write(chunk)
+
+	def send_batch(self, file_paths=None, on_result=None):
+		"""
+		Sends many files in one request, by default all tasks of TASKS_FOLDER.
+		The server runs them concurrently and returns every result as soon as it is
+		finished, each is passed to `on_result`. Returns the results in the order
+		of `file_paths`.
+		"""
+		if file_paths is None:
+			file_paths = [
+			    os.path.join(self.tasks_folder, file_name)
+			    for file_name in sorted(os.listdir(self.tasks_folder))
+			    if file_name.endswith(".py") and not file_name.startswith(".")
+			]
+		if on_result is None:
+
+			def on_result(result):
+				self.display_result(result["filename"], result)
+
+		results = [None] * len(file_paths)
+		handles = [open(file_path, "rb") for file_path in file_paths]
+		try:
+			files = [("files", (os.path.basename(file_path), handle))
+			         for file_path, handle in zip(file_paths, handles)]
+			headers = {"Authorization": f"Bearer {self.api_key}"}
+
+			start_time = time.time()
+
+			with requests.post(self.batch_url,
+			                   files=files,
+			                   headers=headers,
+			                   stream=True) as response:
+				if response.status_code != 200:
+					return [response.json()] * len(file_paths)
+
+				for line in response.iter_lines(decode_unicode=True):
+					if not line:
+						continue
+
+					result = json.loads(line)
+					if result.get("event") != "result":
+						continue
+
+					# Time until this result arrived, the requests share one round trip
+					result["execution_time_ms"] = (time.time() - start_time) * 1000
+					results[result["index"]] = result
+					on_result(result)
+		finally:
+			for handle in handles:
+				handle.close()
+
+		return results
+
+	@staticmethod
+	def print_event(event):
+		"""Prints an output chunk received from the streaming endpoint."""
+		target = sys.stderr if event.get("event") == "stderr" else sys.stdout
+		target.write(event.get("data", ""))
+		target.flush()
+
 	def display_result(self, file_name, result):
 		"""Formats and prints the execution result in a structured way."""
 		print(f"\n--- Result for {file_name} ---\n")
@@ -40,6 +172,14 @@ class CloudComputeClient:
 			print("Generated Files:")
 
 			for file in result["files"]:
+				if "url" in file:
+					# Stored on the server, downloaded on demand with download_artifact
+					print(f"\nFile: {file['filename']} ({file['size']} bytes, "
+					      f"{file['mime_type']})\n  {urljoin(self.api_url, file['url'])}")
+					if file.get("truncated"):
+						print("  [truncated]")
+					continue
+
 				print(f"\nFile: {file['filename']}\n--- Content ---")
 				content_lines = file["content"].splitlines()
 
@@ -54,16 +194,27 @@ class CloudComputeClient:
 				# Print the lines
 				for line in display_lines:
 					print(line)
+				if file.get("truncated"):
+					print(f"[truncated, {file['size']} bytes in total]")
+
+			if result.get("bundle_url"):
+				print(f"\nAll files: {urljoin(self.api_url, result['bundle_url'])}")
+
+			if result.get("files_omitted"):
+				print(f"\n{result['files_omitted']} more files not returned (size limits)")
 
 			print("\n-------------------\n")
 		else:
 			print("No additional files generated.\n")
 
-		# Output from the executed code
+		# Output from the executed code, interleaved with stderr when the server returns that view
 		if "output" in result:
-			print("Output:")
-
-			output_lines = result["output"].splitlines()
+			if "combined" in result:
+				print("Output (stdout and stderr):")
+				output_lines = result["combined"].splitlines()
+			else:
+				print("Output:")
+				output_lines = result["output"].splitlines()
 
 			if len(output_lines) > 10:
 				display_output = output_lines[:5] + ["..."] + output_lines[-5:]
@@ -81,10 +232,17 @@ class CloudComputeClient:
 
 		# Execution time
 		print(f"Execution time: {result['execution_time_ms']:.2f} ms")
+
+		# Server-side stages, to tell the platform overhead from the run of the code
+		if result.get("timings"):
+			print("Server timings:")
+			for stage, duration in result["timings"].items():
+				print(f"  {stage}: {duration:.2f} ms")
+
 		print("\n======================\n")
 
-	def send_single_task(self, file_path):
-		"""Sends a single specified task file to the server."""
+	def send_single_task(self, file_path, stream=False):
+		"""Sends a single specified task file to the server, optionally streaming its output."""
 		if not os.path.exists(file_path):
 			print(f"Error: File '{file_path}' not found.")
 			return
@@ -92,7 +250,10 @@ class CloudComputeClient:
 		file_name = os.path.basename(file_path)
 
 		print(f"\n--- Sending single task: {file_name} ---\n")
-		result = self.send_code(file_path)
+		if stream:
+			result = self.stream_code(file_path)
+		else:
+			result = self.send_code(file_path)
 		self.display_result(file_name, result)
 
 	def send_sequential(self):
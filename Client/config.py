@@ -1,4 +1,6 @@
 class Config:
 	API_URL = "http://localhost:5000/execute"
+	STREAM_URL = "http://localhost:5000/execute/stream"
+	BATCH_URL = "http://localhost:5000/execute/batch"
 	API_KEY = "my_secret_key"  # API key imitation
 	TASKS_FOLDER = "Tasks"
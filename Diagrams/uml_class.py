@@ -24,16 +24,26 @@ class PythonSecurityChecker {
 
   +__init__()
   +setup(max_file_size : int = 1024 * 1024, is_docker_environment : bool = False) : List[Tuple[str, str]]
+  +check_content(content: str) : CheckResult
+  +scan_file(file_path: str) : CheckResult
   +check_file(file_path: str) : str
   +get_unsafe_operations() : List[Dict[str, Any]]
 
   -_validate_file(file_path: str) : void
   -_detect_unsafe_code(content: str) : Tuple[List[Dict[str, Any]], List[int]]
-  -_create_safe_content(content: str, unsafe_lines: List[int]) : str
+  -_create_safe_content(content: str, unsafe_lines: List[int], unsafe_operations: List[Dict[str, Any]]) : str
   -_is_safe_import(line: str) : bool
   -_create_safe_file(original_path: str, safe_content: str) : str
 }
 
+class CheckResult {
+  +unsafe_operations : Tuple[Dict[str, Any], ...]
+  +unsafe_lines : Tuple[int, ...]
+  +safe_content : str
+  +safe_file_path : Optional[str]
+  +is_safe : bool
+}
+
 class Config {
   +UPLOAD_FOLDER : str = "/uploads"
   +PORT : int = 5000
@@ -70,6 +80,7 @@ CodeExecutionServer o-- "1" PythonSecurityChecker : has
 CodeExecutionServer --> CodeExecutor : calls
 
 CodeExecutor --> PythonSecurityChecker : uses
+PythonSecurityChecker ..> CheckResult : returns
 
 @enduml
 """
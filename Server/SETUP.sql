@@ -9,4 +9,31 @@ BEGIN
         username NVARCHAR(30) NOT NULL UNIQUE,
         api_key NVARCHAR(30) NOT NULL UNIQUE
     );
+END;
+
+IF COL_LENGTH('Users', 'tier') IS NULL
+BEGIN
+    ALTER TABLE Users ADD tier NVARCHAR(20) NOT NULL DEFAULT 'free';
+END;
+
+IF NOT EXISTS (
+    SELECT * FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_NAME = 'ExecutionUsage'
+)
+BEGIN
+    CREATE TABLE ExecutionUsage (
+        id BIGINT IDENTITY(1,1) PRIMARY KEY,
+        key_hash CHAR(64) NOT NULL,
+        tier NVARCHAR(20) NULL,
+        cpu_seconds FLOAT NULL,
+        peak_memory_mb FLOAT NULL,
+        timed_out BIT NOT NULL,
+        accounting_failed BIT NOT NULL DEFAULT 0,
+        created_at DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+    );
+END;
+
+IF COL_LENGTH('ExecutionUsage', 'accounting_failed') IS NULL
+BEGIN
+    ALTER TABLE ExecutionUsage ADD accounting_failed BIT NOT NULL DEFAULT 0;
 END;
\ No newline at end of file
@@ -0,0 +1,243 @@
+import itertools
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, List, Optional
+
+# Marks an argument that was not passed, None is a valid timeout
+_DEFAULT = object()
+
+
+class AdmissionRejected(Exception):
+    """Raised when an execution is not admitted, carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("key", "tag", "seq")
+
+    def __init__(self, key: Hashable, tag: float, seq: int):
+        self.key = key
+        self.tag = tag
+        self.seq = seq
+
+
+class AdmissionController:
+    """
+    Limits the number of executions running at the same time and shares the
+    slots fairly between users.
+    Requests beyond the limit wait in a bounded queue for a free slot, they are
+    rejected right away when the queue is full (429) and after `queue_timeout`
+    seconds of waiting (503), so overload turns into quick rejections instead
+    of hundreds of containers competing for the host.
+    Waiting requests are dispatched by start-time fair queuing: every request
+    gets a virtual start tag after the previous request of the same key, so a
+    key with hundreds of queued requests is served in turn with a key that
+    submits one. Each key is also capped in running and queued requests.
+    """
+
+    # Weight of the latest execution in the moving average of execution times
+    SMOOTHING = 0.2
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queued: int = 32,
+        queue_timeout: float = 30.0,
+        max_concurrent_per_key: Optional[int] = None,
+        max_queued_per_key: Optional[int] = None,
+    ):
+        """
+        Args:
+                max_concurrent (int): Executions allowed to run at the same time
+                max_queued (int): Requests allowed to wait for a slot
+                queue_timeout (float): Seconds a request waits before it is rejected
+                max_concurrent_per_key (int): Executions one key may run at the same time, None for no cap
+                max_queued_per_key (int): Requests one key may have waiting, None for no cap
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+        self.max_concurrent_per_key = (
+            self.max_concurrent if max_concurrent_per_key is None else max(1, max_concurrent_per_key)
+        )
+        self.max_queued_per_key = (
+            self.max_queued if max_queued_per_key is None else max(0, max_queued_per_key)
+        )
+
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._available = threading.Condition(threading.Lock())
+        self._execution_time: Optional[float] = None
+
+        # Fair queuing state: virtual time and per-key bookkeeping
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Hashable, float] = {}
+        self._running: Dict[Hashable, int] = defaultdict(int)
+        self._queued: Dict[Hashable, int] = defaultdict(int)
+        self._sequence = itertools.count()
+
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    @contextmanager
+    def admit(
+        self,
+        key: Hashable = None,
+        weight: float = 1.0,
+        timeout: Any = _DEFAULT,
+        bounded: bool = True,
+    ):
+        """Holds an execution slot for the duration of the `with` block, see `acquire`."""
+        admitted_at = self.acquire(key=key, weight=weight, timeout=timeout, bounded=bounded)
+        try:
+            yield
+        finally:
+            self.release(admitted_at, key=key)
+
+    def acquire(
+        self,
+        key: Hashable = None,
+        weight: float = 1.0,
+        timeout: Any = _DEFAULT,
+        bounded: bool = True,
+    ) -> float:
+        """
+        Waits for an execution slot.
+        Args:
+                key (Hashable): Identity of the requester (API key or client address)
+                weight (float): Share of the slots relative to other keys
+                timeout (float): Seconds to wait, defaults to the queue timeout, None waits forever
+                bounded (bool): False lets the caller wait even if the queues are full
+        Returns:
+                float: Admission time, to be passed to `release`
+        Raises:
+                AdmissionRejected: If the queue is full or the timeout expired
+        """
+        timeout = self.queue_timeout if timeout is _DEFAULT else timeout
+
+        with self._available:
+            if bounded and (
+                len(self._waiters) >= self.max_queued
+                or self._queued[key] >= self.max_queued_per_key
+            ) and not self._can_start_now(key):
+                self.rejected_full += 1
+                self._forget_if_idle(key)
+                raise AdmissionRejected(
+                    "Server is at capacity, retry later", 429, self._retry_after()
+                )
+
+            start = max(self._virtual_time, self._last_finish.get(key, 0.0))
+            self._last_finish[key] = start + 1.0 / max(weight, 1e-6)
+            waiter = _Waiter(key, start, next(self._sequence))
+            self._waiters.append(waiter)
+            self._queued[key] += 1
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            try:
+                while self._next_waiter() is not waiter:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.rejected_timeout += 1
+                        raise AdmissionRejected(
+                            "Timed out waiting for an execution slot, retry later",
+                            503,
+                            self._retry_after(),
+                        )
+                    self._available.wait(remaining)
+            except BaseException:
+                self._dequeue(waiter)
+                self._forget_if_idle(key)
+                self._available.notify_all()
+                raise
+
+            self._dequeue(waiter)
+            self._virtual_time = max(self._virtual_time, waiter.tag)
+            self._active += 1
+            self._running[key] += 1
+            self.admitted += 1
+            # The next waiter may be admitted as well if more slots are free
+            self._available.notify_all()
+            return time.monotonic()
+
+    def release(self, admitted_at: Optional[float] = None, key: Hashable = None) -> None:
+        """
+        Frees an execution slot.
+        Args:
+                admitted_at (float): Value returned by `acquire`, used to estimate Retry-After
+                key (Hashable): Key passed to `acquire`
+        """
+        with self._available:
+            self._active -= 1
+            self._running[key] -= 1
+            self._forget_if_idle(key)
+            if admitted_at is not None:
+                duration = time.monotonic() - admitted_at
+                if self._execution_time is None:
+                    self._execution_time = duration
+                else:
+                    self._execution_time += self.SMOOTHING * (duration - self._execution_time)
+            self._available.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of running and waiting executions and the rejection counters."""
+        with self._available:
+            return {
+                "active": self._active,
+                "queued": len(self._waiters),
+                "keys": len(set(self._running) | set(self._queued)),
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected_full": self.rejected_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_execution_time": self._execution_time,
+            }
+
+    def _can_start_now(self, key: Hashable) -> bool:
+        # A request that would be dispatched immediately never counts as queued
+        return (
+            self._active < self.max_concurrent
+            and self._running[key] < self.max_concurrent_per_key
+            and not any(
+                self._running[w.key] < self.max_concurrent_per_key for w in self._waiters
+            )
+        )
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        # Waiter with the smallest start tag among keys below their cap
+        if self._active >= self.max_concurrent:
+            return None
+        best = None
+        for waiter in self._waiters:
+            if self._running[waiter.key] >= self.max_concurrent_per_key:
+                continue
+            if best is None or (waiter.tag, waiter.seq) < (best.tag, best.seq):
+                best = waiter
+        return best
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self._waiters.remove(waiter)
+        self._queued[waiter.key] -= 1
+
+    def _forget_if_idle(self, key: Hashable) -> None:
+        # Keys without running or queued requests keep no state, their next
+        # request starts at the current virtual time
+        if self._running.get(key, 0) <= 0 and self._queued.get(key, 0) <= 0:
+            self._running.pop(key, None)
+            self._queued.pop(key, None)
+            self._last_finish.pop(key, None)
+
+    def _retry_after(self) -> int:
+        # Time until the queue ahead has drained at the current execution speed
+        if self._execution_time is None:
+            return 1
+        waves = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(self._execution_time * waves))
@@ -0,0 +1,308 @@
+import ast
+import contextlib
+import gc
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Analyses running at once and whether the collector was enabled before the first one
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def _gc_paused() -> Iterator[None]:
+    """
+    Disables the cyclic garbage collector while the block runs. The collector is
+    process-wide, it is re-enabled when the last of overlapping blocks finishes.
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+class AstSecurityAnalyzer:
+    """
+    Security analyzer working on the syntax tree.
+    The file is parsed once and Import/ImportFrom/Call/Attribute/Constant nodes are
+    matched against hash-set lookups built by `PythonSecurityChecker.setup`. The
+    `REGEX_PATTERNS` and `SENSITIVE_DATA_PATTERNS` tables are applied to the
+    candidate lines of the prefilters; their entries without a literal fragment
+    only match quoted strings and are searched on the lines of string literals only.
+    A line with several findings is described by the check the regex engine applies
+    first, so both engines describe a finding alike. They still disagree where the
+    regex engine matches code inside string literals, or substrings of longer names
+    (`start_exec(` as `exec(`), which the syntax tree tells apart.
+    Import aliases are resolved, so `import subprocess as sp; sp.call(...)` is
+    recognized as a subprocess call.
+    """
+
+    # Builtins reported as "Unsafe <name> function call"
+    UNSAFE_BUILTINS = ("eval", "exec", "__import__", "input")
+
+    # Precedence of the checks, in the order the regex engine applies them to a line
+    OS_CALL = 0
+    SUBPROCESS_CALL = 1
+    SSRF_KEYWORD = 2
+    IMPORT = 3
+    BUILTIN_CALL = 4
+    SYS_CALL = 5
+    API_TOKEN = 6
+    PATTERN = 7
+    # Calls only the syntax tree reveals, described by the pattern tables where they match
+    CALL = 8
+
+    def __init__(self, rules):
+        """
+        Args:
+                rules (type): Configured `PythonSecurityChecker` class providing the rule sets
+        """
+        self.rules = rules
+        self.lines: List[str] = []
+        self.aliases: Dict[str, str] = {}
+        # Line number mapped to the precedence and the record of its finding
+        self.findings: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        # Lines spanned by string and bytes literals
+        self.string_lines = set()
+
+    @staticmethod
+    def build_call_rules(rules) -> Dict[str, Tuple[str, str]]:
+        """
+        Builds the lookup table of dangerous call names.
+        Args:
+                rules (type): Configured `PythonSecurityChecker` class
+        Returns:
+                Dict[str, Tuple[int, str, str]]: Dotted call name mapped to (precedence, type, description)
+        """
+        analyzer = AstSecurityAnalyzer
+        calls = {}
+        for operation in rules.DANGEROUS_OPERATIONS:
+            if "." in operation:
+                calls[operation] = (
+                    analyzer.CALL,
+                    "dangerous_operation",
+                    f"Dangerous operation: {operation}",
+                )
+        for func in rules.dangerous_os_funcs:
+            calls[f"os.{func}"] = (
+                analyzer.OS_CALL,
+                "os_dangerous_call",
+                f"Dangerous os module call: os.{func}",
+            )
+        for func in rules.dangerous_sys_funcs:
+            calls[f"sys.{func}"] = (
+                analyzer.SYS_CALL,
+                "sys_dangerous_call",
+                f"Dangerous sys module call: sys.{func}",
+            )
+        for func in analyzer.UNSAFE_BUILTINS:
+            calls[func] = (analyzer.BUILTIN_CALL, "dangerous_operation", f"Unsafe {func} function call")
+        for func in ("globals", "locals"):
+            calls[func] = (analyzer.CALL, "dangerous_operation", "Unsafe access to global variables")
+        calls["socket.socket"] = (analyzer.CALL, "dangerous_operation", "Socket creation")
+        calls["urllib.request.urlopen"] = (analyzer.CALL, "dangerous_operation", "URL opening")
+        calls["hashlib.md5"] = (analyzer.CALL, "insecure_crypto", "Insecure hash algorithm MD5")
+        return calls
+
+    def analyze(self, content: str) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Analyzes the source code.
+        Args:
+                content (str): File content for analysis
+        Returns:
+                Tuple[List[Dict[str, Any]], List[int]]: Tuple with a list of unsafe operations and lines
+        Raises:
+                SyntaxError: If the content is not valid Python
+        """
+        # Parsing allocates hundreds of thousands of nodes, the collector would keep
+        # traversing the growing tree while it is built (about half the parse time)
+        with _gc_paused():
+            tree = ast.parse(content)
+            self.lines = content.split("\n")
+            self._walk(tree)
+        self._match_patterns(content)
+
+        unsafe_lines = sorted(self.findings)
+        return [self.findings[line][1] for line in unsafe_lines], unsafe_lines
+
+    def _match_patterns(self, content: str) -> None:
+        regex_candidates, sensitive_candidates = self.rules._pattern_candidates(
+            content, self.lines, self.string_lines
+        )
+        for line in sorted(regex_candidates | sensitive_candidates):
+            # Lines already described by a check the regex engine applies first are skipped
+            finding = self.findings.get(line)
+            if finding is not None and finding[0] < self.PATTERN:
+                continue
+            text = self.lines[line - 1].strip()
+            if not text or text.startswith("#"):
+                continue
+            match = self.rules._match_pattern_tables(
+                self.lines[line - 1], line, regex_candidates, sensitive_candidates
+            )
+            if match is not None:
+                self._report_line(line, self.PATTERN, *match)
+
+    def _walk(self, tree: ast.AST) -> None:
+        # Iterative depth-first walk in source order, parents before children,
+        # so imports are seen before the aliases they define are used
+        handlers = {
+            ast.Import: self._visit_Import,
+            ast.ImportFrom: self._visit_ImportFrom,
+            ast.Call: self._visit_Call,
+            ast.Attribute: self._visit_Attribute,
+            ast.Constant: self._visit_Constant,
+            ast.Assign: self._visit_Assign,
+        }
+        # Fields holding expression contexts and operators never contain anything to check
+        skipped_fields = {"ctx", "op", "ops", "type_comment"}
+        fields_by_type = {}
+        node_type = ast.AST
+        name_type = ast.Name
+        stack = [tree]
+
+        while stack:
+            node = stack.pop()
+            node_class = type(node)
+            handler = handlers.get(node_class)
+            if handler is not None:
+                handler(node)
+
+            fields = fields_by_type.get(node_class)
+            if fields is None:
+                fields = [field for field in node._fields if field not in skipped_fields]
+                fields_by_type[node_class] = fields
+
+            children = []
+            for field in fields:
+                value = getattr(node, field, None)
+                if type(value) is list:
+                    children.extend(
+                        item for item in value
+                        if isinstance(item, node_type) and type(item) is not name_type
+                    )
+                elif isinstance(value, node_type) and type(value) is not name_type:
+                    children.append(value)
+            if children:
+                children.reverse()
+                stack.extend(children)
+
+    def _report(self, node: ast.AST, precedence: int, op_type: str, description: str) -> None:
+        self._report_line(node.lineno, precedence, op_type, description)
+
+    def _report_line(self, line: int, precedence: int, op_type: str, description: str) -> None:
+        # The check with the lowest precedence describes the line, the first one found among equals
+        finding = self.findings.get(line)
+        if finding is not None and finding[0] <= precedence:
+            return
+        self.findings[line] = (
+            precedence,
+            {
+                "line": line,
+                "content": self.lines[line - 1].strip(),
+                "type": op_type,
+                "description": description,
+            },
+        )
+
+    def _visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self.aliases[alias.asname or alias.name.split(".")[0]] = (
+                alias.name if alias.asname else alias.name.split(".")[0]
+            )
+            self._check_module(node, alias.name)
+
+    def _visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.level or not node.module:
+            return
+        for alias in node.names:
+            self.aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+        self._check_module(node, node.module)
+
+    def _check_module(self, node: ast.AST, module: str) -> None:
+        top_level = module.split(".")[0]
+        if top_level in self.rules.DANGEROUS_MODULES:
+            self._report(node, self.IMPORT, "dangerous_import", f"Dangerous module import: {top_level}")
+
+    def _visit_Call(self, node: ast.Call) -> None:
+        name = self._qualified_name(node.func)
+        if name is None:
+            return
+
+        rule = self.rules._ast_call_rules.get(name)
+        if rule is not None:
+            self._report(node, *rule)
+        elif name.startswith("subprocess.") and not self._is_safe_subprocess_call(node):
+            self._report(node, self.SUBPROCESS_CALL, "subprocess_dangerous_call", "Unsafe subprocess call")
+        elif name.startswith("cryptography.hazmat"):
+            self._report(
+                node, self.CALL, "insecure_crypto", "Usage of cryptography hazardous materials"
+            )
+
+    def _visit_Attribute(self, node: ast.Attribute) -> None:
+        name = self._qualified_name(node)
+        if name is not None and name.startswith("cryptography.hazmat"):
+            self._report(
+                node, self.CALL, "insecure_crypto", "Usage of cryptography hazardous materials"
+            )
+
+    def _visit_Constant(self, node: ast.Constant) -> None:
+        if not isinstance(node.value, (str, bytes)):
+            return
+        self.string_lines.update(range(node.lineno, node.end_lineno + 1))
+        if isinstance(node.value, bytes):
+            return
+
+        for keyword in self.rules.SSRF_KEYWORDS:
+            if keyword in node.value:
+                self._report(
+                    node,
+                    self.SSRF_KEYWORD,
+                    "ssrf_attempt",
+                    f"SSRF attempt: Contains potential SSRF keyword '{keyword}'",
+                )
+                return
+
+        for token_type, prefixes in self.rules.api_tokens.items():
+            if any(token in node.value for token in prefixes):
+                self._report(node, self.API_TOKEN, "sensitive_data", f"{token_type} token exposure")
+                return
+
+    def _visit_Assign(self, node: ast.Assign) -> None:
+        if not (isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+            return
+        for target in node.targets:
+            name = self._qualified_name(target)
+            if name is not None and name.split(".")[-1].lower() in self.rules._ast_credential_names:
+                self._report(node, self.CALL, "sensitive_data", "Potential hardcoded credentials")
+                return
+
+    def _is_safe_subprocess_call(self, node: ast.Call) -> bool:
+        for keyword in node.keywords:
+            if (
+                keyword.arg == "shell"
+                and isinstance(keyword.value, ast.Constant)
+                and keyword.value.value is False
+            ):
+                return True
+        return False
+
+    def _qualified_name(self, node: ast.AST) -> Optional[str]:
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self.aliases.get(node.id, node.id))
+        return ".".join(reversed(parts))
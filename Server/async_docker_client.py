@@ -0,0 +1,177 @@
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from Server.output_capture import CapturedOutput, FrameDemuxer
+
+# Marks an argument that was not passed, None disables the timeout
+_DEFAULT = object()
+
+
+class DockerAPIError(Exception):
+    """Raised when the Docker daemon answers with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+
+
+class AsyncDockerClient:
+    """
+    asyncio client of the Docker Engine API over the daemon's unix socket.
+    Only the calls needed to run a sandbox are implemented. One session with
+    keep-alive connections is shared by all jobs, so a job waiting for its
+    container costs a coroutine instead of a thread.
+    """
+
+    API_VERSION = "v1.41"
+    # Bytes of a container archive read at once
+    ARCHIVE_CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        socket_path: str = "/var/run/docker.sock",
+        max_connections: int = 100,
+        timeout: float = 60,
+    ):
+        """
+        Args:
+                socket_path (str): Unix socket of the Docker daemon
+                max_connections (int): Connections to the daemon open at the same time
+                timeout (float): Timeout of an API call in seconds, waiting for a container is not limited
+        """
+        self.socket_path = socket_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, created on first use inside the running event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.UnixConnector(path=self.socket_path, limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        """Closes the connections to the daemon."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def create_container(self, config: Dict[str, Any]) -> str:
+        """
+        Creates a container.
+        Args:
+                config (dict): Container configuration of the Engine API (Image, Cmd, WorkingDir, ...)
+        Returns:
+                str: Id of the container
+        """
+        body = await self._request("POST", "/containers/create", json=config)
+        return json.loads(body)["Id"]
+
+    async def pull_image(self, image: str) -> None:
+        """Pulls an image, returns once the download has finished."""
+        name, tag = image, "latest"
+        if ":" in image.rsplit("/", 1)[-1]:
+            name, tag = image.rsplit(":", 1)
+        await self._request(
+            "POST", "/images/create", params={"fromImage": name, "tag": tag}, timeout=None
+        )
+
+    async def put_archive(self, container_id: str, path: str, data: bytes) -> None:
+        """Extracts a tar archive at `path` inside the container."""
+        await self._request(
+            "PUT",
+            f"/containers/{container_id}/archive",
+            params={"path": path},
+            data=data,
+            headers={"Content-Type": "application/x-tar"},
+        )
+
+    @asynccontextmanager
+    async def get_archive(self, container_id: str, path: str) -> AsyncIterator[AsyncIterator[bytes]]:
+        """
+        Streams a tar archive of `path` inside the container.
+        The archive is not buffered, the caller reads it chunk by chunk while it
+        is downloaded and the response is closed when the block is left.
+        Yields:
+                AsyncIterator[bytes]: Chunks of the archive
+        """
+        url = f"http://docker/{self.API_VERSION}/containers/{container_id}/archive"
+        async with self.session.get(
+            url, params={"path": path}, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as response:
+            if response.status >= 400:
+                self._raise_error(response.status, await response.read())
+            yield response.content.iter_chunked(self.ARCHIVE_CHUNK_SIZE)
+
+    async def start(self, container_id: str) -> None:
+        await self._request("POST", f"/containers/{container_id}/start")
+
+    async def wait(self, container_id: str) -> int:
+        """Waits until the container exits, returns its exit code."""
+        body = await self._request("POST", f"/containers/{container_id}/wait", timeout=None)
+        return json.loads(body)["StatusCode"]
+
+    async def kill(self, container_id: str) -> None:
+        try:
+            await self._request("POST", f"/containers/{container_id}/kill")
+        except DockerAPIError as e:
+            # The container has exited in the meantime
+            if e.status != 409:
+                raise
+
+    async def logs(
+        self, container_id: str, head_bytes: Optional[int] = None, tail_bytes: int = 0, combined: bool = False
+    ) -> CapturedOutput:
+        """
+        Reads the stdout and stderr output of the container in one streamed request.
+        Args:
+                container_id (str): Id of the container
+                head_bytes (int): Bytes kept from the start of each stream, None keeps all output
+                tail_bytes (int): Bytes kept from the end of each stream
+                combined (bool): Also capture stdout and stderr interleaved
+        """
+        output = CapturedOutput.create(head_bytes, tail_bytes, combined)
+        demuxer = FrameDemuxer(output)
+
+        url = f"http://docker/{self.API_VERSION}/containers/{container_id}/logs"
+        async with self.session.get(
+            url, params={"stdout": "1", "stderr": "1"}, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as response:
+            if response.status >= 400:
+                self._raise_error(response.status, await response.read())
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                demuxer.feed(chunk)
+        return output
+
+    async def remove(self, container_id: str) -> None:
+        """Removes the container, killing it if it is still running."""
+        try:
+            await self._request("DELETE", f"/containers/{container_id}", params={"force": "1"})
+        except DockerAPIError as e:
+            if e.status != 404:
+                raise
+
+    async def _request(self, method: str, path: str, timeout: Any = _DEFAULT, **kwargs) -> bytes:
+        timeout = self.timeout if timeout is _DEFAULT else timeout
+        url = f"http://docker/{self.API_VERSION}{path}"
+
+        async with self.session.request(
+            method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+        ) as response:
+            body = await response.read()
+            if response.status >= 400:
+                self._raise_error(response.status, body)
+            return body
+
+    @staticmethod
+    def _raise_error(status: int, body: bytes) -> None:
+        try:
+            message = json.loads(body)["message"]
+        except (ValueError, KeyError, TypeError):
+            message = body.decode("utf-8", errors="replace")
+        raise DockerAPIError(status, message)
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from Server.async_docker_client import AsyncDockerClient, DockerAPIError
+from Server.executor import CodeExecutor
+from Server.python_security_checker import PythonSecurityChecker
+from Server.resources import ResourceLimits
+from Server.workspace import ContainerWorkspace
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCodeExecutor:
+    """
+    asyncio variant of `CodeExecutor`.
+    The upload is checked in memory and copied into a fresh sandbox container
+    with the archive API, the container is then supervised by a coroutine, so
+    one process can follow many running sandboxes without a thread each.
+    Security scanning is CPU-bound and runs in the default thread pool (or in
+    the scanning processes, see `SECURITY_SCAN_WORKERS`).
+    """
+
+    def __init__(self, docker_client: AsyncDockerClient, image: str, timeout: float, workspace_root: str):
+        """
+        Args:
+                docker_client (AsyncDockerClient): Client of the Docker daemon
+                image (str): Image of the sandbox containers
+                timeout (float): Maximum execution time of a script in seconds
+                workspace_root (str): Directory inside the container holding the job folders
+        """
+        self.docker_client = docker_client
+        self.image = image
+        self.timeout = timeout
+        self.workspace_root = workspace_root
+
+    async def execute_code(self, data: bytes, limits: Optional[ResourceLimits] = None) -> Dict[str, Any]:
+        """
+        Checks and runs an uploaded script.
+        Args:
+                data (bytes): Content of the uploaded file
+                limits (ResourceLimits): Resource quotas of the sandbox, defaults to `ResourceLimits.default()`
+        Returns:
+                dict: `output`, `error` and created `files`, like `CodeExecutor.execute_code`
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, PythonSecurityChecker.check_upload, data)
+        except ValueError as e:
+            return {"error": str(e), "output": "", "files": []}
+
+        workspace = ContainerWorkspace(
+            root=self.workspace_root,
+            script=result.safe_content.encode("utf-8"),
+            artifact_limits=CodeExecutor.artifact_limits(),
+        )
+        output = ""
+        error = ""
+        combined = None
+        container_id = None
+
+        try:
+            container_id = await self._start_container(workspace, limits or ResourceLimits.default())
+
+            try:
+                await asyncio.wait_for(self.docker_client.wait(container_id), self.timeout)
+            except asyncio.TimeoutError:
+                await self.docker_client.kill(container_id)
+                error += CodeExecutor.TIMEOUT_ERROR
+
+            captured = await self.docker_client.logs(container_id, **CodeExecutor.output_options())
+            output += captured.stdout.text()
+            error += captured.stderr.text().strip() + "\n"
+            if captured.combined is not None:
+                combined = captured.combined.text()
+            # The archive is read by a worker thread while it is downloaded, so the
+            # artifact limits apply as it streams in and the loop never blocks on tar
+            async with self.docker_client.get_archive(container_id, workspace.workdir) as chunks:
+                await loop.run_in_executor(
+                    None, workspace.extract_chunks, _chunks_from_loop(chunks, loop, self.docker_client.timeout)
+                )
+        except Exception as e:
+            error += f"Unexpected error: {str(e)}\n"
+        finally:
+            if container_id is not None:
+                # Shielded, the container is removed even if the request is cancelled
+                try:
+                    await asyncio.shield(self.docker_client.remove(container_id))
+                except Exception as e:
+                    logger.warning("Could not remove container %s: %s", container_id, e)
+
+        result = {"output": output, "error": error, "files": workspace.files()}
+        if combined is not None:
+            result["combined"] = combined
+        if workspace.files_omitted:
+            result["files_omitted"] = workspace.files_omitted
+        return result
+
+    async def _start_container(self, workspace: ContainerWorkspace, limits: ResourceLimits) -> str:
+        """Creates a sandbox container, copies the workspace into it and starts it."""
+        config = {
+            "Image": self.image,
+            "Cmd": ["python", "-u", workspace.SCRIPT_NAME],
+            "WorkingDir": workspace.workdir,
+            "Env": ["PYTHONUNBUFFERED=1"],
+            "HostConfig": limits.host_config(),
+        }
+
+        try:
+            container_id = await self.docker_client.create_container(config)
+        except DockerAPIError as e:
+            if e.status != 404:
+                raise
+            await self.docker_client.pull_image(self.image)
+            container_id = await self.docker_client.create_container(config)
+
+        try:
+            await self.docker_client.put_archive(container_id, "/", workspace.archive())
+            await self.docker_client.start(container_id)
+        except BaseException:
+            await asyncio.shield(self.docker_client.remove(container_id))
+            raise
+
+        return container_id
+
+
+async def _next_chunk(chunks: AsyncIterator[bytes]) -> Optional[bytes]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def _chunks_from_loop(chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop, timeout: float) -> Iterator[bytes]:
+    # Iterated in a worker thread, every chunk is read by the event loop
+    while True:
+        chunk = asyncio.run_coroutine_threadsafe(_next_chunk(chunks), loop).result(timeout)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,180 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from aiohttp import web
+
+from Server.admission import AdmissionController, AdmissionRejected
+from Server.async_docker_client import AsyncDockerClient
+from Server.async_executor import AsyncCodeExecutor
+from Server.config import Config
+from Server.connection_pool import PoolTimeout
+from Server.database import Database
+from Server.python_security_checker import PythonSecurityChecker
+from Server.resources import ResourceLimits, tier_weight
+
+
+class AsyncCodeExecutionServer:
+    """
+    asyncio web server for the execution API (`/execute` and `/process-code`).
+    Uploads are read from the request stream and scripts are run by
+    `AsyncCodeExecutor`, so a request in flight is a coroutine, not a thread.
+    Blocking calls (API key lookups, admission waits) run in thread pools.
+    """
+
+    def __init__(self):
+        PythonSecurityChecker.setup(
+            is_docker_environment=True,
+            engine=Config.SECURITY_ENGINE,
+            cache_size=Config.SECURITY_CACHE_SIZE,
+            cache_bytes=Config.SECURITY_CACHE_BYTES,
+            scan_workers=Config.SECURITY_SCAN_WORKERS,
+        )
+
+        self.db = Database(
+            server=Config.DB_SERVER,
+            database=Config.DB_NAME,
+            user=Config.DB_USER,
+            password=Config.DB_PASSWORD,
+            pool_size=Config.DB_POOL_SIZE,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            health_check_interval=Config.DB_HEALTH_CHECK_INTERVAL,
+            api_key_cache_size=Config.API_KEY_CACHE_SIZE,
+            api_key_cache_ttl=Config.API_KEY_CACHE_TTL,
+            api_key_negative_ttl=Config.API_KEY_NEGATIVE_TTL,
+        )
+
+        self.admission = AdmissionController(
+            max_concurrent=Config.MAX_CONCURRENT_EXECUTIONS,
+            max_queued=Config.ADMISSION_QUEUE_SIZE,
+            queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+            max_concurrent_per_key=Config.MAX_CONCURRENT_PER_KEY,
+            max_queued_per_key=Config.ADMISSION_QUEUE_PER_KEY,
+        )
+        # Requests waiting for an execution slot block here instead of in the event loop
+        self._admission_threads = ThreadPoolExecutor(
+            max_workers=Config.MAX_CONCURRENT_EXECUTIONS + Config.ADMISSION_QUEUE_SIZE,
+            thread_name_prefix="admission",
+        )
+
+        self.docker_client = AsyncDockerClient(
+            socket_path=Config.DOCKER_SOCKET,
+            max_connections=Config.DOCKER_MAX_POOL_SIZE,
+            timeout=Config.DOCKER_TIMEOUT,
+        )
+        self.executor = AsyncCodeExecutor(
+            docker_client=self.docker_client,
+            image=Config.CONTAINER_IMAGE,
+            timeout=Config.EXECUTION_TIMEOUT,
+            workspace_root=Config.CONTAINER_WORKSPACE,
+        )
+
+        self.app = web.Application(middlewares=[self.admission_rejected])
+        self.app.router.add_post("/execute", self.execute)
+        self.app.router.add_post("/process-code", self.process_code)
+        self.app.on_cleanup.append(self.shutdown)
+
+    async def execute(self, request: web.Request) -> web.Response:
+        """Processes requests for code execution."""
+        data = await self.read_upload(request, "file")
+        if data is None:
+            return web.json_response(
+                {"error": "File is not provided or does not have a name", "output": "", "files": []}
+            )
+
+        return web.json_response(await self.run_admitted(data, request.remote))
+
+    async def process_code(self, request: web.Request) -> web.Response:
+        """Processes code file from web client."""
+        auth_header = request.headers.get("Authorization")
+
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return web.json_response({"error": "Missing or malformed API key"}, status=401)
+
+        api_key = auth_header.replace("Bearer ", "").strip()
+
+        try:
+            tier = await asyncio.get_running_loop().run_in_executor(None, self.db.get_api_key_tier, api_key)
+        except PoolTimeout:
+            return web.json_response(
+                {"error": "Database is busy, retry later"}, status=503, headers={"Retry-After": "1"}
+            )
+        if tier is None:
+            return web.json_response({"error": "Invalid API key"}, status=403)
+
+        data = await self.read_upload(request, "codeFile")
+        if data is None:
+            return web.json_response({"error": "File not provided"}, status=400)
+
+        return web.json_response(await self.run_admitted(data, api_key, tier))
+
+    async def run_admitted(self, data: bytes, key, tier: Optional[str] = None) -> dict:
+        """Runs a script within the limits of the user tier, holding an execution slot of `key`."""
+        loop = asyncio.get_running_loop()
+        acquiring = loop.run_in_executor(
+            self._admission_threads,
+            functools.partial(self.admission.acquire, key=key, weight=tier_weight(tier)),
+        )
+        try:
+            # Shielded, the thread keeps waiting for the slot after a cancellation
+            admitted_at = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(functools.partial(self._release_abandoned, key))
+            raise
+        try:
+            return await self.executor.execute_code(data, ResourceLimits.for_tier(tier))
+        finally:
+            self.admission.release(admitted_at, key=key)
+
+    def _release_abandoned(self, key, acquiring: asyncio.Future) -> None:
+        """Releases a slot acquired for a request that was cancelled while waiting for it."""
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.admission.release(acquiring.result(), key=key)
+
+    @staticmethod
+    async def read_upload(request: web.Request, field: str) -> Optional[bytes]:
+        """
+        Reads a file field of a multipart request.
+        At most one byte more than the maximum file size is read, the security
+        check rejects larger files.
+        Returns:
+                bytes: File content, None if the field is missing or has no file name
+        """
+        if not request.content_type.startswith("multipart/"):
+            return None
+
+        limit = PythonSecurityChecker.max_file_size + 1
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name != field or not part.filename:
+                continue
+            data = bytearray()
+            while len(data) < limit:
+                chunk = await part.read_chunk()
+                if not chunk:
+                    break
+                data.extend(chunk)
+            return bytes(data[:limit])
+        return None
+
+    @web.middleware
+    async def admission_rejected(self, request: web.Request, handler):
+        """Answers requests rejected by the admission control."""
+        try:
+            return await handler(request)
+        except AdmissionRejected as error:
+            return web.json_response(
+                {"error": str(error)}, status=error.status, headers={"Retry-After": str(error.retry_after)}
+            )
+
+    async def shutdown(self, app: web.Application) -> None:
+        """Closes the Docker session, the scanning workers and the database connections."""
+        await self.docker_client.close()
+        self._admission_threads.shutdown(wait=False)
+        PythonSecurityChecker.shutdown_workers()
+        self.db.pool.close()
+
+    def run(self):
+        """Launches the asyncio server."""
+        web.run_app(self.app, host="0.0.0.0", port=Config.PORT)
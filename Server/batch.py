@@ -0,0 +1,84 @@
+import io
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from werkzeug.datastructures import FileStorage
+
+
+def read_batch(
+    files: List[FileStorage], archive: Optional[FileStorage], max_files: int, max_file_size: int
+) -> List[FileStorage]:
+    """
+    Reads the scripts of a batch request into memory, the upload streams are
+    closed once the request has been answered.
+    At most one byte more than `max_file_size` is read per script, the security
+    check rejects larger files.
+    Args:
+            files (list): Scripts uploaded as separate multipart files
+            archive (FileStorage): Zip archive, its `.py` files are added to the batch
+            max_files (int): Maximum number of scripts in one batch
+            max_file_size (int): Maximum size of a script in bytes
+    Returns:
+            list: Scripts of the batch, in upload order
+    Raises:
+            ValueError: If the batch is empty, too large or the archive cannot be read
+    """
+    too_large = f"A batch holds at most {max_files} scripts"
+    uploads = []
+    for file in files:
+        if file and file.filename:
+            if len(uploads) >= max_files:
+                raise ValueError(too_large)
+            uploads.append(FileStorage(stream=io.BytesIO(file.read(max_file_size + 1)), filename=file.filename))
+
+    if archive is not None and archive.filename:
+        try:
+            with zipfile.ZipFile(archive.stream) as scripts:
+                for member in scripts.infolist():
+                    name = posixpath.basename(member.filename)
+                    if member.is_dir() or not name.endswith(".py") or name.startswith("."):
+                        continue
+                    if len(uploads) >= max_files:
+                        raise ValueError(too_large)
+                    # Bounded read, the declared size of a member cannot be trusted
+                    with scripts.open(member) as f:
+                        data = f.read(max_file_size + 1)
+                    uploads.append(FileStorage(stream=io.BytesIO(data), filename=member.filename))
+        except (zipfile.BadZipFile, NotImplementedError, RuntimeError):
+            # Broken, encrypted or using an unsupported compression method
+            raise ValueError("Archive is not a readable zip file")
+
+    if not uploads:
+        raise ValueError("No files provided")
+    return uploads
+
+
+def run_batch(
+    uploads: List[FileStorage], execute: Callable[[FileStorage], Dict[str, Any]], max_parallel: int
+) -> Iterator[Dict[str, Any]]:
+    """
+    Runs the scripts of a batch concurrently and yields their results as they finish.
+    Every result carries `event: "result"`, the `index` of the script in the batch
+    and its `filename`; a final `{"event": "done", "count": ...}` closes the batch.
+    Closing the generator (e.g. when the client disconnects) cancels the scripts
+    that have not started yet.
+    Args:
+            uploads (list): Scripts of the batch
+            execute (Callable): Runs one script and returns its result, called from worker threads
+            max_parallel (int): Scripts of the batch running or waiting for a slot at once
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(len(uploads), max_parallel)), thread_name_prefix="batch")
+    try:
+        futures = {executor.submit(execute, upload): index for index, upload in enumerate(uploads)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"output": "", "error": f"Unexpected error: {str(e)}\n", "files": []}
+            yield dict(result, event="result", index=index, filename=uploads[index].filename)
+        yield {"event": "done", "count": len(uploads)}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """
+    Content-addressed files on the server disk, named by the SHA-256 of their content.
+    Created files of jobs are stored here and downloaded by URL instead of being
+    inlined into results. Identical files of different jobs are stored once.
+    Blobs not written or used for `ttl` seconds are removed.
+    """
+
+    # Bytes of a blob read at once while a bundle is sent
+    BUNDLE_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, root: str, ttl: Optional[float] = None):
+        """
+        Args:
+                root (str): Folder holding the blobs
+                ttl (float): Seconds a blob is kept after it was last stored or used, None keeps blobs
+        """
+        self.root = root
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+        self._pruning = False
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+
+    def put(self, stream: BinaryIO, limit: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Stores the content of a stream, copied in chunks.
+        Args:
+                stream (BinaryIO): Content to store
+                limit (int): Maximum number of bytes read from the stream, None reads it to the end
+        Returns:
+                tuple: SHA-256 of the stored content and its size in bytes
+        """
+        self._maybe_prune()
+
+        digest = hashlib.sha256()
+        size = 0
+        handle, temp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(handle, "wb") as f:
+                while limit is None or size < limit:
+                    chunk = stream.read(64 * 1024 if limit is None else min(64 * 1024, limit - size))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            path = self._path(digest.hexdigest())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic, an existing blob has the same content and only gets a new timestamp
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest.hexdigest(), size
+
+    def put_bytes(self, data: bytes) -> str:
+        """Stores a small in-memory blob, returns its SHA-256."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not self.touch(digest):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+            with os.fdopen(handle, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return digest
+
+    def path(self, digest: str) -> Optional[str]:
+        """Returns the file of a blob, None if the digest is malformed or the blob does not exist."""
+        if not _DIGEST.match(digest or ""):
+            return None
+        path = self._path(digest)
+        return path if os.path.isfile(path) else None
+
+    def touch(self, digest: str) -> bool:
+        """Marks a blob as used, so it outlives results that still refer to it. False if it is gone."""
+        path = self.path(digest)
+        if path is None:
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_manifest(self, files: List[Dict]) -> str:
+        """Stores the names and digests of the files of one result, for `bundle`."""
+        manifest = [{"filename": file["filename"], "sha256": file["sha256"]} for file in files]
+        return self.put_bytes(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+
+    def bundle(self, manifest_digest: str) -> Optional[Iterator[bytes]]:
+        """
+        Returns a gzip compressed tar of the files listed in a manifest, generated
+        chunk by chunk while it is sent. None if the manifest does not exist.
+        """
+        path = self.path(manifest_digest)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                manifest = json.load(f)
+            entries = [(os.path.basename(entry["filename"]), entry["sha256"]) for entry in manifest]
+        except (ValueError, TypeError, KeyError):
+            return None
+
+        return self._bundle_chunks(entries)
+
+    def prune(self) -> int:
+        """Removes blobs older than the TTL, returns how many were removed."""
+        if self.ttl is None:
+            return 0
+
+        expires_before = time.time() - self.ttl
+        removed = 0
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    if os.path.getmtime(path) < expires_before:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def _bundle_chunks(self, entries: List[Tuple[str, str]]) -> Iterator[bytes]:
+        # The tar records are written here rather than with `tarfile`, whose
+        # `addfile` copies a whole file before any of it can be sent
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip
+        written = 0
+        for filename, digest in entries:
+            path = self.path(digest)
+            if path is None:
+                continue
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                info = tarfile.TarInfo(filename)
+                info.size = stat.st_size
+                info.mtime = stat.st_mtime
+                info.mode = 0o644
+                header = info.tobuf(tarfile.PAX_FORMAT)
+                padding = -info.size % tarfile.BLOCKSIZE
+                written += len(header) + info.size + padding
+
+                data = compressor.compress(header)
+                remaining = info.size
+                while remaining > 0:
+                    chunk = f.read(min(self.BUNDLE_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise OSError(f"Blob {digest} is shorter than its size")
+                    remaining -= len(chunk)
+                    data += compressor.compress(chunk)
+                    if data:
+                        yield data
+                        data = b""
+                data += compressor.compress(tarfile.NUL * padding)
+            if data:
+                yield data
+
+        # End-of-archive blocks, padded to a whole record like `tarfile` does
+        end = 2 * tarfile.BLOCKSIZE
+        end += -(written + end) % tarfile.RECORDSIZE
+        yield compressor.compress(tarfile.NUL * end) + compressor.flush()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _maybe_prune(self) -> None:
+        # At most once per tenth of the TTL, walking the store in a background
+        # thread so the request storing a blob does not wait for it
+        if self.ttl is None:
+            return
+        with self._lock:
+            if self._pruning or time.monotonic() - self._pruned_at < self.ttl / 10:
+                return
+            self._pruned_at = time.monotonic()
+            self._pruning = True
+        threading.Thread(target=self._prune_in_background, name="blob-prune", daemon=True).start()
+
+    def _prune_in_background(self) -> None:
+        try:
+            self.prune()
+        except OSError as e:
+            logger.warning("Could not prune the blob store: %s", e)
+        finally:
+            with self._lock:
+                self._pruning = False
@@ -1,16 +1,106 @@
+import json
 import os
 
 
 class Config:
     UPLOAD_FOLDER = "/uploads"  # Related to volumes 'uploads' in docker-compose.yaml
+    UPLOAD_VOLUME = "cloudcode_uploads"  # Docker volume mounted into sandbox containers
+    # "volume": jobs run in a folder of UPLOAD_VOLUME, "container": the script is copied into
+    # CONTAINER_WORKSPACE inside the sandbox and created files are read back, nothing is written on the host
+    WORKSPACE_MODE = os.getenv("WORKSPACE_MODE", "volume")
+    CONTAINER_WORKSPACE = "/workspace"
     PORT = 5000
+    # Production server (gunicorn -c gunicorn.conf.py), the state of the server (job results,
+    # caches, admission limits, container pool) is kept per worker process
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_THREADS = int(os.getenv("SERVER_THREADS", "64"))  # per worker, above MAX_CONCURRENT_EXECUTIONS + ADMISSION_QUEUE_SIZE
     DEBUG = os.getenv("DEBUG_MODE", "false").lower() in ("true", "1", "yes")
     EXECUTION_TIMEOUT = 10  # in sec
+    CONTAINER_IMAGE = "python:3.10.6-slim"
+
+    # Shared Docker client, keep DOCKER_MAX_POOL_SIZE above the number of concurrent jobs
+    DOCKER_MAX_POOL_SIZE = int(os.getenv("DOCKER_MAX_POOL_SIZE", "32"))
+    DOCKER_SOCKET = os.getenv("DOCKER_SOCKET", "/var/run/docker.sock")  # used by the asyncio server
+    DOCKER_TIMEOUT = int(os.getenv("DOCKER_TIMEOUT", "60"))  # in sec, per API call
+    SECURITY_ENGINE = os.getenv("SECURITY_ENGINE", "regex")  # "regex" or "ast"
+    SECURITY_CACHE_SIZE = int(os.getenv("SECURITY_CACHE_SIZE", "1024"))  # check results cached by content hash, 0 disables
+    SECURITY_CACHE_BYTES = int(os.getenv("SECURITY_CACHE_BYTES", str(64 * 1024 * 1024)))  # memory of the cached results
+    SECURITY_SCAN_WORKERS = int(os.getenv("SECURITY_SCAN_WORKERS", "0"))  # scanning processes, 0 scans in the request thread
+    # Results of deterministic scripts reused by script digest, image and time limit, 0 disables.
+    # Requests with "Cache-Control: no-cache" always run
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "0"))
+    RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))  # in sec, 0 keeps results until evicted
+
+    # Resource quotas of every sandbox container, USER_TIERS overrides them per user tier
+    SANDBOX_MEM_LIMIT = os.getenv("SANDBOX_MEM_LIMIT", "256m")  # memory without swap, "" for no limit
+    SANDBOX_CPUS = float(os.getenv("SANDBOX_CPUS", "1.0"))  # 0 for no limit
+    SANDBOX_PIDS_LIMIT = int(os.getenv("SANDBOX_PIDS_LIMIT", "64"))  # processes and threads, 0 for no limit
+    SANDBOX_IO_WEIGHT = int(os.getenv("SANDBOX_IO_WEIGHT", "0"))  # block I/O weight 10-1000, 0 leaves it unset
+    # Per tier (Users.tier): "weight" is the share of execution slots, other keys override SANDBOX_* limits
+    USER_TIERS = json.loads(os.getenv(
+        "USER_TIERS",
+        '{"free": {"weight": 1}, "pro": {"weight": 2, "mem_limit": "1g", "cpus": 2.0, "pids_limit": 256}}',
+    ))
+    # Measures CPU time and peak memory of every script, returned as "usage" and stored in ExecutionUsage
+    RESOURCE_ACCOUNTING = os.getenv("RESOURCE_ACCOUNTING", "true").lower() in ("true", "1", "yes")
+    # Usage records wait in memory and are inserted in batches by a background thread
+    USAGE_QUEUE_SIZE = int(os.getenv("USAGE_QUEUE_SIZE", "10000"))
+    USAGE_BATCH_SIZE = int(os.getenv("USAGE_BATCH_SIZE", "100"))
+
+    # Created files returned with a result, larger files are cut and files past the limits counted, 0 disables
+    ARTIFACT_MAX_FILES = int(os.getenv("ARTIFACT_MAX_FILES", "100"))
+    ARTIFACT_MAX_FILE_SIZE = int(os.getenv("ARTIFACT_MAX_FILE_SIZE", str(1024 * 1024)))  # in bytes
+    ARTIFACT_MAX_TOTAL_SIZE = int(os.getenv("ARTIFACT_MAX_TOTAL_SIZE", str(8 * 1024 * 1024)))  # in bytes, per job
+
+    # stdout and stderr of a script keep their first OUTPUT_HEAD_BYTES and last OUTPUT_TAIL_BYTES each,
+    # the bytes in between are counted in a marker. Both 0 keep the whole output
+    OUTPUT_HEAD_BYTES = int(os.getenv("OUTPUT_HEAD_BYTES", str(64 * 1024)))
+    OUTPUT_TAIL_BYTES = int(os.getenv("OUTPUT_TAIL_BYTES", str(64 * 1024)))
+    # Also return stdout and stderr interleaved in the order they were written, as "combined"
+    OUTPUT_COMBINED = os.getenv("OUTPUT_COMBINED", "false").lower() in ("true", "1", "yes")
+    # "inline": created files are returned as text in the result, "blob": they are stored in
+    # ARTIFACT_FOLDER by content hash and returned as metadata with download URLs (/artifacts/...)
+    ARTIFACT_TRANSPORT = os.getenv("ARTIFACT_TRANSPORT", "inline")
+    ARTIFACT_FOLDER = os.getenv("ARTIFACT_FOLDER", "/artifacts")
+    ARTIFACT_TTL = int(os.getenv("ARTIFACT_TTL", "3600"))  # in sec since last stored or used, 0 keeps blobs
+
+    # Warm pool of sandbox containers, jobs are dispatched into them via exec
+    CONTAINER_POOL_ENABLED = os.getenv("CONTAINER_POOL_ENABLED", "true").lower() in ("true", "1", "yes")
+    CONTAINER_POOL_MIN_SIZE = int(os.getenv("CONTAINER_POOL_MIN_SIZE", "2"))
+    CONTAINER_POOL_MAX_SIZE = int(os.getenv("CONTAINER_POOL_MAX_SIZE", "8"))
+    CONTAINER_POOL_MAX_USES = int(os.getenv("CONTAINER_POOL_MAX_USES", "50"))  # jobs per container
+
+    # Admission control, executions beyond the limit wait in a bounded queue
+    MAX_CONCURRENT_EXECUTIONS = int(os.getenv("MAX_CONCURRENT_EXECUTIONS", "8"))
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+    ADMISSION_QUEUE_TIMEOUT = int(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))  # in sec
+    # Per API key (or client address) caps, slots are shared between keys by fair queuing
+    MAX_CONCURRENT_PER_KEY = int(os.getenv("MAX_CONCURRENT_PER_KEY", "4"))
+    ADMISSION_QUEUE_PER_KEY = int(os.getenv("ADMISSION_QUEUE_PER_KEY", "8"))
+
+    # Batch endpoints (POST /execute/batch, /process-code/batch): scripts per request and scripts of one
+    # batch running or waiting for a slot at once, keep it within the per-key caps above
+    BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+    BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "4"))
+
+    # Asynchronous job API (POST /jobs), results are kept for JOB_RESULT_TTL seconds
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+    JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+    JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "600"))  # in sec
+    JOB_MAX_RESULTS = int(os.getenv("JOB_MAX_RESULTS", "10000"))  # finished jobs kept at most
 
     DB_SERVER = os.getenv("DB_SERVER", "localhost")
     DB_NAME = os.getenv("DB_NAME", "cloudcode")
     DB_USER = os.getenv("DB_USER", "sa")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "YourStrong!Passw0rd")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))  # connections shared by request threads
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # in sec, waiting for a free connection
+    DB_HEALTH_CHECK_INTERVAL = 30  # in sec, idle connections are checked before reuse
+
+    # In-process cache of API key lookups
+    API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+    API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "300"))  # in sec, valid keys
+    API_KEY_NEGATIVE_TTL = int(os.getenv("API_KEY_NEGATIVE_TTL", "10"))  # in sec, invalid keys
 
     @staticmethod
     def init():
@@ -0,0 +1,164 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+    Each connection is used by one thread at a time, idle connections are
+    health-checked before reuse and broken connections are replaced.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        size: int = 5,
+        timeout: float = 5.0,
+        health_check: Optional[Callable[[Any], None]] = None,
+        health_check_interval: float = 30.0,
+        is_disconnect: Optional[Callable[[Exception], bool]] = None,
+    ):
+        """
+        Args:
+                connect (Callable): Function opening a new connection
+                size (int): Maximum number of open connections
+                timeout (float): Seconds to wait for a free connection
+                health_check (Callable): Function raising if a connection is unusable
+                health_check_interval (float): Idle seconds after which a connection is checked
+                is_disconnect (Callable): Tells whether an error left the connection unusable
+        """
+        self._connect = connect
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._health_check = health_check
+        self.health_check_interval = health_check_interval
+        self._is_disconnect = is_disconnect or (lambda error: False)
+
+        # Idle connections with the time they were returned, most recent last
+        self._idle: List[Tuple[Any, float]] = []
+        self._opened = 0
+        self._closed = False
+        self._available = threading.Condition(threading.Lock())
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of the `with` block.
+        If the block fails with a disconnect error the connection is dropped
+        instead of being returned to the pool.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception as e:
+            if self._is_disconnect(e):
+                self.discard(conn)
+            else:
+                self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Takes a connection out of the pool, opening a new one if the pool is not full.
+        Args:
+                timeout (float): Seconds to wait, defaults to the pool timeout
+        Raises:
+                PoolTimeout: If no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._available:
+                while not self._closed and not self._idle and self._opened >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No database connection available within {timeout} s"
+                        )
+                    self._available.wait(remaining)
+
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self._opened += 1
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except BaseException:
+                    self._forget()
+                    raise
+
+            if self._is_healthy(conn, returned_at):
+                return conn
+
+            # Stale connection, drop it and try again
+            self._close(conn)
+            self._forget()
+
+    def release(self, conn) -> None:
+        """Returns a healthy connection to the pool."""
+        with self._available:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._available.notify()
+                return
+
+        self._close(conn)
+        self._forget()
+
+    def discard(self, conn) -> None:
+        """Closes a broken connection and frees its slot."""
+        self._close(conn)
+        self._forget()
+
+    def close(self) -> None:
+        """Closes every idle connection, connections in use are closed on release."""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+
+        for conn, _ in idle:
+            self._close(conn)
+            self._forget()
+
+    def stats(self) -> dict:
+        """Returns the number of open and idle connections."""
+        with self._available:
+            return {"open": self._opened, "idle": len(self._idle), "size": self.size}
+
+    def _is_healthy(self, conn, returned_at: float) -> bool:
+        if self._health_check is None:
+            return True
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            self._health_check(conn)
+            return True
+        except Exception:
+            return False
+
+    def _forget(self) -> None:
+        with self._available:
+            self._opened -= 1
+            self._available.notify()
+
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,407 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import docker
+from requests.exceptions import ConnectionError
+from urllib3.exceptions import ReadTimeoutError
+
+from Server.output_capture import CapturedOutput, capture_output
+
+logger = logging.getLogger(__name__)
+
+# Exit codes reported by coreutils `timeout -s KILL` when the time limit is hit.
+# 137 also means any other SIGKILL (e.g. the OOM killer), the elapsed time decides.
+TIMEOUT_EXIT_CODES = (124, 137)
+
+# Prints the PID of the keep-alive process, the `sleep infinity` started by the
+# init process. Run once right after the container started, before any job.
+KEEPALIVE_SCRIPT = """
+import os, time
+for _ in range(100):
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = f.read().rsplit(")", 1)[1].split()[1]
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if ppid == "1" and cmdline == b"sleep\\x00infinity\\x00":
+            print(pid)
+            raise SystemExit(0)
+    time.sleep(0.01)
+raise SystemExit(1)
+"""
+
+# Resets a recycled container: kills every process left behind by the previous
+# job, except the init process and the keep-alive process whose PID is the first
+# argument, and empties the scratch folders passed as further arguments.
+RESET_SCRIPT = """
+import os, shutil, signal, sys
+spared = (1, os.getpid(), int(sys.argv[1]))
+for pid in os.listdir("/proc"):
+    if not pid.isdigit() or int(pid) in spared:
+        continue
+    try:
+        os.kill(int(pid), signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+for root in sys.argv[2:]:
+    if not os.path.isdir(root):
+        continue
+    for item in os.listdir(root):
+        path = os.path.join(root, item)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.unlink(path)
+"""
+
+
+class ContainerPool:
+    """
+    Pool of pre-started sandbox containers.
+    Jobs are dispatched into idle containers via `exec` instead of paying the
+    create/start/remove cost of a fresh container on every request.
+    A container is only recycled for the owner of its previous jobs: files written
+    outside the scratch folders survive the reset.
+    """
+
+    def __init__(
+        self,
+        docker_client,
+        image: str,
+        volumes: Dict[str, Dict[str, str]],
+        min_size: int = 2,
+        max_size: int = 8,
+        max_uses: int = 50,
+        scratch_dirs: Sequence[str] = ("/tmp",),
+        container_options: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Args:
+                docker_client (DockerClientManager): Shared client used to manage containers
+                image (str): Image the sandbox containers are started from
+                volumes (dict): Volumes mounted into every sandbox container
+                min_size (int): Number of idle containers kept warm
+                max_size (int): Maximum number of containers owned by the pool
+                max_uses (int): Number of jobs after which a container is destroyed
+                scratch_dirs (Sequence[str]): Folders emptied when a container is recycled
+                container_options (dict): Extra arguments of `containers.run`, e.g. resource limits
+        """
+        self.docker_client = docker_client
+        self.image = image
+        self.volumes = volumes
+        self.min_size = max(0, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.max_uses = max(1, max_uses)
+        self.scratch_dirs = list(scratch_dirs)
+        self.container_options = dict(container_options or {})
+
+        self._idle: List = []
+        self._uses: Dict[str, int] = {}
+        # PID of the keep-alive process inside each container
+        self._keepalive: Dict[str, int] = {}
+        # Owner of each container that has run a job, unused containers are missing
+        self._owners: Dict[str, Optional[str]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._closed = False
+        self._refill_thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Starts the background thread that keeps `min_size` containers warm."""
+        self._refill_thread = threading.Thread(
+            target=self._refill_loop, name="container-pool-refill", daemon=True
+        )
+        self._refill_thread.start()
+        self._refill_needed.set()
+
+    def acquire(self, owner: Optional[str] = None):
+        """
+        Takes an idle container of the owner, or an unused one, out of the pool.
+        Otherwise a new container is started if the pool has not reached `max_size`
+        yet, or in place of the idle container of another owner that was used least recently.
+        Args:
+                owner (str): User the job runs for, e.g. the API key
+        Returns:
+                Container or None: Container reserved for one job, or None if the pool is exhausted
+        """
+        evicted = None
+        with self._lock:
+            if self._closed:
+                return None
+            container = self._take_idle(owner)
+            if container is not None:
+                self._owners[container.id] = owner
+                self._refill_needed.set()
+                return container
+            if self._size < self.max_size:
+                self._size += 1
+            elif self._idle:
+                # The new container takes over the slot of the evicted one
+                evicted = self._idle.pop(0)
+            else:
+                return None
+
+        if evicted is not None:
+            self._remove(evicted)
+
+        try:
+            container = self._create_container()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+            self._refill_needed.set()
+            raise
+
+        with self._lock:
+            self._owners[container.id] = owner
+        return container
+
+    def release(self, container, healthy: bool = True) -> None:
+        """
+        Returns a container to the pool after a job.
+        The container is recycled if it is healthy, has not reached `max_uses`
+        and could be reset, otherwise it is destroyed.
+        Args:
+                container (Container): Container previously returned by `acquire`
+                healthy (bool): False if the job timed out or the container misbehaved
+        """
+        with self._lock:
+            uses = self._uses.get(container.id, 0) + 1
+            self._uses[container.id] = uses
+
+        if healthy and uses < self.max_uses and not self._closed and self._reset(container):
+            with self._lock:
+                if not self._closed:
+                    self._idle.append(container)
+                    return
+
+        self._destroy(container)
+
+    def execute(
+        self,
+        container,
+        workdir: str,
+        command: List[str],
+        timeout: int,
+        head_bytes: Optional[int] = None,
+        tail_bytes: int = 0,
+        combined: bool = False,
+        environment: Optional[Dict[str, str]] = None,
+    ) -> Tuple[bool, CapturedOutput]:
+        """
+        Runs a command inside a pooled container.
+        The output is read as a stream into bounded captures, see `OutputCapture`.
+        Args:
+                container (Container): Container returned by `acquire`
+                workdir (str): Working directory of the command
+                command (List[str]): Command to run
+                timeout (int): Time limit in seconds
+                head_bytes (int): Bytes kept from the start of each stream, None keeps all output
+                tail_bytes (int): Bytes kept from the end of each stream
+                combined (bool): Also capture stdout and stderr interleaved
+                environment (dict): Variables added to the environment of the command
+        Returns:
+                Tuple[bool, CapturedOutput]: Timed-out flag and the captured output
+        """
+        started_at = time.monotonic()
+        exec_id, chunks = self.start_exec(container, workdir, command, timeout, stream=True, environment=environment)
+        timer, killed = self.kill_timer(container, timeout)
+        try:
+            output = capture_output(chunks, head_bytes, tail_bytes, combined)
+        finally:
+            timer.cancel()
+
+        return killed.is_set() or self.timed_out(exec_id, time.monotonic() - started_at, timeout), output
+
+    def start_exec(
+        self,
+        container,
+        workdir: str,
+        command: List[str],
+        timeout: int,
+        stream: bool = False,
+        environment: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Starts a command inside a pooled container under a time limit.
+        Args:
+                container (Container): Container returned by `acquire`
+                workdir (str): Working directory of the command
+                command (List[str]): Command to run
+                timeout (int): Time limit in seconds
+                stream (bool): Return a generator of output chunks instead of the full output
+                environment (dict): Variables added to the environment of the command
+        Returns:
+                tuple: Exec id and either (stdout, stderr) bytes or a generator of such tuples
+        """
+        api = self.docker_client.api
+        exec_id = api.exec_create(
+            container.id,
+            ["timeout", "-s", "KILL", str(timeout)] + command,
+            workdir=workdir,
+            environment=dict(environment or {}, PYTHONUNBUFFERED="1"),
+        )["Id"]
+
+        return exec_id, api.exec_start(exec_id, stream=stream, demux=True)
+
+    @staticmethod
+    def kill_timer(container, timeout: float) -> Tuple[threading.Timer, threading.Event]:
+        """
+        Kills the container from the host once the time limit has passed.
+        `timeout` inside the container misses processes that left its process
+        group (e.g. with `setsid`) and keep the output open, the exec stream then
+        only ends when the container dies. A killed container must be released
+        as unhealthy, the pool replaces it.
+        Returns:
+                tuple: Started timer (to be cancelled) and the event set when it fired
+        """
+        killed = threading.Event()
+
+        def kill():
+            killed.set()
+            try:
+                container.kill()
+            except Exception:
+                pass
+
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+        return timer, killed
+
+    def timed_out(self, exec_id: str, elapsed: float, timeout: int) -> bool:
+        """
+        Checks whether a finished exec was killed by the time limit.
+        Args:
+                exec_id (str): Exec started by `start_exec`
+                elapsed (float): Wall time in seconds from starting the exec until its output ended
+                timeout (int): Time limit the exec was started with
+        """
+        if elapsed < timeout:
+            return False
+        exit_code = self.docker_client.api.exec_inspect(exec_id).get("ExitCode")
+        return exit_code in TIMEOUT_EXIT_CODES
+
+    def shutdown(self) -> None:
+        """Stops the refill thread and removes every idle container."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        self._refill_needed.set()
+
+        for container in idle:
+            self._destroy(container)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the current pool occupancy."""
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "busy": self._size - len(self._idle),
+                "size": self._size,
+            }
+
+    def _create_container(self):
+        container = self.docker_client.containers.run(
+            image=self.image,
+            name=f"cloudcode_pool_{uuid.uuid4().hex[:12]}",
+            command=["sleep", "infinity"],
+            labels={"cloudcode.pool": "1"},
+            environment={"PYTHONUNBUFFERED": "1"},
+            volumes=self.volumes,
+            init=True,
+            detach=True,
+            **self.container_options,
+        )
+        try:
+            exit_code, output = container.exec_run(["python", "-c", KEEPALIVE_SCRIPT])
+            if exit_code != 0:
+                raise RuntimeError("Keep-alive process of the pooled container not found")
+            keepalive = int(output)
+        except Exception:
+            container.remove(force=True)
+            raise
+
+        with self._lock:
+            self._keepalive[container.id] = keepalive
+            self._uses[container.id] = 0
+        return container
+
+    def _reset(self, container) -> bool:
+        try:
+            exit_code, _ = container.exec_run(
+                ["python", "-c", RESET_SCRIPT, str(self._keepalive[container.id])] + self.scratch_dirs
+            )
+            return exit_code == 0
+        except (ReadTimeoutError, ConnectionError, docker.errors.DockerException):
+            return False
+
+    def _take_idle(self, owner: Optional[str]):
+        # Called with the lock held, prefers the containers of the owner and keeps
+        # unused ones for other owners
+        for matches in (
+            lambda container: container.id in self._owners and self._owners[container.id] == owner,
+            lambda container: container.id not in self._owners,
+        ):
+            for index in reversed(range(len(self._idle))):
+                if matches(self._idle[index]):
+                    return self._idle.pop(index)
+        return None
+
+    def _destroy(self, container) -> None:
+        with self._lock:
+            self._size -= 1
+        self._refill_needed.set()
+        self._remove(container)
+
+    def _remove(self, container) -> None:
+        with self._lock:
+            self._uses.pop(container.id, None)
+            self._keepalive.pop(container.id, None)
+            self._owners.pop(container.id, None)
+
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+
+    def _refill_loop(self) -> None:
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+
+            while True:
+                with self._lock:
+                    if self._closed:
+                        return
+                    unused = sum(1 for container in self._idle if container.id not in self._owners)
+                    if unused >= self.min_size or self._size >= self.max_size:
+                        break
+                    self._size += 1
+
+                try:
+                    container = self._create_container()
+                except Exception as e:
+                    with self._lock:
+                        self._size -= 1
+                    logger.warning("Failed to start pooled container: %s", e)
+                    break
+
+                with self._lock:
+                    if self._closed:
+                        closed = True
+                    else:
+                        closed = False
+                        self._idle.append(container)
+                if closed:
+                    self._destroy(container)
+                    return
@@ -1,14 +1,43 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
 import pyodbc
 
+from Server.cache import TTLCache
+from Server.connection_pool import ConnectionPool
+
 
 class Database:
-    def __init__(self, server, database, user, password):
-        self.connection = self._connect(server, database, user, password)
+    def __init__(
+        self,
+        server,
+        database,
+        user,
+        password,
+        pool_size=10,
+        pool_timeout=5.0,
+        health_check_interval=30.0,
+        api_key_cache_size=10000,
+        api_key_cache_ttl=300.0,
+        api_key_negative_ttl=10.0,
+    ):
+        self.pool = ConnectionPool(
+            connect=lambda: self._connect(server, database, user, password),
+            size=pool_size,
+            timeout=pool_timeout,
+            health_check=self._health_check,
+            health_check_interval=health_check_interval,
+            is_disconnect=self._is_disconnect,
+        )
+        # Validated keys are cached for `api_key_cache_ttl` seconds, unknown keys
+        # for the much shorter `api_key_negative_ttl` to absorb brute-force floods
+        self.api_key_cache = TTLCache(max_size=api_key_cache_size, ttl=api_key_cache_ttl)
+        self.api_key_negative_ttl = api_key_negative_ttl
         self._ensure_tables()
 
     def __del__(self):
-        if hasattr(self, "connection"):
-            self.connection.close()
+        if hasattr(self, "pool"):
+            self.pool.close()
 
     def _connect(self, server, database, user, password):
         return pyodbc.connect(
@@ -20,27 +49,144 @@ class Database:
             "TrustServerCertificate=yes;"
         )
 
+    @staticmethod
+    def _health_check(connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+
+    @staticmethod
+    def _is_disconnect(error):
+        # SQLSTATE class 08 is "connection exception"
+        if isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+            return True
+        return (
+            isinstance(error, pyodbc.Error)
+            and bool(error.args)
+            and str(error.args[0]).startswith("08")
+        )
+
+    def _run(self, operation, retry=True):
+        """
+        Runs `operation(connection)` on a pooled connection.
+        Read-only operations are retried once on a fresh connection if the first one turns out to be broken.
+        """
+        try:
+            with self.pool.connection() as connection:
+                return operation(connection)
+        except pyodbc.Error as e:
+            if not retry or not self._is_disconnect(e):
+                raise
+
+        with self.pool.connection() as connection:
+            return operation(connection)
+
     def _ensure_tables(self):
         path = "/cloudcode_sql/SETUP.sql"
         with open(path, "r") as file:
             sql = file.read()
-            cursor = self.connection.cursor()
+
+        def operation(connection):
+            cursor = connection.cursor()
             cursor.execute(sql)
-            self.connection.commit()
+            connection.commit()
             cursor.close()
 
+        self._run(operation)
+
     def is_api_key_valid(self, api_key: str) -> bool:
-        cur = self.connection.cursor()
-        cur.execute("SELECT 1 FROM Users WHERE api_key = ?", (api_key,))
-        row = cur.fetchone()
-        cur.close()
-        return row is not None
+        return self.get_api_key_tier(api_key) is not None
 
-    def add_user(self, username, email, api_key):
-        cursor = self.connection.cursor()
-        cursor.execute(
-            "INSERT INTO Users (username, email, api_key) VALUES (?, ?, ?)",
-            (username, email, api_key)
+    def get_api_key_tier(self, api_key: str) -> Optional[str]:
+        """Returns the tier of the user owning the key, None if the key is unknown."""
+        cached = self.api_key_cache.get(api_key)
+        if cached is not None:
+            # Unknown keys are cached as False
+            return cached or None
+
+        def operation(connection):
+            cur = connection.cursor()
+            cur.execute("SELECT tier FROM Users WHERE api_key = ?", (api_key,))
+            row = cur.fetchone()
+            cur.close()
+            return row
+
+        row = self._run(operation)
+        tier = row[0] if row is not None else None
+        self.api_key_cache.set(
+            api_key,
+            tier if tier is not None else False,
+            ttl=None if tier is not None else self.api_key_negative_ttl,
         )
-        self.connection.commit()
-        cursor.close()
+        return tier
+
+    def invalidate_api_key(self, api_key: str) -> None:
+        """Drops a cached validation result, must be called whenever a key is added or removed."""
+        self.api_key_cache.invalidate(api_key)
+
+    def add_user(self, username, email, api_key):
+        def operation(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO Users (username, email, api_key) VALUES (?, ?, ?)",
+                    (username, email, api_key)
+                )
+                connection.commit()
+            except pyodbc.Error as e:
+                if not self._is_disconnect(e):
+                    connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        # Not retried: the insert may have been committed before the connection broke
+        try:
+            self._run(operation, retry=False)
+        finally:
+            # The key may be negatively cached from an earlier attempt to use it
+            self.invalidate_api_key(api_key)
+
+    @staticmethod
+    def hash_key(client_key: str) -> str:
+        """Returns the SHA-256 of an API key (or client address), stored instead of the key itself."""
+        return hashlib.sha256(client_key.encode("utf-8")).hexdigest()
+
+    def record_usage(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Stores the resource usage of executions for billing and capacity planning.
+        Args:
+                records (list): Dicts with `client_key`, `tier`, `usage` and `timed_out` of each execution
+        """
+        rows = [
+            (
+                self.hash_key(record["client_key"]),
+                record["tier"],
+                (record["usage"] or {}).get("cpu_seconds"),
+                (record["usage"] or {}).get("peak_memory_mb"),
+                record["timed_out"],
+                bool((record["usage"] or {}).get("accounting_failed")),
+            )
+            for record in records
+        ]
+
+        def operation(connection):
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(
+                    "INSERT INTO ExecutionUsage "
+                    "(key_hash, tier, cpu_seconds, peak_memory_mb, timed_out, accounting_failed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                connection.commit()
+            except pyodbc.Error as e:
+                if not self._is_disconnect(e):
+                    connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        # Not retried: the insert may have been committed before the connection broke
+        self._run(operation, retry=False)
@@ -0,0 +1,143 @@
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import docker
+from requests.exceptions import ConnectionError
+
+logger = logging.getLogger(__name__)
+
+# "/v1.45/containers/3f2a.../exec" -> "/containers/{id}/exec"
+_API_VERSION = re.compile(r"^/v\d+\.\d+")
+_OBJECT_ID = re.compile(r"/[0-9a-f]{12,64}(?=/|$)")
+
+
+class DockerClientManager:
+    """
+    Process-wide Docker client shared by every request.
+    The client and its HTTP connection pool are created once, on first use,
+    instead of on every execution. When the daemon goes away (e.g. it is
+    restarted) the client is dropped and a new one is connected on the next
+    call. Every API call is timed, see `stats`.
+    """
+
+    def __init__(self, max_pool_size: int = 10, timeout: int = 60):
+        """
+        Args:
+                max_pool_size (int): Connections kept open to the daemon, should cover the number of concurrent jobs
+                timeout (int): Default timeout of API calls in seconds
+        """
+        self.max_pool_size = max(1, max_pool_size)
+        self.timeout = timeout
+
+        self._client: Optional[docker.DockerClient] = None
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        self.connects = 0
+        self.connection_errors = 0
+
+    @property
+    def client(self) -> docker.DockerClient:
+        """
+        Returns the shared client, connecting it if necessary.
+        Raises:
+                docker.errors.DockerException: If the daemon cannot be reached
+        """
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._client is None:
+                self._client = self._connect()
+            return self._client
+
+    @property
+    def containers(self):
+        """Container collection of the shared client."""
+        return self.client.containers
+
+    @property
+    def api(self):
+        """Low-level API client of the shared client."""
+        return self.client.api
+
+    def run(self, operation: Callable[[docker.DockerClient], Any], retry: bool = False):
+        """
+        Runs `operation(client)` on the shared client.
+        On a connection error the client is dropped so the next call reconnects,
+        read-only operations may be retried once on the new connection.
+        """
+        try:
+            return operation(self.client)
+        except ConnectionError:
+            self.reset()
+            if not retry:
+                raise
+
+        return operation(self.client)
+
+    def reset(self) -> None:
+        """Drops the current client, the next call opens new connections."""
+        with self._lock:
+            client, self._client = self._client, None
+
+        with self._stats_lock:
+            self.connection_errors += 1
+
+        if client is not None:
+            logger.warning("Docker connection lost, reconnecting on next call")
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """Closes the client and its connections."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns call timings per API endpoint.
+        Returns:
+                Dict[str, Any]: Connection counters and, per "METHOD /path", the number of calls,
+                        failed calls, total and maximum time until the response headers arrived (sec)
+        """
+        with self._stats_lock:
+            return {
+                "connects": self.connects,
+                "connection_errors": self.connection_errors,
+                "calls": {name: dict(call) for name, call in self._calls.items()},
+            }
+
+    def _connect(self) -> docker.DockerClient:
+        client = docker.from_env(max_pool_size=self.max_pool_size, timeout=self.timeout)
+        client.api.hooks["response"].append(self._record_response)
+        with self._stats_lock:
+            self.connects += 1
+        return client
+
+    def _record_response(self, response, *args, **kwargs) -> None:
+        path = _OBJECT_ID.sub("/{id}", _API_VERSION.sub("", urlparse(response.url).path))
+        name = f"{response.request.method} {path}"
+        elapsed = response.elapsed.total_seconds()
+
+        with self._stats_lock:
+            call = self._calls.get(name)
+            if call is None:
+                call = self._calls[name] = {
+                    "count": 0,
+                    "errors": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                }
+            call["count"] += 1
+            call["errors"] += response.status_code >= 400
+            call["total_time"] += elapsed
+            call["max_time"] = max(call["max_time"], elapsed)
@@ -1,36 +1,288 @@
+import codecs
+import contextlib
 import docker
+import logging
 import os
+import threading
+import time
 import uuid
-import shutil
-from urllib3.exceptions import ReadTimeoutError
-from requests.exceptions import ConnectionError
+from Server.blob_store import BlobStore
+from Server.cache import TTLCache
 from Server.config import Config
+from Server.container_pool import ContainerPool
+from Server.docker_client import DockerClientManager
+from Server.metrics import EXECUTIONS, OUTPUT_DROPPED_BYTES, SECURITY_FINDINGS, stage
+from Server.output_capture import capture_output
 from Server.python_security_checker import PythonSecurityChecker
+from Server.resources import ResourceLimits, accounting_command, split_usage
+from Server.workspace import ArtifactLimits, ContainerWorkspace, VolumeWorkspace
+
+logger = logging.getLogger(__name__)
 
 
 class CodeExecutor:
 
-	@staticmethod
-	def execute_code(file):
-		"""Processing code execution from the transferred file."""
+	TIMEOUT_ERROR = "Execution time out, code 500\n"
+
+	# Shared by every request, connects lazily on first use
+	docker_client = DockerClientManager(
+	    max_pool_size=Config.DOCKER_MAX_POOL_SIZE, timeout=Config.DOCKER_TIMEOUT)
+	container_pool = None
+	# Results of earlier runs by script digest, None when disabled
+	result_cache = None
+	# Created files downloaded by URL, None when they are inlined into results
+	artifact_store = None
+	# Containers started for a single job (outside the pool) that still exist
+	fresh_containers = 0
+	_fresh_containers_lock = threading.Lock()
+
+	@classmethod
+	def setup(cls):
+		"""Prepares shared execution resources (result cache, warm container pool)."""
+		if Config.RESULT_CACHE_SIZE > 0 and cls.result_cache is None:
+			cls.result_cache = TTLCache(max_size=Config.RESULT_CACHE_SIZE,
+			                            ttl=Config.RESULT_CACHE_TTL or None)
+		if Config.ARTIFACT_TRANSPORT == "blob" and cls.artifact_store is None:
+			cls.artifact_store = BlobStore(Config.ARTIFACT_FOLDER,
+			                               ttl=Config.ARTIFACT_TTL or None)
+
+		if not Config.CONTAINER_POOL_ENABLED or cls.container_pool is not None:
+			return
+
+		try:
+			# Connects eagerly so an unreachable daemon disables the pool right away
+			cls.docker_client.client
+			cls.container_pool = ContainerPool(
+			    docker_client=cls.docker_client,
+			    image=Config.CONTAINER_IMAGE,
+			    volumes=cls._sandbox_volumes(),
+			    min_size=Config.CONTAINER_POOL_MIN_SIZE,
+			    max_size=Config.CONTAINER_POOL_MAX_SIZE,
+			    max_uses=Config.CONTAINER_POOL_MAX_USES,
+			    scratch_dirs=cls._scratch_dirs(),
+			    container_options=ResourceLimits.default().container_options(),
+			)
+			cls.container_pool.start()
+		except docker.errors.DockerException as e:
+			# Without a pool every job falls back to a fresh container
+			logger.warning("Container pool is disabled: %s", e)
+			cls.container_pool = None
+
+	@classmethod
+	def shutdown(cls):
+		"""Releases shared execution resources."""
+		if cls.container_pool is not None:
+			cls.container_pool.shutdown()
+			cls.container_pool = None
+		cls.docker_client.close()
+
+	@classmethod
+	def execute_code(cls, file, slot=None, use_cache=True, limits=None, owner=None):
+		"""
+		Processing code execution from the transferred file.
+		Args:
+			file (FileStorage): Uploaded script
+			slot (contextmanager): Held while the script runs (admission slot), not taken for cached results
+			use_cache (bool): False runs the script even if its result is cached
+			limits (ResourceLimits): Resource quotas of the sandbox, defaults to `ResourceLimits.default()`
+			owner (str): User the script runs for, pooled containers are only recycled for the same owner
+		"""
+		limits = limits or ResourceLimits.default()
+		workspace, failure = cls._prepare_workspace(file)
+		if failure is not None:
+			return failure
+
+		try:
+			cache_key = cls._result_key(workspace, limits)
+			if use_cache and cache_key is not None:
+				cached = cls.result_cache.get(cache_key)
+				# Results whose files were removed from the store are run again
+				if cached is not None and cls._artifacts_available(cached):
+					EXECUTIONS.inc(result="cached")
+					return dict(cached, cached=True)
+
+			with contextlib.ExitStack() as held:
+				if slot is not None:
+					with stage("admission"):
+						held.enter_context(slot)
+				result, complete = cls._run_workspace(workspace, limits, owner)
+			EXECUTIONS.inc(result=cls._outcome(result["error"], complete))
+
+			# Timed out or failed runs say nothing about the script, they are not reused
+			if cache_key is not None and complete:
+				cls.result_cache.set(cache_key, result)
+			return result
+		finally:
+			# Delete the folder after execution
+			with stage("cleanup"):
+				workspace.cleanup()
+
+	@classmethod
+	def _run_workspace(cls, workspace, limits, owner=None):
+		"""
+		Runs the script of the workspace in a pooled or fresh container.
+		Returns:
+			tuple: Execution result and whether the script ran to completion
+		"""
+		created_files = []
+		output = ""
+		error = ""
+		usage = None
+		combined = None
+		complete = False
+
+		# Pooled containers are started with the default limits
+		pool = cls.container_pool if limits == ResourceLimits.default() else None
+		container = None
+
+		try:
+			if pool is not None:
+				with stage("pool_acquire"):
+					container = pool.acquire(owner=owner)
+
+			if container is not None:
+				output, error, usage, combined = cls._run_pooled(
+				    pool, container, workspace)
+			else:
+				output, error, usage, combined = cls._run_container(
+				    workspace, limits)
+			complete = cls.TIMEOUT_ERROR not in error
+
+		except Exception as e:
+			error += f"Unexpected error: {str(e)}\n"
+		finally:
+			created_files = workspace.files()
+
+		result = {
+		    "output": output,
+		    "error": error,
+		    "files": created_files,
+		    "usage": usage,
+		}
+		if combined is not None:
+			result["combined"] = combined
+		cls._describe_files(result, workspace)
+		return result, complete
+
+	@classmethod
+	def stream_code(cls, file, limits=None, owner=None):
+		"""
+		Processing code execution from the transferred file, forwarding the output
+		while the script is running.
+		The upload is saved and checked before returning, the returned generator
+		yields `{"event": "stdout" | "stderr", "data": ...}` chunks and finishes
+		with `{"event": "done", "error": ..., "files": [...]}`.
+		"""
+		limits = limits or ResourceLimits.default()
+		workspace, failure = cls._prepare_workspace(file)
+		if failure is not None:
+			return iter([{
+			    "event": "done",
+			    "error": failure["error"],
+			    "files": []
+			}])
+
+		return cls._stream_events(workspace, limits, owner)
+
+	@classmethod
+	def _stream_events(cls, workspace, limits, owner=None):
+		"""Generator behind `stream_code`, owns the workspace until it is closed."""
+		error = ""
+		pool = cls.container_pool if limits == ResourceLimits.default() else None
+		chunks = None
+
+		try:
+			container = pool.acquire(owner=owner) if pool is not None else None
+
+			if container is not None:
+				chunks = cls._stream_pooled(pool, container, workspace)
+			else:
+				chunks = cls._stream_container(workspace, limits)
+
+			for stream, data in chunks:
+				if stream == "timeout":
+					error += cls.TIMEOUT_ERROR
+				else:
+					yield {"event": stream, "data": data}
+
+		except Exception as e:
+			error += f"Unexpected error: {str(e)}\n"
+		finally:
+			# Releases the container, also when the client disconnects mid-stream
+			if chunks is not None:
+				chunks.close()
+			created_files = workspace.files()
+			with stage("cleanup"):
+				workspace.cleanup()
+
+		EXECUTIONS.inc(result=cls._outcome(error, not error))
+
+		done = {"event": "done", "error": error, "files": created_files}
+		cls._describe_files(done, workspace)
+		yield done
+
+	@classmethod
+	def _describe_files(cls, result, workspace):
+		"""Adds the number of files left out and the URL of the bundle of all files to a result."""
+		if workspace.files_omitted:
+			result["files_omitted"] = workspace.files_omitted
+		if cls.artifact_store is not None and result["files"]:
+			try:
+				manifest = cls.artifact_store.put_manifest(result["files"])
+				result["bundle_url"] = f"/artifacts/bundles/{manifest}.tar.gz"
+			except OSError as e:
+				logger.warning("Could not store the bundle manifest: %s", e)
+
+	@classmethod
+	def _artifacts_available(cls, result):
+		"""Whether the stored files of a result can still be downloaded, keeping them for longer."""
+		if cls.artifact_store is None:
+			return True
+		stored = [file for file in result["files"] if "sha256" in file]
+		if not all([cls.artifact_store.touch(file["sha256"]) for file in stored]):
+			return False
+		if stored:
+			# Stores the manifest again if it was removed before the files
+			cls.artifact_store.put_manifest(stored)
+		return True
+
+	@classmethod
+	def _prepare_workspace(cls, file):
+		"""
+		Runs the security check on the uploaded file and prepares the workspace of the job.
+		Returns:
+			tuple: Workspace and an error result (None on success)
+		"""
 		if not file or file.filename == "":
-			return {
+			return None, {
 			    "error": "File is not provided or does not have a name",
 			    "output": "",
 			    "files": [],
 			}
 
-		# Create a unique directory for each request
-		unique_folder = os.path.join(Config.UPLOAD_FOLDER, uuid.uuid4().hex)
-		os.makedirs(unique_folder, exist_ok=True)
+		if Config.WORKSPACE_MODE == "container":
+			# Nothing touches the host disk, the checked script is sent into the sandbox
+			with stage("save"):
+				data = file.read()
+			with stage("security_check"):
+				result = PythonSecurityChecker.check_upload(data)
+			cls._count_findings(result)
+			return ContainerWorkspace(root=Config.CONTAINER_WORKSPACE,
+			                          script=result.safe_content.encode("utf-8"),
+			                          artifact_limits=cls.artifact_limits(),
+			                          artifact_store=cls.artifact_store), None
+
+		with stage("save"):
+			# Create a unique directory for each request
+			unique_folder = os.path.join(Config.UPLOAD_FOLDER, uuid.uuid4().hex)
+			os.makedirs(unique_folder, exist_ok=True)
 
-		# Save the file as script.py in the unique folder
-		filename = "script.py"
-		filepath = os.path.join(unique_folder, filename)
-		file.save(filepath)
+			# Save the file as script.py in the unique folder
+			filepath = os.path.join(unique_folder, VolumeWorkspace.SCRIPT_NAME)
+			file.save(filepath)
 
 		if not os.path.exists(filepath):
-			return {
+			return None, {
 			    "error":
 			        "File is not saved on the server, connection error, code 500",
 			    "output":
@@ -38,70 +290,338 @@ class CodeExecutor:
 			    "files": [],
 			}
 
-		filepath = PythonSecurityChecker.check_file(file_path=filepath)
+		with stage("security_check"):
+			result = PythonSecurityChecker.scan_file(file_path=filepath)
+		cls._count_findings(result)
 
-		created_files = []
-		output = ""
-		error = ""
+		return VolumeWorkspace(unique_folder,
+		                       cls._sandbox_volumes(),
+		                       artifact_limits=cls.artifact_limits(),
+		                       artifact_store=cls.artifact_store), None
 
-		# Initialize the Docker client from the environment
-		docker_client = docker.from_env()
+	@classmethod
+	def _outcome(cls, error, complete):
+		"""Result label of a finished execution for the metrics."""
+		if complete:
+			return "ok"
+		return "timeout" if cls.TIMEOUT_ERROR in error else "error"
 
-		try:
-			# Start the container by mounting a unique folder in the container (under the path /app),
-			# setting the /app working directory and passing an environment variable to disable buffering.
-			container = docker_client.containers.run(
-			    image="python:3.10.6-slim",
-			    working_dir=f"{unique_folder}",
-			    environment={"PYTHONUNBUFFERED": "1"},
-			    detach=True,
-			    volumes={
-			        "cloudcode_uploads": {
-			            "bind": f"{Config.UPLOAD_FOLDER}",
-			            "mode": "rw",  # Ensure read-write permissions
-			        }
-			    },
-			    command=["python", "-u", filename],
+	@staticmethod
+	def _count_findings(result):
+		"""Counts the unsafe operations removed by the security check by type."""
+		for operation in result.unsafe_operations:
+			SECURITY_FINDINGS.inc(type=operation.get("type", "unknown"))
+
+	@classmethod
+	def _result_key(cls, workspace, limits):
+		"""Cache key of the result of a workspace, None if results are not cached."""
+		if cls.result_cache is None:
+			return None
+		digest = workspace.digest()
+		if digest is None:
+			return None
+		# The same script may behave differently on another image or with other limits
+		return (digest, Config.CONTAINER_IMAGE, Config.EXECUTION_TIMEOUT, limits)
+
+	@staticmethod
+	def _decode_chunks(chunks):
+		"""Decodes demultiplexed (stdout, stderr) byte chunks into (stream, text) pairs."""
+		decoders = {
+		    "stdout": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+		    "stderr": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+		}
+		for stdout, stderr in chunks:
+			for stream, data in (("stdout", stdout), ("stderr", stderr)):
+				if data:
+					text = decoders[stream].decode(data)
+					if text:
+						yield stream, text
+
+		for stream, decoder in decoders.items():
+			text = decoder.decode(b"", final=True)
+			if text:
+				yield stream, text
+
+	@staticmethod
+	def artifact_limits():
+		"""Caps on the created files returned with a result."""
+		return ArtifactLimits(
+		    max_files=Config.ARTIFACT_MAX_FILES,
+		    max_file_size=Config.ARTIFACT_MAX_FILE_SIZE,
+		    max_total_size=Config.ARTIFACT_MAX_TOTAL_SIZE,
+		)
+
+	@staticmethod
+	def _sandbox_volumes():
+		"""Volumes mounted into every sandbox container."""
+		if Config.WORKSPACE_MODE == "container":
+			return {}
+		return {
+		    Config.UPLOAD_VOLUME: {
+		        "bind": f"{Config.UPLOAD_FOLDER}",
+		        "mode": "rw",  # Ensure read-write permissions
+		    }
+		}
+
+	@staticmethod
+	def _scratch_dirs():
+		"""Folders emptied inside a pooled container after every job."""
+		if Config.WORKSPACE_MODE == "container":
+			return ("/tmp", Config.CONTAINER_WORKSPACE)
+		return ("/tmp",)
+
+	@classmethod
+	def _start_container(cls, workspace, limits, command=None, environment=None):
+		"""
+		Creates a fresh sandbox container, copies the workspace into it and starts it.
+		Args:
+			workspace (Workspace): Files of the job
+			limits (ResourceLimits): Resource quotas of the container
+			command (list): Command of the container, defaults to running the script
+			environment (dict): Variables added to the environment of the command
+		"""
+
+		def create(client):
+			return client.containers.create(
+			    image=Config.CONTAINER_IMAGE,
+			    working_dir=workspace.workdir,
+			    environment=dict(environment or {}, PYTHONUNBUFFERED="1"),
+			    volumes=workspace.volumes,
+			    command=command or ["python", "-u", workspace.SCRIPT_NAME],
+			    **limits.container_options(),
 			)
 
-			# Wait for the container to complete with the specified timeout.
-			# The wait method will return the completion status.
+		with stage("container_create"):
 			try:
-				container.wait(timeout=Config.EXECUTION_TIMEOUT)
-			except (ReadTimeoutError, ConnectionError,
-			        docker.errors.DockerException):
-				# If the container did not complete on time, throw an exception
-				# error += f"ReadTimeoutError (ConnectionError) or Docker errors: {str(e)}\n"
-				container.kill()
-				error += "Execution time out, code 500\n"
+				container = cls.docker_client.run(create)
+			except docker.errors.ImageNotFound:
+				cls.docker_client.run(
+				    lambda client: client.images.pull(Config.CONTAINER_IMAGE))
+				container = cls.docker_client.run(create)
 
-			# Get the container logs
-			output += container.logs(stdout=True, stderr=False,
-			                         tail="all").decode("utf-8")
-			stderr_output = (container.logs(stdout=False,
-			                                stderr=True,
-			                                tail="all").decode("utf-8").strip())
-			error += stderr_output + "\n"
+		try:
+			with stage("upload"):
+				workspace.upload(container)
+			with stage("container_start"):
+				container.start()
+		except Exception:
+			container.remove(force=True)
+			raise
 
-		except Exception as e:
-			error += f"Unexpected error: {str(e)}\n"
-		finally:
-			# Collect all created files except the source code
-			for item in os.listdir(unique_folder):
-				item_path = os.path.join(unique_folder, item)
-				if os.path.isfile(item_path) and item != "script.py":
-					with open(item_path, "r", encoding="utf-8") as f:
-						created_files.append({
-						    "filename": item,
-						    "content": f.read()
-						})
-			# Delete the folder after execution
-			shutil.rmtree(unique_folder, ignore_errors=True)
+		with cls._fresh_containers_lock:
+			cls.fresh_containers += 1
+		return container
+
+	@classmethod
+	def _remove_container(cls, container):
+		"""Attempts to forcibly delete a container started by `_start_container` (if it still exists)."""
+		if container is None:
+			return
 
-			# Attempt to forcibly delete the container (if it still exists)
+		with stage("container_remove"):
 			try:
 				container.remove(force=True)
 			except Exception:
 				pass
 
-		return {"output": output, "error": error, "files": created_files}
+		with cls._fresh_containers_lock:
+			cls.fresh_containers -= 1
+
+	@staticmethod
+	def _kill_timer(container):
+		"""
+		Kills the container once the execution time limit has passed.
+		Returns:
+			tuple: Started timer (to be cancelled) and the event set when it fired
+		"""
+		timed_out = threading.Event()
+
+		def kill():
+			timed_out.set()
+			try:
+				container.kill()
+			except Exception:
+				pass
+
+		timer = threading.Timer(Config.EXECUTION_TIMEOUT, kill)
+		timer.daemon = True
+		timer.start()
+		return timer, timed_out
+
+	@staticmethod
+	def output_options():
+		"""
+		Options of the output capture: bytes kept from the start and the end of
+		each view, and whether the interleaved view is captured, see `CapturedOutput`.
+		"""
+		if not Config.OUTPUT_HEAD_BYTES and not Config.OUTPUT_TAIL_BYTES:
+			limits = {"head_bytes": None, "tail_bytes": 0}
+		else:
+			limits = {
+			    "head_bytes": Config.OUTPUT_HEAD_BYTES,
+			    "tail_bytes": Config.OUTPUT_TAIL_BYTES,
+			}
+		return dict(limits, combined=Config.OUTPUT_COMBINED)
+
+	@staticmethod
+	def _captured_texts(captured, marker):
+		"""
+		Texts of the captured output without the usage report, counting the dropped bytes.
+		Returns:
+			tuple: stdout, stderr, the interleaved view (None if not captured) and the reported usage
+		"""
+		for stream, capture in (("stdout", captured.stdout), ("stderr", captured.stderr)):
+			if capture.dropped:
+				OUTPUT_DROPPED_BYTES.inc(capture.dropped, stream=stream)
+
+		stderr_output, usage = split_usage(captured.stderr.text(), marker)
+		combined = None
+		if captured.combined is not None:
+			combined, _ = split_usage(captured.combined.text(), marker)
+		return captured.stdout.text(), stderr_output, combined, usage
+
+	@staticmethod
+	def _command(workspace):
+		"""
+		Command running the script of a job, under resource accounting if enabled.
+		Returns:
+			tuple: Command, its extra environment and the marker of the usage report
+			on stderr (None without accounting)
+		"""
+		if not Config.RESOURCE_ACCOUNTING:
+			return ["python", "-u", workspace.SCRIPT_NAME], {}, None
+		return accounting_command(workspace.SCRIPT_NAME)
+
+	@classmethod
+	def _run_pooled(cls, pool, container, workspace):
+		"""Runs the script inside a warm container taken from the pool."""
+		error = ""
+		healthy = False
+		command, environment, marker = cls._command(workspace)
+		try:
+			with stage("upload"):
+				workspace.upload(container)
+			# The output is read from the exec call, there is no separate log retrieval
+			with stage("wait"):
+				timed_out, captured = pool.execute(
+				    container,
+				    workdir=workspace.workdir,
+				    command=command,
+				    environment=environment,
+				    timeout=Config.EXECUTION_TIMEOUT,
+				    **cls.output_options(),
+				)
+			output, stderr_output, combined, usage = cls._captured_texts(
+			    captured, marker)
+
+			if timed_out:
+				error += cls.TIMEOUT_ERROR
+			error += stderr_output.strip() + "\n"
+			with stage("collect"):
+				workspace.collect(container)
+			healthy = not timed_out
+		finally:
+			# A failed or timed out job may have left the container in a bad state
+			pool.release(container, healthy=healthy)
+
+		return output, error, usage, combined
+
+	@classmethod
+	def _run_container(cls, workspace, limits):
+		"""Runs the script in a fresh container which is removed afterwards."""
+		output = ""
+		error = ""
+		usage = None
+		combined = None
+		container = None
+		timer = None
+		command, environment, marker = cls._command(workspace)
+
+		try:
+			# Start the container in the job folder (mounted from the upload volume or
+			# copied into the container) with an environment variable disabling buffering.
+			container = cls._start_container(workspace, limits, command,
+			                                 environment)
+			timer, timed_out = cls._kill_timer(container)
+
+			# The output is read in one demultiplexed stream while the script runs,
+			# the stream ends when the container exits or is killed at the time limit
+			with stage("wait"):
+				chunks = container.attach(stdout=True,
+				                          stderr=True,
+				                          stream=True,
+				                          logs=True,
+				                          demux=True)
+				captured = capture_output(chunks, **cls.output_options())
+			if timed_out.is_set():
+				error += cls.TIMEOUT_ERROR
+
+			output, stderr_output, combined, usage = cls._captured_texts(
+			    captured, marker)
+			error += stderr_output.strip() + "\n"
+			with stage("collect"):
+				workspace.collect(container)
+		finally:
+			if timer is not None:
+				timer.cancel()
+			cls._remove_container(container)
+
+		return output, error, usage, combined
+
+	@classmethod
+	def _stream_pooled(cls, pool, container, workspace):
+		"""Streams the output of the script run inside a pooled container."""
+		timed_out = True
+		timer = None
+		try:
+			workspace.upload(container)
+			started_at = time.monotonic()
+			exec_id, chunks = pool.start_exec(
+			    container,
+			    workdir=workspace.workdir,
+			    command=["python", "-u", workspace.SCRIPT_NAME],
+			    timeout=Config.EXECUTION_TIMEOUT,
+			    stream=True,
+			)
+			timer, killed = pool.kill_timer(container, Config.EXECUTION_TIMEOUT)
+			yield from cls._decode_chunks(chunks)
+			timer.cancel()
+
+			timed_out = killed.is_set() or pool.timed_out(
+			    exec_id,
+			    time.monotonic() - started_at, Config.EXECUTION_TIMEOUT)
+			if timed_out:
+				yield "timeout", None
+			workspace.collect(container)
+		finally:
+			if timer is not None:
+				timer.cancel()
+			# Also reached when the client disconnects in the middle of the stream
+			pool.release(container, healthy=not timed_out)
+
+	@classmethod
+	def _stream_container(cls, workspace, limits):
+		"""Streams the output of the script run in a fresh container."""
+		container = None
+		timer = None
+
+		try:
+			container = cls._start_container(workspace, limits)
+
+			# The attached stream ends when the container exits or is killed
+			timer, timed_out = cls._kill_timer(container)
+
+			chunks = container.attach(stdout=True,
+			                          stderr=True,
+			                          stream=True,
+			                          logs=True,
+			                          demux=True)
+			yield from cls._decode_chunks(chunks)
+
+			if timed_out.is_set():
+				yield "timeout", None
+			workspace.collect(container)
+		finally:
+			if timer is not None:
+				timer.cancel()
+			cls._remove_container(container)
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobQueue:
+    """
+    Bounded queue of code execution jobs drained by a fixed pool of worker threads.
+    Submitting a job returns immediately, the result is kept until `result_ttl`
+    seconds after the job has finished. At most `max_results` finished jobs are
+    kept, the oldest are dropped first.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        handler: Callable[..., Dict[str, Any]],
+        workers: int = 4,
+        max_queued: int = 1000,
+        result_ttl: int = 600,
+        max_results: int = 10000,
+    ):
+        """
+        Args:
+                handler (Callable): Function executing a job, called with the submitted arguments
+                workers (int): Number of worker threads
+                max_queued (int): Maximum number of jobs waiting for a worker
+                result_ttl (int): Seconds a finished job is kept for polling
+                max_results (int): Maximum number of finished jobs kept for polling
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.result_ttl = result_ttl
+        self.max_results = max(1, max_results)
+
+        self._queue = queue.Queue(maxsize=max(1, max_queued))
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Finished jobs in the order they finished
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Starts the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"job-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, *args, **kwargs) -> str:
+        """
+        Enqueues a job.
+        Returns:
+                str: Job identifier
+        Raises:
+                JobQueueFull: If the queue is at capacity
+        """
+        self._purge_expired()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": self.QUEUED,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+
+        try:
+            self._queue.put_nowait((job_id, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            raise JobQueueFull("Job queue is full")
+
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the job status without its result.
+        Returns:
+                dict or None: Job status, or None if the job is unknown or expired
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key != "result"}
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the result of a finished job.
+        Returns:
+                dict or None: Execution result, or None if the job has not finished yet
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["result"] if job is not None else None
+
+    def depth(self) -> int:
+        """Returns the number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def _worker(self) -> None:
+        while True:
+            job_id, args, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["status"] = self.RUNNING
+                    job["started_at"] = time.time()
+
+            try:
+                result = self.handler(*args, **kwargs)
+                status = self.COMPLETED
+            except Exception as e:
+                result = {
+                    "output": "",
+                    "error": f"Unexpected error: {str(e)}\n",
+                    "files": [],
+                }
+                status = self.FAILED
+
+            with self._lock:
+                if job is not None:
+                    job["result"] = result
+                    job["status"] = status
+                    job["finished_at"] = time.time()
+                    self._finished[job_id] = None
+                    while len(self._finished) > self.max_results:
+                        oldest, _ = self._finished.popitem(last=False)
+                        self._jobs.pop(oldest, None)
+
+            self._queue.task_done()
+
+    def _purge_expired(self) -> None:
+        deadline = time.time() - self.result_ttl
+        with self._lock:
+            while self._finished:
+                job_id = next(iter(self._finished))
+                if self._jobs[job_id]["finished_at"] >= deadline:
+                    break
+                del self._finished[job_id]
+                del self._jobs[job_id]
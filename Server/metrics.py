@@ -0,0 +1,305 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from a cached lookup to a script hitting the execution timeout
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. executions by result."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Distribution of durations in cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: observations per bucket (last one is +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observes the duration of the `with` block, also when it raises."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([], [0.0]))
+            return sum(counts)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Current value read when the metrics are rendered, e.g. the queue depth.
+    The function returns a number, or a dict of label value tuples to numbers
+    for gauges with labels.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _samples(self) -> List[str]:
+        value = self.function()
+        if not self.labelnames:
+            return [f"{self.name} {_format_value(value)}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(item)}"
+            for key, item in sorted(value.items())
+        ]
+
+
+class CounterFunction(Gauge):
+    """
+    Counter kept by another component and read when the metrics are rendered,
+    e.g. the hits of a cache. The function returns values like a gauge's.
+    """
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    """
+    Metrics of one server process, rendered in the Prometheus text format.
+    Metrics are kept per process, with several workers every worker is
+    scraped on its own.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, function: Callable, labelnames: Sequence[str] = ()) -> Gauge:
+        """Registers a gauge, replacing an earlier gauge of the same name."""
+        gauge = Gauge(name, documentation, function, labelnames)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def counter_function(
+        self, name: str, documentation: str, function: Callable, labelnames: Sequence[str] = ()
+    ) -> CounterFunction:
+        """Registers a counter read from `function`, replacing an earlier one of the same name."""
+        counter = CounterFunction(name, documentation, function, labelnames)
+        with self._lock:
+            self._metrics[name] = counter
+        return counter
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing gauge function must not break the whole scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "cloudcode_stage_duration_seconds",
+    "Duration of the stages of an execution",
+    ["stage"],
+)
+EXECUTIONS = REGISTRY.counter(
+    "cloudcode_executions_total",
+    "Finished executions by result (ok, timeout, error, cached, rejected)",
+    ["result"],
+)
+SECURITY_FINDINGS = REGISTRY.counter(
+    "cloudcode_security_findings_total",
+    "Unsafe operations removed by the security check, by type",
+    ["type"],
+)
+DB_AUTH_DURATION = REGISTRY.histogram(
+    "cloudcode_db_auth_duration_seconds",
+    "Duration of API key validations, including cached lookups",
+)
+OUTPUT_DROPPED_BYTES = REGISTRY.counter(
+    "cloudcode_output_dropped_bytes_total",
+    "Bytes of script output dropped between the kept head and tail, by stream",
+    ["stream"],
+)
+USAGE_CPU_SECONDS = REGISTRY.counter(
+    "cloudcode_cpu_seconds_total",
+    "CPU time used by scripts, by user tier",
+    ["tier"],
+)
+ACCOUNTING_FAILURES = REGISTRY.counter(
+    "cloudcode_accounting_failures_total",
+    "Executions without a valid usage report, by user tier",
+    ["tier"],
+)
+PEAK_MEMORY = REGISTRY.histogram(
+    "cloudcode_peak_memory_mb",
+    "Peak memory of scripts in MB, by user tier",
+    ["tier"],
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+
+# Stage durations of the request being handled, set by `record_timings`
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def record_timings():
+    """
+    Collects the durations of the stages run inside the `with` block (in the
+    current thread) into the yielded dict, in seconds by stage name.
+    """
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def stage(name: str, histogram: Optional[Histogram] = None):
+    """
+    Times a stage of an execution for the metrics and the timings of the request.
+    Args:
+            name (str): Stage name, key in the timings
+            histogram (Histogram): Histogram without labels observed instead of the stage histogram
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        if histogram is not None:
+            histogram.observe(elapsed)
+        else:
+            STAGE_DURATION.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
@@ -0,0 +1,144 @@
+import codecs
+import struct
+from typing import Callable, Iterable, NamedTuple, Optional, Tuple
+
+
+class OutputCapture:
+    """
+    Keeps the first `head_bytes` and the last `tail_bytes` of an output stream,
+    the bytes in between are only counted. Memory stays bounded however much
+    a script prints, while the start of the output and the final lines (e.g. a
+    traceback) are kept.
+    """
+
+    def __init__(self, head_bytes: Optional[int] = None, tail_bytes: int = 0):
+        """
+        Args:
+                head_bytes (int): Bytes kept from the start, None keeps the whole output
+                tail_bytes (int): Bytes kept from the end
+        """
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.size = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+
+    @property
+    def dropped(self) -> int:
+        """Number of bytes left out between head and tail."""
+        return self.size - len(self._head) - len(self._tail)
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+
+        if self.head_bytes is None or len(self._head) < self.head_bytes:
+            room = len(data) if self.head_bytes is None else self.head_bytes - len(self._head)
+            self._head += data[:room]
+            data = data[room:]
+        if not data or not self.tail_bytes:
+            return
+
+        if len(data) >= self.tail_bytes:
+            self._tail = bytearray(data[-self.tail_bytes:])
+        else:
+            self._tail += data
+            # Ring buffer: the oldest bytes of the tail give way to the new ones
+            if len(self._tail) > self.tail_bytes:
+                del self._tail[:len(self._tail) - self.tail_bytes]
+
+    def text(self) -> str:
+        """Returns the kept output, with a marker counting the dropped bytes between head and tail."""
+        if not self.dropped:
+            return (self._head + self._tail).decode("utf-8", errors="replace")
+
+        # The cuts may split multi-byte characters, their pieces are dropped
+        head = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(bytes(self._head))
+        tail = bytes(self._tail).lstrip(bytes(range(0x80, 0xC0)))
+        return head + f"\n[... {self.dropped} bytes dropped ...]\n" + tail.decode("utf-8", errors="replace")
+
+
+class CapturedOutput(NamedTuple):
+    """Captures of one execution, `combined` holds both streams in the order they were written."""
+
+    stdout: OutputCapture
+    stderr: OutputCapture
+    combined: Optional[OutputCapture] = None
+
+    @classmethod
+    def create(cls, head_bytes: Optional[int] = None, tail_bytes: int = 0, combined: bool = False) -> "CapturedOutput":
+        """
+        Args:
+                head_bytes (int): Bytes kept from the start of each view, None keeps all output
+                tail_bytes (int): Bytes kept from the end of each view
+                combined (bool): Also capture the interleaved view of stdout and stderr
+        """
+        return cls(
+            OutputCapture(head_bytes, tail_bytes),
+            OutputCapture(head_bytes, tail_bytes),
+            OutputCapture(head_bytes, tail_bytes) if combined else None,
+        )
+
+    def write_stdout(self, data: bytes) -> None:
+        self.stdout.write(data)
+        if self.combined is not None:
+            self.combined.write(data)
+
+    def write_stderr(self, data: bytes) -> None:
+        self.stderr.write(data)
+        if self.combined is not None:
+            self.combined.write(data)
+
+
+class FrameDemuxer:
+    """
+    Splits the multiplexed output of a container without TTY while it is read.
+    Every frame starts with an 8 byte header: stream type (1 stdout, 2 stderr),
+    three zero bytes and the big-endian payload size.
+    """
+
+    def __init__(self, output: CapturedOutput):
+        self._streams = {1: output.write_stdout, 2: output.write_stderr}
+        self._buffer = bytearray()
+        self._remaining = 0
+        self._write: Optional[Callable[[bytes], None]] = None
+
+    def feed(self, data: bytes) -> None:
+        """Passes the payload of the frames in `data` to their capture, frames may span calls."""
+        self._buffer += data
+        while self._buffer:
+            if self._remaining:
+                payload = bytes(self._buffer[:self._remaining])
+                del self._buffer[:len(payload)]
+                self._remaining -= len(payload)
+                if self._write is not None:
+                    self._write(payload)
+                continue
+            if len(self._buffer) < 8:
+                return
+            stream, self._remaining = struct.unpack(">BxxxL", self._buffer[:8])
+            del self._buffer[:8]
+            self._write = self._streams.get(stream)
+
+
+def capture_output(
+    chunks: Iterable[Tuple[Optional[bytes], Optional[bytes]]],
+    head_bytes: Optional[int] = None,
+    tail_bytes: int = 0,
+    combined: bool = False,
+) -> CapturedOutput:
+    """
+    Reads demultiplexed (stdout, stderr) chunks, as returned by docker-py with
+    `demux=True`, in a single pass.
+    Args:
+            chunks (Iterable): Output chunks in the order the daemon sent them
+            head_bytes (int): Bytes kept from the start of each view, None keeps all output
+            tail_bytes (int): Bytes kept from the end of each view
+            combined (bool): Also capture the interleaved view of stdout and stderr
+    """
+    output = CapturedOutput.create(head_bytes, tail_bytes, combined)
+    for out, err in chunks:
+        if out:
+            output.write_stdout(out)
+        if err:
+            output.write_stderr(err)
+    return output
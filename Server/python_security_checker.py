@@ -1,10 +1,47 @@
+import hashlib
+import logging
+import multiprocessing
 import os
 import re
-from typing import List, Set, Tuple, Dict, Any
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from itertools import accumulate
+from typing import List, Optional, Set, Tuple, Dict, Any
 from abc import ABC
 
+from Server.ast_security_analyzer import AstSecurityAnalyzer
+from Server.cache import TTLCache
+from Server.regex_prefilter import RegexPrefilter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """
+    Result of checking one file, immutable so it can be cached and shared between threads.
+    """
+
+    unsafe_operations: Tuple[Dict[str, Any], ...]
+    unsafe_lines: Tuple[int, ...]
+    safe_content: str
+    safe_file_path: Optional[str] = None
+
+    @property
+    def is_safe(self) -> bool:
+        return not self.unsafe_operations
+
 
 class PythonSecurityChecker(ABC):
+    # Available analysis engines, see `setup`
+    ENGINES = ("regex", "ast")
+
+    _scan_pool = None
+    _scan_pool_lock = threading.Lock()
+
     # Dangerous modules to be removed
     DANGEROUS_MODULES: Set[str] = {
         "eval",
@@ -498,18 +535,32 @@ class PythonSecurityChecker(ABC):
 
     @classmethod
     def setup(
-        cls, max_file_size: int = 1024 * 1024, is_docker_environment: bool = False
+        cls,
+        max_file_size: int = 1024 * 1024,
+        is_docker_environment: bool = False,
+        engine: str = "regex",
+        cache_size: int = 1024,
+        cache_bytes: int = 64 * 1024 * 1024,
+        scan_workers: int = 0,
     ):
         """
         Configure the security checker parameters.
         Args:
                 max_file_size (int): Maximum file size in bytes
                 is_docker_environment (bool): Flag indicating whether the checker is running in a Docker environment
+                engine (str): "regex" for the line-based scan, "ast" for the single-pass syntax tree analyzer
+                cache_size (int): Number of check results cached by content hash, 0 disables the cache
+                cache_bytes (int): Maximum memory of the cached results, larger results are not cached
+                scan_workers (int): Number of worker processes scanning files, 0 scans in the calling thread
         Returns:
                 dict: Configuration details
         """
+        if engine not in cls.ENGINES:
+            raise ValueError(f"Unknown security engine: {engine}")
+
         cls.max_file_size = max_file_size
         cls.is_docker_environment = is_docker_environment
+        cls.engine = engine
         cls.last_unsafe_operations = []
 
         cls._compiled_regex_patterns = [
@@ -521,6 +572,15 @@ class PythonSecurityChecker(ABC):
             for pattern, description in cls.SENSITIVE_DATA_PATTERNS
         ]
 
+        # Both tables are scanned over the whole file at once to find the few
+        # candidate lines the per-pattern loop has to check
+        cls._regex_prefilter = RegexPrefilter(
+            pattern for pattern, _, _ in cls.REGEX_PATTERNS
+        )
+        cls._sensitive_prefilter = RegexPrefilter(
+            pattern for pattern, _ in cls.SENSITIVE_DATA_PATTERNS
+        )
+
         # Dangerous os module functions
         cls.dangerous_os_funcs = set(
             [
@@ -599,19 +659,166 @@ class PythonSecurityChecker(ABC):
             "Stripe API": ["pk_test_", "sk_test_", "pk_live_", "sk_live_"],
         }
 
+        # Lookup tables of the AST engine
+        cls._ast_call_rules = AstSecurityAnalyzer.build_call_rules(cls)
+        cls._ast_credential_names = {
+            name.lower() for name in cls.DANGEROUS_VARIABLE_NAMES
+        }
+
+        # Results of identical files are reused, the key includes the rule-set
+        # version so changing the rules or the engine never returns stale results
+        cls.ruleset_version = cls._ruleset_version()
+        # Every result keeps the whole safe content, the byte limit keeps a
+        # full cache of large uploads from holding gigabytes per worker
+        cls.result_cache = TTLCache(
+            max_size=cache_size, max_bytes=cache_bytes, sizeof=_result_size
+        ) if cache_size > 0 else None
+
+        # Scanning is pure-Python CPU work holding the GIL, worker processes
+        # let several large uploads be scanned in parallel
+        cls.shutdown_workers()
+        cls.scan_workers = scan_workers
+        if scan_workers > 0:
+            cls._scan_pool = cls._create_scan_pool()
+
         return {
             "max_file_size": cls.max_file_size,
             "is_docker_environment": cls.is_docker_environment,
+            "engine": cls.engine,
+            "cache_size": cache_size,
+            "cache_bytes": cache_bytes,
+            "scan_workers": scan_workers,
         }
 
     @classmethod
-    def check_file(cls, file_path: str) -> str:
+    def _create_scan_pool(cls) -> ProcessPoolExecutor:
+        # Workers are spawned rather than forked from the multi-threaded server,
+        # each one runs `setup` once so the patterns are compiled once per worker
+        return ProcessPoolExecutor(
+            max_workers=cls.scan_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_scan_worker,
+            initargs=(
+                {
+                    "max_file_size": cls.max_file_size,
+                    "is_docker_environment": cls.is_docker_environment,
+                    "engine": cls.engine,
+                },
+            ),
+        )
+
+    @classmethod
+    def shutdown_workers(cls) -> None:
         """
-        Check a Python file for dangerous code and create a safe version.
+        Stops the scanning worker processes, later checks run in the calling thread.
+        """
+        with cls._scan_pool_lock:
+            pool, cls._scan_pool = cls._scan_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    @classmethod
+    def _ruleset_version(cls) -> str:
+        """
+        Fingerprint of everything that influences the result of a check.
+        Returns:
+                str: Hex digest identifying the configured rule set
+        """
+        rules = [
+            cls.engine,
+            cls.is_docker_environment,
+            cls.REGEX_PATTERNS,
+            cls.SENSITIVE_DATA_PATTERNS,
+            cls.api_tokens,
+            [pattern.pattern for pattern in cls.safe_subprocess_patterns],
+        ]
+        for rule_set in (
+            cls.DANGEROUS_MODULES,
+            cls.SAFE_MODULES,
+            cls.DANGEROUS_OPERATIONS,
+            cls.SSRF_KEYWORDS,
+            cls.DANGEROUS_URL_SCHEMES,
+            cls.DANGEROUS_VARIABLE_NAMES,
+            cls.dangerous_os_funcs,
+            cls.dangerous_sys_funcs,
+        ):
+            rules.append(sorted(rule_set))
+        return hashlib.sha256(repr(rules).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """
+        Returns size, eviction and hit-rate counters of the check result cache.
+        Returns:
+                Dict[str, Any]: Cache statistics, empty if the cache is disabled
+        """
+        if getattr(cls, "result_cache", None) is None:
+            return {}
+        return cls.result_cache.stats()
+
+    @classmethod
+    def check_content(cls, content: str) -> CheckResult:
+        """
+        Checks Python source code for dangerous code.
+        Reentrant: the result is returned instead of being stored on the class,
+        so any number of threads or processes may check files at the same time.
+        Args:
+                content (str): Source code to check
+        Returns:
+                CheckResult: Unsafe operations, their lines and the safe version of the code
+        """
+        if not hasattr(cls, "_compiled_regex_patterns"):
+            cls.setup()
+
+        cache_key = None
+        if cls.result_cache is not None:
+            digest = hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+            cache_key = (digest, cls.ruleset_version)
+            cached = cls.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        pool = cls._scan_pool
+        if pool is not None:
+            try:
+                result = pool.submit(_scan_in_worker, content).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed by the OOM killer), replace the pool
+                # and scan this file here
+                with cls._scan_pool_lock:
+                    if cls._scan_pool is pool:
+                        logger.warning("Security scan worker pool is broken, restarting it")
+                        pool.shutdown(wait=False)
+                        cls._scan_pool = cls._create_scan_pool()
+                result = cls._scan(content)
+        else:
+            result = cls._scan(content)
+
+        if cache_key is not None:
+            cls.result_cache.set(cache_key, result)
+        return result
+
+    @classmethod
+    def _scan(cls, content: str) -> CheckResult:
+        unsafe_operations, unsafe_lines = cls._detect_unsafe_code(content)
+        return CheckResult(
+            unsafe_operations=tuple(unsafe_operations),
+            unsafe_lines=tuple(sorted(unsafe_lines)),
+            safe_content=cls._create_safe_content(
+                content, unsafe_lines, unsafe_operations
+            ),
+        )
+
+    @classmethod
+    def scan_file(cls, file_path: str) -> CheckResult:
+        """
+        Checks a Python file and writes its safe version next to it.
         Args:
                 file_path (str): Path to the Python file to check
         Returns:
-                str: Path to the safe version of the file
+                CheckResult: Check result with `safe_file_path` set
+        Raises:
+                ValueError: If the file is invalid or cannot be checked
         """
         try:
             cls._validate_file(file_path)
@@ -619,16 +826,46 @@ class PythonSecurityChecker(ABC):
             with open(file_path, "r", encoding="utf-8") as file:
                 content = file.read()
 
-            unsafe_operations, unsafe_lines = cls._detect_unsafe_code(content)
-            cls.last_unsafe_operations = unsafe_operations
-
-            safe_content = cls._create_safe_content(content, unsafe_lines)
-            safe_file_path = cls._create_safe_file(file_path, safe_content)
+            result = cls.check_content(content)
+            safe_file_path = cls._create_safe_file(file_path, result.safe_content)
+            return replace(result, safe_file_path=safe_file_path)
+        except Exception as e:
+            raise ValueError(f"Error checking file: {str(e)}")
 
-            return safe_file_path
+    @classmethod
+    def check_upload(cls, data: bytes) -> CheckResult:
+        """
+        Checks an uploaded Python file that is only held in memory.
+        Args:
+                data (bytes): Raw file content
+        Returns:
+                CheckResult: Check result, `safe_file_path` is not set
+        Raises:
+                ValueError: If the file is too large or cannot be checked
+        """
+        try:
+            cls._validate_size(len(data))
+            # Same decoding and newline translation as reading the file in text mode
+            content = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            return cls.check_content(content)
         except Exception as e:
             raise ValueError(f"Error checking file: {str(e)}")
 
+    @classmethod
+    def check_file(cls, file_path: str) -> str:
+        """
+        Check a Python file for dangerous code and create a safe version.
+        Kept for compatibility, the operations found are also published through
+        `get_unsafe_operations`, which is not safe for concurrent use. Prefer `scan_file`.
+        Args:
+                file_path (str): Path to the Python file to check
+        Returns:
+                str: Path to the safe version of the file
+        """
+        result = cls.scan_file(file_path)
+        cls.last_unsafe_operations = list(result.unsafe_operations)
+        return result.safe_file_path
+
     @classmethod
     def get_unsafe_operations(cls) -> List[Dict[str, Any]]:
         """
@@ -656,7 +893,10 @@ class PythonSecurityChecker(ABC):
         if not file_path.endswith(".py"):
             raise ValueError(f"Not a Python file: {file_path}")
 
-        file_size = os.path.getsize(file_path)
+        cls._validate_size(os.path.getsize(file_path))
+
+    @classmethod
+    def _validate_size(cls, file_size: int) -> None:
         if not hasattr(cls, "max_file_size"):
             cls.setup()
 
@@ -670,7 +910,8 @@ class PythonSecurityChecker(ABC):
         cls, content: str
     ) -> Tuple[List[Dict[str, Any]], List[int]]:
         """
-        Optimized method for detecting all types of unsafe code in a single pass.
+        Detects unsafe code with the configured engine.
+        Content that cannot be parsed is always checked by the regex engine.
         Args:
                 content (str): File content for analysis
         Returns:
@@ -679,10 +920,32 @@ class PythonSecurityChecker(ABC):
         if not hasattr(cls, "_compiled_regex_patterns"):
             cls.setup()
 
+        if cls.engine == "ast":
+            try:
+                return AstSecurityAnalyzer(cls).analyze(content)
+            except (SyntaxError, ValueError, RecursionError, MemoryError):
+                pass
+
+        return cls._detect_unsafe_code_regex(content)
+
+    @classmethod
+    def _detect_unsafe_code_regex(
+        cls, content: str
+    ) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Optimized method for detecting all types of unsafe code in a single pass.
+        Args:
+                content (str): File content for analysis
+        Returns:
+                Tuple[List[Dict[str, Any]], List[int]]: Tuple with a list of unsafe operations and lines
+        """
+
         lines = content.split("\n")
         unsafe_operations = []
         unsafe_lines = set()
 
+        regex_candidates, sensitive_candidates = cls._pattern_candidates(content, lines)
+
         for i, line in enumerate(lines, 1):
             if i in unsafe_lines:
                 continue
@@ -828,35 +1091,21 @@ class PythonSecurityChecker(ABC):
             if i in unsafe_lines:
                 continue
 
-            for pattern, description, category in cls._compiled_regex_patterns:
-                if pattern.search(line):
-                    unsafe_lines.add(i)
-                    unsafe_operations.append(
-                        {
-                            "line": i,
-                            "content": line.strip(),
-                            "type": category,
-                            "description": description,
-                        }
-                    )
-                    break
-
-            if i in unsafe_lines:
+            match = cls._match_pattern_tables(
+                line, i, regex_candidates, sensitive_candidates
+            )
+            if match is not None:
+                unsafe_lines.add(i)
+                unsafe_operations.append(
+                    {
+                        "line": i,
+                        "content": line.strip(),
+                        "type": match[0],
+                        "description": match[1],
+                    }
+                )
                 continue
 
-            for pattern, description in cls._compiled_sensitive_patterns:
-                if pattern.search(line):
-                    unsafe_lines.add(i)
-                    unsafe_operations.append(
-                        {
-                            "line": i,
-                            "content": line.strip(),
-                            "type": "sensitive_data",
-                            "description": description,
-                        }
-                    )
-                    break
-
             if "cryptography.hazmat" in line:
                 unsafe_lines.add(i)
                 unsafe_operations.append(
@@ -871,12 +1120,62 @@ class PythonSecurityChecker(ABC):
         return unsafe_operations, list(unsafe_lines)
 
     @classmethod
-    def _create_safe_content(cls, content: str, unsafe_lines: List[int]) -> str:
+    def _pattern_candidates(
+        cls, content: str, lines: List[str], string_lines: Optional[Set[int]] = None
+    ) -> Tuple[Set[int], Set[int]]:
+        """
+        Finds the lines on which REGEX_PATTERNS and SENSITIVE_DATA_PATTERNS may match.
+        Args:
+                content (str): File content for analysis
+                lines (List[str]): The content split into lines
+                string_lines (Set[int]): Lines holding string literals, if known. The table
+                        entries without a literal fragment all match quoted strings and
+                        are only searched there
+        Returns:
+                Tuple[Set[int], Set[int]]: Candidate line numbers of both tables
+        """
+        line_starts = [0]
+        line_starts.extend(accumulate(len(line) + 1 for line in lines[:-1]))
+        return (
+            cls._regex_prefilter.candidate_lines(content, line_starts, string_lines),
+            cls._sensitive_prefilter.candidate_lines(content, line_starts, string_lines),
+        )
+
+    @classmethod
+    def _match_pattern_tables(
+        cls,
+        line: str,
+        line_number: int,
+        regex_candidates: Set[int],
+        sensitive_candidates: Set[int],
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Matches a line against REGEX_PATTERNS, then SENSITIVE_DATA_PATTERNS.
+        Returns:
+                Tuple[str, str] or None: Type and description of the first matching entry
+        """
+        if line_number in regex_candidates:
+            for pattern, description, category in cls._compiled_regex_patterns:
+                if pattern.search(line):
+                    return category, description
+        if line_number in sensitive_candidates:
+            for pattern, description in cls._compiled_sensitive_patterns:
+                if pattern.search(line):
+                    return "sensitive_data", description
+        return None
+
+    @staticmethod
+    def _create_safe_content(
+        content: str,
+        unsafe_lines: List[int],
+        unsafe_operations: List[Dict[str, Any]],
+    ) -> str:
         """
         Creates a safe version of the content by filtering out unsafe lines.
         Args:
                 content (str): Original content
                 unsafe_lines (List[int]): List of line numbers to remove
+                unsafe_operations (List[Dict[str, Any]]): Operations found on these lines
         Returns:
                 str: Safe content
         """
@@ -885,7 +1184,7 @@ class PythonSecurityChecker(ABC):
         unsafe_set = set(unsafe_lines)
 
         operation_types = {}
-        for op in cls.last_unsafe_operations:
+        for op in unsafe_operations:
             operation_types[op["line"]] = op["type"]
 
         for i, line in enumerate(lines, 1):
@@ -962,3 +1261,19 @@ class PythonSecurityChecker(ABC):
             file.write(safe_content)
 
         return safe_file_path
+
+
+def _init_scan_worker(setup_kwargs: Dict[str, Any]) -> None:
+    # Runs once in every scanning worker process
+    PythonSecurityChecker.setup(**setup_kwargs, cache_size=0)
+
+
+def _scan_in_worker(content: str) -> CheckResult:
+    return PythonSecurityChecker._scan(content)
+
+
+def _result_size(result: CheckResult) -> int:
+    # The safe content dominates, findings hold a copy of their source line
+    return sys.getsizeof(result.safe_content) + sum(
+        sys.getsizeof(value) for operation in result.unsafe_operations for value in operation.values()
+    )
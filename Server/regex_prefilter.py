@@ -0,0 +1,192 @@
+import re
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Set
+
+try:  # Python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+
+class RegexPrefilter:
+    """
+    Finds the lines of a file on which any pattern of a table can match.
+    Every pattern is reduced to literal fragments that any of its matches must
+    contain, the fragments are searched over the whole buffer with `str.find`
+    (a few fast C passes instead of one regex call per line and pattern).
+    Patterns without a usable fragment are combined into one alternation.
+    The result is a superset: candidate lines still have to be verified with
+    the original patterns, lines outside it cannot match any of them.
+    """
+
+    # Shorter fragments ("10.", "re.") would match almost every line
+    MIN_LITERAL_LENGTH = 3
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Args:
+                patterns (Iterable[str]): Regular expressions of the table
+        """
+        literals: Set[str] = set()
+        folded_literals: Set[str] = set()
+        fallback: List[str] = []
+
+        for pattern in patterns:
+            required = self.required_literals(pattern)
+            if required is None:
+                fallback.append(pattern)
+            elif re.compile(pattern).flags & re.IGNORECASE or re.search(
+                r"\(\?[aiLmsux-]*i", pattern
+            ):
+                folded_literals.update(literal.lower() for literal in required)
+            else:
+                literals.update(required)
+
+        self.literals = self._drop_redundant(literals)
+        self.folded_literals = [
+            re.compile(re.escape(literal), re.IGNORECASE)
+            for literal in self._drop_redundant(folded_literals)
+        ]
+        self.fallback = self.combine_patterns(fallback) if fallback else None
+
+    def candidate_lines(
+        self, content: str, line_starts: List[int], fallback_lines: Optional[Iterable[int]] = None
+    ) -> Set[int]:
+        """
+        Returns the numbers of lines on which a match may start.
+        Args:
+                content (str): File content
+                line_starts (List[int]): Offset of the first character of every line
+                fallback_lines (Iterable[int]): Lines the patterns without a fragment are
+                        searched on, None searches the whole content
+        Returns:
+                Set[int]: Candidate line numbers (1-based)
+        """
+        candidates: Set[int] = set()
+        line_count = len(line_starts)
+
+        for literal in self.literals:
+            find = content.find
+            position = find(literal)
+            while position != -1:
+                line = bisect_right(line_starts, position)
+                candidates.add(line)
+                if line >= line_count:
+                    break
+                position = find(literal, line_starts[line])
+
+        for pattern in self.folded_literals:
+            self._search_lines(pattern, content, line_starts, candidates)
+
+        if self.fallback is not None and fallback_lines is None:
+            self._search_lines(self.fallback, content, line_starts, candidates)
+        elif self.fallback is not None:
+            search = self.fallback.search
+            for line in fallback_lines:
+                end = line_starts[line] - 1 if line < line_count else len(content)
+                if search(content, line_starts[line - 1], end):
+                    candidates.add(line)
+
+        return candidates
+
+    @staticmethod
+    def _search_lines(pattern, content, line_starts, candidates) -> None:
+        # After a match the search resumes at the start of the next line, so a
+        # match spanning a line break never hides a match on the following line
+        search = pattern.search
+        line_count = len(line_starts)
+        position = 0
+
+        while True:
+            match = search(content, position)
+            if match is None:
+                return
+            line = bisect_right(line_starts, match.start())
+            candidates.add(line)
+            if line >= line_count:
+                return
+            position = line_starts[line]
+
+    @staticmethod
+    def combine_patterns(patterns: Iterable[str]) -> re.Pattern:
+        """
+        Compiles patterns into a single alternation matching wherever any of them matches.
+        Global inline flags such as a leading `(?i)` are turned into scoped groups.
+        Args:
+                patterns (Iterable[str]): Regular expressions
+        Returns:
+                re.Pattern: Combined pattern
+        """
+        alternatives = []
+        for pattern in patterns:
+            flags = re.match(r"\(\?([aiLmsux]+)\)", pattern)
+            if flags:
+                alternatives.append(f"(?{flags.group(1)}:{pattern[flags.end():]})")
+            else:
+                alternatives.append(f"(?:{pattern})")
+        return re.compile("|".join(alternatives))
+
+    @classmethod
+    def required_literals(cls, pattern: str) -> Optional[Set[str]]:
+        """
+        Extracts literal fragments of which at least one occurs in every match of the pattern.
+        Args:
+                pattern (str): Regular expression
+        Returns:
+                Set[str] or None: Fragments, or None if the pattern has no usable fragment
+        """
+        try:
+            parsed = sre_parse.parse(pattern)
+        except (re.error, RecursionError):
+            return None
+        return cls._sequence_literals(list(parsed))
+
+    @classmethod
+    def _sequence_literals(cls, items) -> Optional[Set[str]]:
+        best: Optional[Set[str]] = None
+        run: List[str] = []
+
+        def consider(candidate: Optional[Set[str]]) -> None:
+            nonlocal best
+            if not candidate or min(map(len, candidate)) < cls.MIN_LITERAL_LENGTH:
+                return
+            if best is None or min(map(len, candidate)) > min(map(len, best)):
+                best = candidate
+
+        repeats = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) + (
+            (sre_constants.POSSESSIVE_REPEAT,)
+            if hasattr(sre_constants, "POSSESSIVE_REPEAT")
+            else ()
+        )
+
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                run.append(chr(av))
+                continue
+
+            consider({"".join(run)} if run else None)
+            run = []
+
+            if op is sre_constants.SUBPATTERN:
+                consider(cls._sequence_literals(list(av[-1])))
+            elif op is sre_constants.BRANCH:
+                branches = [cls._sequence_literals(list(branch)) for branch in av[1]]
+                if all(branches):
+                    consider(set().union(*branches))
+            elif op in repeats and av[0] >= 1:
+                consider(cls._sequence_literals(list(av[2])))
+
+        consider({"".join(run)} if run else None)
+        return best
+
+    @staticmethod
+    def _drop_redundant(literals: Set[str]) -> List[str]:
+        # "socket.socket" needs no search of its own when "socket." is searched
+        ordered = sorted(literals, key=len)
+        kept: List[str] = []
+        for literal in ordered:
+            if not any(shorter in literal for shorter in kept):
+                kept.append(literal)
+        return kept
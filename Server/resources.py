@@ -0,0 +1,136 @@
+import json
+import uuid
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from docker.utils import parse_bytes
+
+from Server.config import Config
+
+# Environment variable passing the marker of the usage report to the wrapper
+ACCOUNTING_MARKER_ENV = "CLOUDCODE_USAGE_MARKER"
+
+# Runs the script as a child process and reports its resource usage on stderr
+# once it has exited, after a marker that is unique to the job. The marker is
+# removed from the environment of the script, and the wrapper is made not
+# dumpable so the script cannot read it from /proc/<ppid>/environ either.
+ACCOUNTING_SCRIPT = """
+import ctypes, json, os, resource, subprocess, sys
+marker = os.environ.pop("%s")
+ctypes.CDLL(None).prctl(4, 0, 0, 0, 0)  # PR_SET_DUMPABLE
+code = subprocess.call([sys.executable, "-u"] + sys.argv[1:])
+usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+sys.stderr.write(marker + json.dumps({
+    "cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3),
+    "peak_memory_mb": round(usage.ru_maxrss / 1024, 1),
+}) + "\\n")
+sys.exit(code)
+""" % ACCOUNTING_MARKER_ENV
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Resource quotas of one sandbox container.
+    The defaults come from `Config.SANDBOX_*`, user tiers override single
+    fields through `Config.USER_TIERS`.
+    """
+
+    mem_limit: str = "256m"
+    cpus: float = 1.0
+    pids_limit: int = 64
+    io_weight: int = 0
+
+    @classmethod
+    def default(cls) -> "ResourceLimits":
+        """Returns the limits configured for every job."""
+        return cls(
+            mem_limit=Config.SANDBOX_MEM_LIMIT,
+            cpus=Config.SANDBOX_CPUS,
+            pids_limit=Config.SANDBOX_PIDS_LIMIT,
+            io_weight=Config.SANDBOX_IO_WEIGHT,
+        )
+
+    @classmethod
+    def for_tier(cls, tier: Optional[str]) -> "ResourceLimits":
+        """
+        Returns the limits of a user tier.
+        Args:
+                tier (str): Tier of the user, None or an unknown tier gets the defaults
+        """
+        overrides = Config.USER_TIERS.get(tier, {}) if tier else {}
+        fields = {name: value for name, value in overrides.items() if name in cls.__dataclass_fields__}
+        return replace(cls.default(), **fields)
+
+    def container_options(self) -> Dict[str, Any]:
+        """Returns the keyword arguments of `containers.create` / `containers.run` enforcing the limits."""
+        options: Dict[str, Any] = {}
+        if self.mem_limit:
+            # Same value for memory and memory + swap: the sandbox gets no swap
+            options["mem_limit"] = self.mem_limit
+            options["memswap_limit"] = self.mem_limit
+        if self.cpus:
+            options["nano_cpus"] = int(self.cpus * 1e9)
+        if self.pids_limit:
+            options["pids_limit"] = self.pids_limit
+        if self.io_weight:
+            options["blkio_weight"] = self.io_weight
+        return options
+
+    def host_config(self) -> Dict[str, Any]:
+        """Returns the same limits as `HostConfig` fields of the Engine API."""
+        host_config: Dict[str, Any] = {}
+        if self.mem_limit:
+            host_config["Memory"] = host_config["MemorySwap"] = parse_bytes(self.mem_limit)
+        if self.cpus:
+            host_config["NanoCpus"] = int(self.cpus * 1e9)
+        if self.pids_limit:
+            host_config["PidsLimit"] = self.pids_limit
+        if self.io_weight:
+            host_config["BlkioWeight"] = self.io_weight
+        return host_config
+
+
+def tier_weight(tier: Optional[str]) -> float:
+    """Returns the share of execution slots of a user tier, see `AdmissionController.acquire`."""
+    return float(Config.USER_TIERS.get(tier, {}).get("weight", 1.0)) if tier else 1.0
+
+
+def accounting_command(script_name: str) -> Tuple[List[str], Dict[str, str], str]:
+    """
+    Builds the command running a script under resource accounting.
+    Returns:
+            tuple: Command, its environment and the marker preceding the usage report on stderr
+    """
+    marker = f"__cloudcode_usage_{uuid.uuid4().hex}__"
+    return ["python", "-c", ACCOUNTING_SCRIPT, script_name], {ACCOUNTING_MARKER_ENV: marker}, marker
+
+
+def failed_usage() -> Dict[str, Any]:
+    """Usage of a run whose report is missing or forged, never to be taken as zero usage."""
+    return {"cpu_seconds": None, "peak_memory_mb": None, "accounting_failed": True}
+
+
+def split_usage(stderr: str, marker: Optional[str]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Removes the usage report from the stderr output of a job.
+    The wrapper reports exactly once; a missing report (the job was killed at the
+    time limit, or the script killed the wrapper) or a repeated one fails the
+    accounting of the run, see `failed_usage`.
+    Returns:
+            tuple: stderr without the report and the reported usage, None without accounting
+    """
+    if not marker:
+        return stderr, None
+
+    index = stderr.find(marker)
+    if index < 0 or stderr.find(marker, index + len(marker)) >= 0:
+        return stderr, failed_usage()
+
+    end = stderr.find("\n", index)
+    end = len(stderr) if end < 0 else end
+    try:
+        usage = json.loads(stderr[index + len(marker):end])
+    except ValueError:
+        return stderr, failed_usage()
+    return stderr[:index] + stderr[end + 1:], usage
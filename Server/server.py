@@ -1,25 +1,77 @@
+from Server.admission import AdmissionController, AdmissionRejected
+from Server.batch import read_batch, run_batch
+from Server.connection_pool import PoolTimeout
 from Server.database import Database
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory
 from Server.config import Config
 from Server.executor import CodeExecutor
+from Server.job_queue import JobQueue, JobQueueFull
+from Server.metrics import (
+	ACCOUNTING_FAILURES, DB_AUTH_DURATION, EXECUTIONS, PEAK_MEMORY, REGISTRY,
+	USAGE_CPU_SECONDS, record_timings, stage)
 from Server.python_security_checker import PythonSecurityChecker
+from Server.resources import ResourceLimits, tier_weight
+from Server.usage_recorder import UsageRecorder
 from flask_cors import CORS
+from werkzeug.datastructures import FileStorage
+import io
+import json
+import logging
+import mimetypes
 import os
 import pyodbc
 import secrets
 
+logger = logging.getLogger(__name__)
+
 
 class CodeExecutionServer:
 
 	def __init__(self):
 		self.app = Flask(__name__)
 
-		PythonSecurityChecker.setup(is_docker_environment=True)
+		PythonSecurityChecker.setup(is_docker_environment=True,
+		                            engine=Config.SECURITY_ENGINE,
+		                            cache_size=Config.SECURITY_CACHE_SIZE,
+		                            cache_bytes=Config.SECURITY_CACHE_BYTES,
+		                            scan_workers=Config.SECURITY_SCAN_WORKERS)
+		CodeExecutor.setup()
 
 		self.db = Database(server=Config.DB_SERVER,
 		                   database=Config.DB_NAME,
 		                   user=Config.DB_USER,
-		                   password=Config.DB_PASSWORD)
+		                   password=Config.DB_PASSWORD,
+		                   pool_size=Config.DB_POOL_SIZE,
+		                   pool_timeout=Config.DB_POOL_TIMEOUT,
+		                   health_check_interval=Config.DB_HEALTH_CHECK_INTERVAL,
+		                   api_key_cache_size=Config.API_KEY_CACHE_SIZE,
+		                   api_key_cache_ttl=Config.API_KEY_CACHE_TTL,
+		                   api_key_negative_ttl=Config.API_KEY_NEGATIVE_TTL)
+
+		# Usage is inserted in batches off the request threads
+		self.usage_recorder = UsageRecorder(write=self.db.record_usage,
+		                                    max_pending=Config.USAGE_QUEUE_SIZE,
+		                                    batch_size=Config.USAGE_BATCH_SIZE)
+		self.usage_recorder.start()
+
+		# Limits the executions running at once, requests beyond it wait in a
+		# bounded queue, shared fairly between API keys (or client addresses),
+		# or are rejected with Retry-After
+		self.admission = AdmissionController(
+		    max_concurrent=Config.MAX_CONCURRENT_EXECUTIONS,
+		    max_queued=Config.ADMISSION_QUEUE_SIZE,
+		    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+		    max_concurrent_per_key=Config.MAX_CONCURRENT_PER_KEY,
+		    max_queued_per_key=Config.ADMISSION_QUEUE_PER_KEY)
+
+		self.job_queue = JobQueue(handler=self.run_job,
+		                          workers=Config.JOB_WORKERS,
+		                          max_queued=Config.JOB_QUEUE_SIZE,
+		                          result_ttl=Config.JOB_RESULT_TTL,
+		                          max_results=Config.JOB_MAX_RESULTS)
+		self.job_queue.start()
+
+		self.register_metrics()
 
 		CORS(self.app)
 
@@ -31,8 +83,11 @@ class CodeExecutionServer:
 		@self.app.route("/execute", methods=["POST"])
 		def execute():
 			"""Processes requests for code execution."""
-			result = CodeExecutor.execute_code(request.files.get("file"))
-			return jsonify(result)
+			with record_timings() as timings:
+				result = self.run_execution(request.files.get("file"),
+				                            self.client_key(),
+				                            use_cache=self.use_result_cache())
+			return jsonify(self.with_timings(result, timings))
 
 		@self.app.route("/process-code", methods=["POST", "OPTIONS"])
 		def process_code():
@@ -40,23 +95,169 @@ class CodeExecutionServer:
 			if request.method == "OPTIONS":
 				return {"message": "OK"}, 200
 
-			auth_header = request.headers.get("Authorization")
+			with record_timings() as timings:
+				auth_error = self.authorize()
+				if auth_error is not None:
+					return auth_error
 
-			if not auth_header or not auth_header.startswith("Bearer "):
-				return jsonify({"error": "Missing or malformed API key"}), 401
+				file = request.files.get("codeFile")
 
-			api_key = auth_header.replace("Bearer ", "").strip()
+				if not file:
+					return jsonify({"error": "File not provided"}), 400
 
-			if not self.db.is_api_key_valid(api_key):
-				return jsonify({"error": "Invalid API key"}), 403
+				result = self.run_execution(file,
+				                            self.client_key(authorized=True),
+				                            tier=g.tier,
+				                            use_cache=self.use_result_cache())
+			return jsonify(self.with_timings(result, timings))
+
+		@self.app.route("/execute/stream", methods=["POST"])
+		def execute_stream():
+			"""Executes code, streaming its output as newline-delimited JSON."""
+			return self.admitted_stream(request.files.get("file"),
+			                            self.client_key())
+
+		@self.app.route("/process-code/stream", methods=["POST", "OPTIONS"])
+		def process_code_stream():
+			"""Processes code file from web client, streaming its output."""
+			if request.method == "OPTIONS":
+				return {"message": "OK"}, 200
+
+			auth_error = self.authorize()
+			if auth_error is not None:
+				return auth_error
 
 			file = request.files.get("codeFile")
 
 			if not file:
 				return jsonify({"error": "File not provided"}), 400
 
-			result = CodeExecutor.execute_code(file)
-			return jsonify(result)
+			return self.admitted_stream(file,
+			                            self.client_key(authorized=True),
+			                            tier=g.tier)
+
+		@self.app.route("/execute/batch", methods=["POST"])
+		def execute_batch():
+			"""Executes many scripts, streaming their results as newline-delimited JSON."""
+			return self.batch_response(self.client_key())
+
+		@self.app.route("/process-code/batch", methods=["POST", "OPTIONS"])
+		def process_code_batch():
+			"""Executes many scripts of an authorized user in one request."""
+			if request.method == "OPTIONS":
+				return {"message": "OK"}, 200
+
+			auth_error = self.authorize()
+			if auth_error is not None:
+				return auth_error
+
+			return self.batch_response(self.client_key(authorized=True),
+			                           tier=g.tier)
+
+		@self.app.errorhandler(AdmissionRejected)
+		def admission_rejected(error):
+			"""Answers requests rejected by the admission control."""
+			EXECUTIONS.inc(result="rejected")
+			return jsonify({"error": str(error)}), error.status, {
+			    "Retry-After": str(error.retry_after)
+			}
+
+		@self.app.route("/jobs", methods=["POST"])
+		def submit_job():
+			"""Queues a code file for execution and returns the job id immediately."""
+			file = request.files.get("file") or request.files.get("codeFile")
+
+			if not file or file.filename == "":
+				return jsonify({"error": "File not provided"}), 400
+
+			# The upload stream is closed after the request, keep a bounded copy in memory
+			max_file_size = PythonSecurityChecker.max_file_size
+			data = file.read(max_file_size + 1)
+			if len(data) > max_file_size:
+				return jsonify({
+				    "error":
+				        f"File exceeds maximum allowed size ({max_file_size} bytes)"
+				}), 413
+
+			upload = FileStorage(stream=io.BytesIO(data), filename=file.filename)
+
+			try:
+				job_id = self.job_queue.submit(upload, self.client_key(),
+				                               self.use_result_cache())
+			except JobQueueFull:
+				return jsonify({"error": "Job queue is full, retry later"}), 503, {
+				    "Retry-After": "1"
+				}
+
+			return jsonify({
+			    "job_id": job_id,
+			    "status": JobQueue.QUEUED
+			}), 202, {
+			    "Location": f"/jobs/{job_id}"
+			}
+
+		@self.app.route("/jobs/<job_id>", methods=["GET"])
+		def job_status(job_id):
+			"""Returns the status of a queued job."""
+			status = self.job_queue.status(job_id)
+
+			if status is None:
+				return jsonify({"error": "Job not found"}), 404
+
+			return jsonify(status)
+
+		@self.app.route("/jobs/<job_id>/result", methods=["GET"])
+		def job_result(job_id):
+			"""Returns the execution result of a finished job."""
+			status = self.job_queue.status(job_id)
+
+			if status is None:
+				return jsonify({"error": "Job not found"}), 404
+
+			if status["finished_at"] is None:
+				return jsonify(status), 202
+
+			return jsonify(self.job_queue.result(job_id))
+
+		@self.app.route("/artifacts/<digest>/<path:filename>", methods=["GET"])
+		def download_artifact(digest, filename):
+			"""Sends a created file stored with `ARTIFACT_TRANSPORT = "blob"`."""
+			store = CodeExecutor.artifact_store
+			path = store.path(digest) if store is not None else None
+
+			if path is None:
+				return jsonify({"error": "Artifact not found"}), 404
+
+			store.touch(digest)
+			response = send_file(path,
+			                     mimetype=mimetypes.guess_type(filename)[0] or
+			                     "application/octet-stream",
+			                     download_name=os.path.basename(filename),
+			                     etag=digest)
+			# The URL names the content, it never changes
+			response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+			return response
+
+		@self.app.route("/artifacts/bundles/<digest>.tar.gz", methods=["GET"])
+		def download_bundle(digest):
+			"""Sends all created files of a result as a gzip compressed tar."""
+			store = CodeExecutor.artifact_store
+			chunks = store.bundle(digest) if store is not None else None
+
+			if chunks is None:
+				return jsonify({"error": "Bundle not found"}), 404
+
+			return Response(chunks,
+			                mimetype="application/gzip",
+			                headers={
+			                    "Content-Disposition":
+			                        f"attachment; filename={digest[:12]}.tar.gz"
+			                })
+
+		@self.app.route("/metrics", methods=["GET"])
+		def metrics():
+			"""Exposes the metrics of this process in the Prometheus text format."""
+			return Response(REGISTRY.render(), mimetype=REGISTRY.CONTENT_TYPE)
 
 		@self.app.route("/register", methods=["POST"])
 		def register_user():
@@ -95,6 +296,237 @@ class CodeExecutionServer:
 			    "WebClient")
 			return send_from_directory(webclient_dir, path)
 
+	def authorize(self):
+		"""
+		Validates the Bearer API key of the current request, returns an error response or None.
+		The tier of the user is stored in `g.tier`.
+		"""
+		auth_header = request.headers.get("Authorization")
+
+		if not auth_header or not auth_header.startswith("Bearer "):
+			return jsonify({"error": "Missing or malformed API key"}), 401
+
+		api_key = auth_header.replace("Bearer ", "").strip()
+
+		try:
+			with stage("auth", histogram=DB_AUTH_DURATION):
+				tier = self.db.get_api_key_tier(api_key)
+			if tier is None:
+				return jsonify({"error": "Invalid API key"}), 403
+		except PoolTimeout:
+			return jsonify({"error": "Database is busy, retry later"}), 503, {
+			    "Retry-After": "1"
+			}
+
+		g.tier = tier
+		return None
+
+	def register_metrics(self):
+		"""Registers the metrics read from the queues, pools and caches on every scrape."""
+
+		def containers():
+			pool = CodeExecutor.container_pool
+			stats = pool.stats() if pool is not None else {"idle": 0, "busy": 0}
+			return {
+			    ("idle",): stats["idle"],
+			    ("busy",): stats["busy"],
+			    ("fresh",): CodeExecutor.fresh_containers,
+			}
+
+		def caches():
+			stats = {
+			    "security_check": PythonSecurityChecker.cache_stats(),
+			    "api_key": self.db.api_key_cache.stats(),
+			}
+			if CodeExecutor.result_cache is not None:
+				stats["result"] = CodeExecutor.result_cache.stats()
+			return {name: value for name, value in stats.items() if value}
+
+		REGISTRY.gauge("cloudcode_job_queue_depth",
+		               "Jobs waiting for a job worker", self.job_queue.depth)
+		REGISTRY.gauge("cloudcode_admission_active", "Executions holding a slot",
+		               lambda: self.admission.stats()["active"])
+		REGISTRY.gauge("cloudcode_admission_queued",
+		               "Requests waiting for an execution slot",
+		               lambda: self.admission.stats()["queued"])
+		REGISTRY.gauge("cloudcode_containers",
+		               "Sandbox containers by state (pooled idle/busy, fresh)",
+		               containers, ["state"])
+		REGISTRY.gauge("cloudcode_db_connections",
+		               "Database connections by state", lambda: {
+		                   (state,): value
+		                   for state, value in self.db.pool.stats().items()
+		               }, ["state"])
+		REGISTRY.gauge("cloudcode_cache_entries", "Entries of in-process caches",
+		               lambda: {(name,): stats["size"]
+		                        for name, stats in caches().items()}, ["cache"])
+		REGISTRY.gauge("cloudcode_cache_bytes",
+		               "Memory of cached values, for caches limited by size",
+		               lambda: {(name,): stats["bytes"]
+		                        for name, stats in caches().items()
+		                        if stats["max_bytes"] is not None}, ["cache"])
+		REGISTRY.counter_function("cloudcode_cache_lookups_total",
+		                          "Cache lookups by result (hits, misses)",
+		                          lambda: {(name, result): stats[result]
+		                                   for name, stats in caches().items()
+		                                   for result in ("hits", "misses")},
+		                          ["cache", "result"])
+		REGISTRY.counter_function(
+		    "cloudcode_cache_evictions_total",
+		    "Entries evicted to stay within the cache limits", lambda: {
+		        (name,): stats["evictions"]
+		        for name, stats in caches().items()
+		    }, ["cache"])
+
+	@staticmethod
+	def client_key(authorized=False):
+		"""
+		Identity the execution slots are shared by: the API key on authorized
+		routes, the client address otherwise.
+		"""
+		if authorized:
+			return request.headers["Authorization"].replace("Bearer ", "").strip()
+		return request.remote_addr
+
+	@staticmethod
+	def use_result_cache():
+		"""False if the request asks for a fresh run with "Cache-Control: no-cache"."""
+		directives = request.headers.get("Cache-Control", "").lower().split(",")
+		return "no-cache" not in (directive.strip() for directive in directives)
+
+	def run_job(self, file, key, use_cache=True):
+		"""Executes a queued job, jobs wait for a slot however long the queue is."""
+		with record_timings() as timings:
+			result = self.run_execution(file,
+			                            key,
+			                            use_cache=use_cache,
+			                            timeout=None,
+			                            bounded=False)
+		return self.with_timings(result, timings)
+
+	def run_execution(self, file, key, tier=None, use_cache=True, **admit_options):
+		"""
+		Executes a script within the limits of the user tier, holding an execution slot.
+		Args:
+			file (FileStorage): Uploaded script
+			key (str): API key or client address the slots are shared by
+			tier (str): Tier of the user, None for anonymous requests
+			use_cache (bool): False runs the script even if its result is cached
+			admit_options: Options of `AdmissionController.admit`
+		"""
+		result = CodeExecutor.execute_code(file,
+		                                   slot=self.admission.admit(
+		                                       key=key,
+		                                       weight=tier_weight(tier),
+		                                       **admit_options),
+		                                   use_cache=use_cache,
+		                                   limits=ResourceLimits.for_tier(tier),
+		                                   owner=key)
+		if "usage" in result and not result.get("cached"):
+			self.record_usage(key, tier, result)
+		return result
+
+	def record_usage(self, key, tier, result):
+		"""Records the resource usage of an execution in the metrics and queues it for the database."""
+		usage = result["usage"] or {}
+		label = tier or "anonymous"
+		if usage.get("accounting_failed"):
+			ACCOUNTING_FAILURES.inc(tier=label)
+		if usage.get("cpu_seconds") is not None:
+			USAGE_CPU_SECONDS.inc(usage["cpu_seconds"], tier=label)
+		if usage.get("peak_memory_mb") is not None:
+			PEAK_MEMORY.observe(usage["peak_memory_mb"], tier=label)
+
+		self.usage_recorder.record(key, tier, result["usage"],
+		                           CodeExecutor.TIMEOUT_ERROR in result["error"])
+
+	@staticmethod
+	def with_timings(result, timings):
+		"""Returns a copy of an execution result with the stage durations in milliseconds."""
+		return dict(result,
+		            timings={
+		                name: round(seconds * 1000, 2)
+		                for name, seconds in timings.items()
+		            })
+
+	def admitted_stream(self, file, key, tier=None):
+		"""Streams an execution holding an execution slot until the response is closed."""
+		admitted_at = self.admission.acquire(key=key, weight=tier_weight(tier))
+		try:
+			response = self.stream_response(
+			    CodeExecutor.stream_code(file,
+			                             limits=ResourceLimits.for_tier(tier),
+			                             owner=key))
+		except BaseException:
+			self.admission.release(admitted_at, key=key)
+			raise
+
+		# Also called when the client disconnects before the stream has started
+		response.call_on_close(
+		    lambda: self.admission.release(admitted_at, key=key))
+		return response
+
+	def batch_response(self, key, tier=None):
+		"""
+		Runs the scripts of a batch request (multipart `files` and/or a zip `archive`)
+		concurrently, each in its own execution slot, and streams every result as it finishes.
+		"""
+		try:
+			uploads = read_batch(request.files.getlist("files"),
+			                     request.files.get("archive"),
+			                     max_files=Config.BATCH_MAX_FILES,
+			                     max_file_size=PythonSecurityChecker.max_file_size)
+		except ValueError as e:
+			return jsonify({"error": str(e)}), 400
+
+		use_cache = self.use_result_cache()
+
+		def execute(upload):
+			with record_timings() as timings:
+				try:
+					result = self.run_execution(upload,
+					                            key,
+					                            tier=tier,
+					                            use_cache=use_cache)
+				except AdmissionRejected as error:
+					# Only this script failed, the others of the batch go on
+					EXECUTIONS.inc(result="rejected")
+					return {
+					    "output": "",
+					    "error": str(error),
+					    "files": [],
+					    "status": error.status,
+					    "retry_after": error.retry_after,
+					}
+			return self.with_timings(result, timings)
+
+		return self.stream_response(
+		    run_batch(uploads, execute, max_parallel=Config.BATCH_PARALLELISM))
+
+	@staticmethod
+	def stream_response(events):
+		"""Wraps execution events into a chunked newline-delimited JSON response."""
+
+		def generate():
+			try:
+				for event in events:
+					yield json.dumps(event) + "\n"
+			finally:
+				# Stops the execution when the client disconnects
+				if hasattr(events, "close"):
+					events.close()
+
+		return Response(generate(),
+		                mimetype="application/x-ndjson",
+		                headers={"X-Accel-Buffering": "no"})
+
+	def shutdown(self):
+		"""Releases the container pool, the scanning workers and the database connections."""
+		CodeExecutor.shutdown()
+		PythonSecurityChecker.shutdown_workers()
+		self.usage_recorder.flush()
+		self.db.pool.close()
+
 	def run(self):
-		"""Launches the server in multi-threaded mode."""
+		"""Launches the development server in multi-threaded mode."""
 		self.app.run(host="0.0.0.0", port=Config.PORT, threaded=True)
@@ -0,0 +1,72 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UsageRecorder:
+    """
+    Stores the resource usage of executions from a background thread, so request
+    threads never wait for the database. Records are written in batches of up to
+    `batch_size`; when `max_pending` records are waiting, new ones are dropped.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Dict[str, Any]]], None],
+        max_pending: int = 10000,
+        batch_size: int = 100,
+    ):
+        """
+        Args:
+                write (Callable): Stores a batch of usage records, called from the recorder thread
+                max_pending (int): Maximum number of records waiting to be written
+                batch_size (int): Maximum number of records written at once
+        """
+        self.write = write
+        self.batch_size = max(1, batch_size)
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Starts the recorder thread."""
+        self._thread = threading.Thread(target=self._run, name="usage-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, client_key: str, tier: Optional[str], usage: Optional[Dict[str, Any]], timed_out: bool) -> None:
+        """Queues the usage of one execution, never blocks."""
+        try:
+            self._queue.put_nowait({"client_key": client_key, "tier": tier, "usage": usage, "timed_out": timed_out})
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Usage recorder is behind, dropped the usage of an execution")
+
+    def pending(self) -> int:
+        """Returns the number of records waiting to be written."""
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Blocks until every queued record has been written or dropped."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write(batch)
+            except Exception as e:
+                # Accounting must not take the server down, the batch is lost
+                logger.warning("Could not record the usage of %d executions: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
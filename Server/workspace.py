@@ -0,0 +1,279 @@
+import codecs
+import hashlib
+import io
+import mimetypes
+import os
+import posixpath
+import shutil
+import tarfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+from Server.blob_store import BlobStore
+
+
+@dataclass(frozen=True)
+class ArtifactLimits:
+    """
+    Caps on the created files returned with a result, 0 disables a cap.
+    Files over `max_file_size`, or over what is left of `max_total_size`,
+    are cut and marked with `truncated` and their full `size`, files past
+    `max_files` or the total size are only counted.
+    """
+
+    max_files: int = 100
+    max_file_size: int = 1024 * 1024
+    max_total_size: int = 8 * 1024 * 1024
+
+
+class _ArtifactCollector:
+    """
+    Reads created files one by one, never more than the limits allow.
+    With a blob store the files are copied into it and described by their
+    digest and download URL, otherwise their content is inlined as text.
+    """
+
+    def __init__(self, limits: ArtifactLimits, store: Optional[BlobStore] = None):
+        self.limits = limits
+        self.store = store
+        self.files: List[Dict] = []
+        self.omitted = 0
+        self._remaining = limits.max_total_size or None
+
+    def add(self, name: str, size: int, stream: BinaryIO) -> None:
+        """
+        Args:
+                name (str): File name
+                size (int): Size of the file in bytes
+                stream (BinaryIO): File content, read up to the limits only
+        """
+        if (self.limits.max_files and len(self.files) >= self.limits.max_files) or self._remaining == 0:
+            self.omitted += 1
+            return
+
+        budget = size
+        if self.limits.max_file_size:
+            budget = min(budget, self.limits.max_file_size)
+        if self._remaining is not None:
+            budget = min(budget, self._remaining)
+            self._remaining -= budget
+
+        if self.store is not None:
+            digest, stored = self.store.put(stream, limit=budget)
+            truncated = stored < size
+            entry = {
+                "filename": name,
+                "size": size,
+                "sha256": digest,
+                "mime_type": mimetypes.guess_type(name)[0] or "application/octet-stream",
+                "url": f"/artifacts/{digest}/{quote(name)}",
+            }
+            if truncated:
+                entry["truncated"] = True
+            self.files.append(entry)
+            return
+
+        data = stream.read(budget)
+        truncated = len(data) < size
+        # A cut file may end inside a multi-byte character, which is dropped
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        entry = {"filename": name, "content": decoder.decode(data, final=not truncated)}
+        if truncated:
+            entry.update(truncated=True, size=size)
+        self.files.append(entry)
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, e.g. a Docker archive stream."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b""
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class Workspace:
+    """
+    Files of one job: the script that is run and the files it creates.
+    The executor calls `upload` after creating the sandbox container and
+    `collect` once the script has finished, before the container is released.
+    """
+
+    SCRIPT_NAME = "script.py"
+
+    # Directory of the job inside the sandbox container
+    workdir: str = ""
+    # Volumes the sandbox container needs for this workspace
+    volumes: Dict[str, Dict[str, str]] = {}
+    # Created files left out of `files` by the artifact limits
+    files_omitted: int = 0
+
+    def upload(self, container) -> None:
+        """Copies the script into the container, if it does not see it already."""
+
+    def collect(self, container) -> None:
+        """Fetches the files created by the script out of the container."""
+
+    def digest(self) -> Optional[str]:
+        """Returns the SHA-256 of the script that is run, None if it is unknown."""
+        return None
+
+    def files(self) -> List[Dict[str, str]]:
+        """Returns the files created by the script, without the script itself."""
+        return []
+
+    def cleanup(self) -> None:
+        """Removes everything the workspace left on the host."""
+
+
+class VolumeWorkspace(Workspace):
+    """
+    Folder on the shared upload volume, mounted into the sandbox at the same path.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        volumes: Dict[str, Dict[str, str]],
+        artifact_limits: ArtifactLimits = ArtifactLimits(),
+        artifact_store: Optional[BlobStore] = None,
+    ):
+        """
+        Args:
+                folder (str): Host folder holding the script
+                volumes (dict): Volume mount of the upload volume
+                artifact_limits (ArtifactLimits): Caps on the created files that are read
+                artifact_store (BlobStore): Store receiving the created files, None inlines them
+        """
+        self.workdir = folder
+        self.volumes = volumes
+        self.artifact_limits = artifact_limits
+        self.artifact_store = artifact_store
+
+    def digest(self) -> Optional[str]:
+        with open(os.path.join(self.workdir, self.SCRIPT_NAME), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def files(self) -> List[Dict[str, str]]:
+        collector = _ArtifactCollector(self.artifact_limits, self.artifact_store)
+        for entry in sorted(os.scandir(self.workdir), key=lambda entry: entry.name):
+            if not entry.is_file(follow_symlinks=False) or entry.name == self.SCRIPT_NAME:
+                continue
+            if collector.omitted:
+                # Past the limits, the rest is only counted
+                collector.omitted += 1
+                continue
+            with open(entry.path, "rb") as f:
+                collector.add(entry.name, os.fstat(f.fileno()).st_size, f)
+        self.files_omitted = collector.omitted
+        return collector.files
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class ContainerWorkspace(Workspace):
+    """
+    Folder inside the sandbox container, nothing is written on the host.
+    The script is sent with `put_archive` and the created files are read back
+    with `get_archive`, both as in-memory tar streams.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        script: bytes,
+        artifact_limits: ArtifactLimits = ArtifactLimits(),
+        artifact_store: Optional[BlobStore] = None,
+    ):
+        """
+        Args:
+                root (str): Absolute directory inside the container holding the job folders
+                script (bytes): Content of the script to run
+                artifact_limits (ArtifactLimits): Caps on the created files that are read
+                artifact_store (BlobStore): Store receiving the created files, None inlines them
+        """
+        self.workdir = posixpath.join(root, uuid.uuid4().hex)
+        self.volumes = {}
+        self.script = script
+        self.artifact_limits = artifact_limits
+        self.artifact_store = artifact_store
+        self._files: Optional[List[Dict[str, str]]] = None
+
+    def upload(self, container) -> None:
+        if not container.put_archive("/", self.archive()):
+            raise RuntimeError(f"Could not copy the script into {self.workdir}")
+
+    def digest(self) -> Optional[str]:
+        return hashlib.sha256(self.script).hexdigest()
+
+    def collect(self, container) -> None:
+        chunks, _ = container.get_archive(self.workdir)
+        self.extract_chunks(chunks)
+
+    def extract_chunks(self, chunks: Iterable[bytes]) -> None:
+        """Like `extract`, reading the archive from an iterator of byte chunks while it is downloaded."""
+        self.extract(io.BufferedReader(_ChunkStream(chunks)))
+
+    def extract(self, stream: BinaryIO) -> None:
+        """
+        Reads the created files out of a tar of the job folder.
+        The archive is read front to back without holding it, file content past
+        the artifact limits is skipped.
+        Args:
+                stream (BinaryIO): Archive returned by the container for `workdir`
+        """
+        base = posixpath.basename(self.workdir)
+
+        collector = _ArtifactCollector(self.artifact_limits, self.artifact_store)
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                directory, name = posixpath.split(member.name)
+                # Only files directly in the job folder, like the volume listing
+                if not member.isfile() or directory != base or name == self.SCRIPT_NAME:
+                    continue
+                collector.add(name, member.size, tar.extractfile(member))
+        self._files = collector.files
+        self.files_omitted = collector.omitted
+
+    def files(self) -> List[Dict[str, str]]:
+        return self._files or []
+
+    def archive(self) -> bytes:
+        """Returns a tar of the job folder holding the script, to be extracted at "/"."""
+        # Parent folders are part of the tar, they are created on extraction
+        buffer = io.BytesIO()
+        now = time.time()
+
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            parts = self.workdir.strip("/").split("/")
+            for depth in range(1, len(parts) + 1):
+                folder = tarfile.TarInfo("/".join(parts[:depth]))
+                folder.type = tarfile.DIRTYPE
+                folder.mode = 0o777 if depth == len(parts) else 0o755
+                folder.mtime = now
+                tar.addfile(folder)
+
+            script = tarfile.TarInfo("/".join(parts + [self.SCRIPT_NAME]))
+            script.size = len(self.script)
+            script.mode = 0o644
+            script.mtime = now
+            tar.addfile(script, io.BytesIO(self.script))
+
+        return buffer.getvalue()
@@ -0,0 +1,28 @@
+from Server.config import Config
+from Server.server import CodeExecutionServer
+
+# Server of this worker process, created by `create_app`
+server = None
+
+
+def create_app():
+    """
+    Application factory for production WSGI servers.
+    Called in every worker process after fork, so the container pool, the
+    database connection pool and the security checker belong to the worker.
+    Returns:
+            Flask: WSGI application of the worker
+    """
+    global server
+    if server is None:
+        Config.init()
+        server = CodeExecutionServer()
+    return server.app
+
+
+def shutdown():
+    """Releases the resources of this worker process, called when it exits."""
+    global server
+    if server is not None:
+        server.shutdown()
+        server = None
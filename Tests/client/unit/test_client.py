@@ -1,8 +1,12 @@
 import unittest
+import io
+import json
 import os
 import tempfile
 import time
 import shutil
+from contextlib import redirect_stdout
+from unittest import mock
 from Client.client import CloudComputeClient
 
 class TestCloudComputeClient(unittest.TestCase):
@@ -82,5 +86,85 @@ class TestCloudComputeClient(unittest.TestCase):
 		except FileNotFoundError:
 			pass
 
+	def test_display_timings(self):
+		"""Test that the server timings are printed with the result"""
+		result = {
+			"output": "120\n",
+			"error": "",
+			"files": [],
+			"execution_time_ms": 250.0,
+			"timings": {"security_check": 1.5, "wait": 180.25},
+		}
+		stdout = io.StringIO()
+
+		with redirect_stdout(stdout):
+			self.client.display_result("factorial.py", result)
+
+		self.assertIn("Server timings:", stdout.getvalue())
+		self.assertIn("  wait: 180.25 ms", stdout.getvalue())
+
+	def test_display_truncated_files(self):
+		"""Test that cut and omitted files are marked"""
+		result = {
+			"output": "",
+			"error": "",
+			"files": [{"filename": "big.txt", "content": "x", "truncated": True, "size": 5000000}],
+			"files_omitted": 3,
+			"execution_time_ms": 250.0,
+		}
+		stdout = io.StringIO()
+
+		with redirect_stdout(stdout):
+			self.client.display_result("big.py", result)
+
+		self.assertIn("[truncated, 5000000 bytes in total]", stdout.getvalue())
+		self.assertIn("3 more files not returned", stdout.getvalue())
+
+	def test_display_stored_files(self):
+		"""Test that files stored on the server are shown with their download URL"""
+		result = {
+			"output": "",
+			"error": "",
+			"files": [{"filename": "plot.png", "size": 2048, "mime_type": "image/png",
+			           "sha256": "ab" * 32, "url": f"/artifacts/{'ab' * 32}/plot.png"}],
+			"bundle_url": f"/artifacts/bundles/{'cd' * 32}.tar.gz",
+			"execution_time_ms": 250.0,
+		}
+		stdout = io.StringIO()
+
+		with redirect_stdout(stdout):
+			self.client.display_result("plot.py", result)
+
+		self.assertIn("File: plot.png (2048 bytes, image/png)", stdout.getvalue())
+		self.assertIn(f"http://localhost:5000/artifacts/{'ab' * 32}/plot.png", stdout.getvalue())
+		self.assertIn(f"All files: http://localhost:5000/artifacts/bundles/{'cd' * 32}.tar.gz", stdout.getvalue())
+
+	def test_send_batch(self):
+		"""Test that batch results are returned in file order as they arrive"""
+		lines = [
+			json.dumps({"event": "result", "index": 1, "filename": "b.py", "output": "2\n", "error": "", "files": []}),
+			"",
+			json.dumps({"event": "result", "index": 0, "filename": "a.py", "output": "1\n", "error": "", "files": []}),
+			json.dumps({"event": "done", "count": 2}),
+		]
+		response = mock.MagicMock(status_code=200)
+		response.iter_lines.return_value = lines
+		response.__enter__.return_value = response
+		received = []
+
+		with tempfile.TemporaryDirectory() as folder:
+			paths = []
+			for name in ("a.py", "b.py"):
+				paths.append(os.path.join(folder, name))
+				with open(paths[-1], "w") as f:
+					f.write("print(1)")
+
+			with mock.patch("Client.client.requests.post", return_value=response) as post:
+				results = self.client.send_batch(paths, on_result=received.append)
+
+		self.assertEqual([result["filename"] for result in received], ["b.py", "a.py"])
+		self.assertEqual([result["output"] for result in results], ["1\n", "2\n"])
+		self.assertEqual([name for _, (name, _) in post.call_args.kwargs["files"]], ["a.py", "b.py"])
+
 if __name__ == '__main__':
 	unittest.main() 
\ No newline at end of file
@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+import docker
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.config import Config
+from Server.container_pool import ContainerPool
+
+
+class TestIntegrationContainerPool(unittest.TestCase):
+    """
+    Integration tests for the warm container pool.
+    These tests start real sandbox containers and run commands in them via exec.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup before all class tests"""
+        try:
+            cls.docker_client = docker.from_env()
+            cls.docker_client.ping()
+        except Exception as e:
+            raise unittest.SkipTest(f"Docker is unavailable: {str(e)}")
+
+    def setUp(self):
+        """Setup before each test"""
+        self.pool = ContainerPool(
+            docker_client=self.docker_client,
+            image=Config.CONTAINER_IMAGE,
+            volumes={},
+            min_size=1,
+            max_size=2,
+            max_uses=2,
+        )
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        self.pool.shutdown()
+
+    def test_execute_in_pooled_container(self):
+        """Test running a command in a pooled container"""
+        container = self.pool.acquire()
+        self.assertIsNotNone(container)
+
+        timed_out, stdout, stderr = self.pool.execute(
+            container, "/tmp", ["python", "-c", "print(2 + 3)"], timeout=5
+        )
+        self.pool.release(container)
+
+        self.assertFalse(timed_out)
+        self.assertEqual(stdout.strip(), "5")
+        self.assertEqual(stderr, "")
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_pool_exhaustion(self):
+        """Test that the pool never owns more than max_size containers"""
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(self.pool.acquire())
+
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_timeout_destroys_container(self):
+        """Test that a timed out job does not return its container to the pool"""
+        container = self.pool.acquire()
+
+        timed_out, _, _ = self.pool.execute(
+            container, "/tmp", ["python", "-c", "while True: pass"], timeout=1
+        )
+        self.pool.release(container, healthy=not timed_out)
+
+        self.assertTrue(timed_out)
+        self.assertNotIn(container, self.pool._idle)
+
+
+    def test_reset_kills_leftover_keepalive_lookalike(self):
+        """Test that a process disguised as the keep-alive process does not survive a reset"""
+        container = self.pool.acquire()
+        container.exec_run(["sleep", "infinity"], detach=True)
+
+        self.pool.release(container)
+        count = (
+            "import os; print(sum(open(f'/proc/{pid}/cmdline', 'rb').read() == b'sleep\\0infinity\\0'"
+            " for pid in os.listdir('/proc') if pid.isdigit()))"
+        )
+        _, output = container.exec_run(["python", "-c", count])
+
+        # Only the keep-alive process itself is left
+        self.assertEqual(int(output), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of the PythonSecurityChecker engines.
+Builds a file at the `max_file_size` limit (1 MB by default) from a mix of safe
+and unsafe code and reports the scan throughput of every engine.
+
+Usage: python Tests/server/performance/benchmark_security.py [size_bytes] [repeats]
+"""
+import os
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, root_dir)
+
+from Server.python_security_checker import PythonSecurityChecker
+
+SAFE_BLOCK = '''
+def fibonacci_{i}(n):
+    """Calculates the n-th Fibonacci number."""
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+values_{i} = [math.sqrt(x) for x in range(100)]
+print(f"Fibonacci: {{fibonacci_{i}(20)}}", sum(values_{i}))
+'''
+
+UNSAFE_BLOCK = '''
+def cleanup_{i}():
+    os.system("rm -rf /tmp/test")
+    subprocess.call(["ls", "-la"], shell=True)
+    data_{i} = pickle.loads(b"")
+    result_{i} = eval("2 + 2")
+    url_{i} = "http://169.254.169.254/latest/meta-data"
+    password = "hunter2hunter2hunter2"
+'''
+
+
+def build_content(size: int) -> str:
+    """Builds valid Python source of roughly `size` bytes, every tenth block is unsafe"""
+    parts = ["import math\nimport os\nimport subprocess\nimport pickle\n"]
+    length = len(parts[0])
+    i = 0
+    while length < size:
+        block = (UNSAFE_BLOCK if i % 10 == 0 else SAFE_BLOCK).format(i=i)
+        if length + len(block) > size:
+            break
+        parts.append(block)
+        length += len(block)
+        i += 1
+    return "".join(parts)
+
+
+def benchmark(engine: str, content: str, repeats: int) -> float:
+    """Returns the best scan time in seconds"""
+    PythonSecurityChecker.setup(max_file_size=len(content) + 1, engine=engine)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        PythonSecurityChecker._detect_unsafe_code(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024 * 1024
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    content = build_content(size)
+    size_mb = len(content.encode("utf-8")) / (1024 * 1024)
+    print(f"File size: {size_mb:.2f} MB, {content.count(chr(10)) + 1} lines, best of {repeats}")
+
+    for engine in PythonSecurityChecker.ENGINES:
+        seconds = benchmark(engine, content, repeats)
+        print(f"{engine:>6}: {seconds * 1000:8.1f} ms  {size_mb / seconds:6.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
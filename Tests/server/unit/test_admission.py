@@ -0,0 +1,157 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController(unittest.TestCase):
+    """
+    Tests for the concurrency limit with a bounded wait queue.
+    """
+
+    def test_admits_up_to_limit(self):
+        """Test that free slots are handed out without waiting"""
+        admission = AdmissionController(max_concurrent=2, max_queued=0)
+
+        first = admission.acquire()
+        admission.acquire()
+        self.assertEqual(admission.stats()["active"], 2)
+
+        admission.release(first)
+        self.assertEqual(admission.stats()["active"], 1)
+
+    def test_rejects_when_queue_full(self):
+        """Test that requests beyond the queue are rejected with 429"""
+        admission = AdmissionController(max_concurrent=1, max_queued=0)
+        admission.acquire()
+
+        with self.assertRaises(AdmissionRejected) as context:
+            admission.acquire()
+
+        self.assertEqual(context.exception.status, 429)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        self.assertEqual(admission.stats()["rejected_full"], 1)
+
+    def test_queue_timeout(self):
+        """Test that waiting requests give up with 503"""
+        admission = AdmissionController(max_concurrent=1, max_queued=1, queue_timeout=0.05)
+        admission.acquire()
+
+        with self.assertRaises(AdmissionRejected) as context:
+            admission.acquire()
+
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(admission.stats()["queued"], 0)
+
+    def test_waiters_are_admitted_in_order(self):
+        """Test FIFO hand-over of released slots"""
+        admission = AdmissionController(max_concurrent=1, max_queued=3, queue_timeout=5)
+        held = admission.acquire()
+        order = []
+
+        def wait(number):
+            with admission.admit():
+                order.append(number)
+
+        threads = []
+        for number in range(3):
+            thread = threading.Thread(target=wait, args=(number,))
+            thread.start()
+            threads.append(thread)
+            # Let each thread enter the queue before starting the next one
+            while admission.stats()["queued"] <= number:
+                time.sleep(0.001)
+
+        admission.release(held)
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(order, [0, 1, 2])
+        self.assertEqual(admission.stats()["active"], 0)
+
+    def test_unbounded_waiters(self):
+        """Test that unbounded callers wait even when the queue is full"""
+        admission = AdmissionController(max_concurrent=1, max_queued=0)
+        held = admission.acquire()
+        admitted = threading.Event()
+
+        def wait():
+            with admission.admit(timeout=None, bounded=False):
+                admitted.set()
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        time.sleep(0.05)
+        self.assertFalse(admitted.is_set())
+
+        admission.release(held)
+        thread.join(timeout=5)
+        self.assertTrue(admitted.is_set())
+
+    def queue(self, admission, key, order, count=1):
+        """Starts threads waiting for a slot under `key`, returns once they are queued."""
+        threads = []
+        for _ in range(count):
+            expected = admission.stats()["queued"] + 1
+
+            def wait():
+                with admission.admit(key=key):
+                    order.append(key)
+
+            thread = threading.Thread(target=wait)
+            thread.start()
+            threads.append(thread)
+            while admission.stats()["queued"] < expected:
+                time.sleep(0.001)
+        return threads
+
+    def test_fair_share_between_keys(self):
+        """Test that a light key is not stuck behind the backlog of a heavy key"""
+        admission = AdmissionController(max_concurrent=1, max_queued=10, queue_timeout=5)
+        held = admission.acquire(key="heavy")
+        order = []
+
+        threads = self.queue(admission, "heavy", order, count=4)
+        threads += self.queue(admission, "light", order)
+
+        admission.release(held, key="heavy")
+        for thread in threads:
+            thread.join(timeout=5)
+
+        # The light key is served before the backlog of the heavy key
+        self.assertEqual(order[0], "light")
+        self.assertEqual(len(order), 5)
+
+    def test_per_key_limits(self):
+        """Test the per-key caps on running and queued requests"""
+        admission = AdmissionController(
+            max_concurrent=4, max_queued=10, max_concurrent_per_key=1, max_queued_per_key=1
+        )
+        held = admission.acquire(key="heavy")
+        order = []
+
+        # Free slots are left, but the key is at its running cap
+        threads = self.queue(admission, "heavy", order)
+        with self.assertRaises(AdmissionRejected) as context:
+            admission.acquire(key="heavy")
+        self.assertEqual(context.exception.status, 429)
+
+        # Other keys are not affected
+        other = admission.acquire(key="light")
+        admission.release(other, key="light")
+
+        admission.release(held, key="heavy")
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(order, ["heavy"])
+        self.assertEqual(admission.stats()["keys"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
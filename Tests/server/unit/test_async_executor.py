@@ -0,0 +1,183 @@
+import unittest
+import asyncio
+import io
+import os
+import shutil
+import struct
+import sys
+import tarfile
+import tempfile
+
+from aiohttp import web
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.async_docker_client import AsyncDockerClient
+from Server.async_executor import AsyncCodeExecutor
+from Server.executor import CodeExecutor
+from Server.output_capture import CapturedOutput, FrameDemuxer
+from Server.python_security_checker import PythonSecurityChecker
+
+
+def frame(stream, data):
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+class FakeDaemon:
+    """
+    Docker daemon stand-in on a unix socket. Containers are local directories,
+    starting one "runs" the script by writing its output and a result file.
+    """
+
+    def __init__(self, root, hang=False, result_size=0):
+        self.root = root
+        self.hang = hang
+        self.result_size = result_size
+        self.containers = {}
+        self.killed = []
+        self.exited = asyncio.Event()
+
+        self.app = web.Application()
+        routes = [
+            ("POST", "/v1.41/containers/create", self.create),
+            ("PUT", "/v1.41/containers/{id}/archive", self.put_archive),
+            ("GET", "/v1.41/containers/{id}/archive", self.get_archive),
+            ("POST", "/v1.41/containers/{id}/start", self.start),
+            ("POST", "/v1.41/containers/{id}/wait", self.wait),
+            ("POST", "/v1.41/containers/{id}/kill", self.kill),
+            ("GET", "/v1.41/containers/{id}/logs", self.logs),
+            ("DELETE", "/v1.41/containers/{id}", self.remove),
+        ]
+        for method, path, handler in routes:
+            self.app.router.add_route(method, path, handler)
+
+    def folder(self, request):
+        return os.path.join(self.root, request.match_info["id"])
+
+    async def create(self, request):
+        config = await request.json()
+        container_id = f"c{len(self.containers)}"
+        os.makedirs(os.path.join(self.root, container_id))
+        self.containers[container_id] = config
+        return web.json_response({"Id": container_id}, status=201)
+
+    async def put_archive(self, request):
+        with tarfile.open(fileobj=io.BytesIO(await request.read())) as tar:
+            tar.extractall(self.folder(request))
+        return web.Response()
+
+    async def get_archive(self, request):
+        path = request.query["path"]
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            tar.add(os.path.join(self.folder(request), path.lstrip("/")), arcname=os.path.basename(path))
+        return web.Response(body=buffer.getvalue())
+
+    async def start(self, request):
+        workdir = self.containers[request.match_info["id"]]["WorkingDir"]
+        with open(os.path.join(self.folder(request), workdir.lstrip("/"), "out.txt"), "w") as f:
+            f.write("result" + "x" * self.result_size)
+        return web.Response(status=204)
+
+    async def wait(self, request):
+        if self.hang:
+            await self.exited.wait()
+        return web.json_response({"StatusCode": 0})
+
+    async def kill(self, request):
+        self.killed.append(request.match_info["id"])
+        self.exited.set()
+        return web.Response(status=204)
+
+    async def logs(self, request):
+        return web.Response(body=frame(1, b"12") + frame(2, b"warn\n") + frame(1, b"0\n"))
+
+    async def remove(self, request):
+        shutil.rmtree(self.folder(request))
+        del self.containers[request.match_info["id"]]
+        return web.Response(status=204)
+
+
+class TestAsyncCodeExecutor(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests for the asyncio executor against a fake Docker daemon.
+    """
+
+    async def asyncSetUp(self):
+        """Preparation before each test"""
+        PythonSecurityChecker.setup()
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket = os.path.join(self.temp_dir, "docker.sock")
+        self.client = AsyncDockerClient(socket_path=self.socket)
+        self.runner = None
+
+    async def asyncTearDown(self):
+        """Cleanup after each test"""
+        await self.client.close()
+        if self.runner is not None:
+            await self.runner.cleanup()
+        shutil.rmtree(self.temp_dir)
+
+    async def start_daemon(self, **kwargs):
+        daemon = FakeDaemon(os.path.join(self.temp_dir, "containers"), **kwargs)
+        self.runner = web.AppRunner(daemon.app)
+        await self.runner.setup()
+        await web.UnixSite(self.runner, self.socket).start()
+        return daemon
+
+    def executor(self, timeout=10):
+        return AsyncCodeExecutor(self.client, image="python:3.10.6-slim", timeout=timeout, workspace_root="/workspace")
+
+    async def test_execute_code(self):
+        """Test that the script is copied in, run and its container removed"""
+        daemon = await self.start_daemon()
+
+        result = await self.executor().execute_code(b"print(120)\n")
+
+        self.assertEqual(result["output"], "120\n")
+        self.assertEqual(result["error"], "warn\n")
+        self.assertEqual(result["files"], [{"filename": "out.txt", "content": "result"}])
+        self.assertEqual(daemon.containers, {})
+
+    async def test_large_files_are_truncated_while_streaming(self):
+        """Test that a created file over the artifact limit is cut while the archive is read"""
+        await self.start_daemon(result_size=2 * CodeExecutor.artifact_limits().max_file_size)
+
+        result = await self.executor().execute_code(b"print(120)\n")
+
+        [created] = result["files"]
+        self.assertTrue(created["truncated"])
+        self.assertEqual(len(created["content"]), CodeExecutor.artifact_limits().max_file_size)
+        self.assertTrue(created["content"].startswith("result"))
+
+    async def test_timeout_kills_container(self):
+        """Test that a script running too long is killed"""
+        daemon = await self.start_daemon(hang=True)
+
+        result = await self.executor(timeout=0.05).execute_code(b"while True: pass\n")
+
+        self.assertTrue(result["error"].startswith(CodeExecutor.TIMEOUT_ERROR))
+        self.assertEqual(daemon.killed, ["c0"])
+        self.assertEqual(daemon.containers, {})
+
+    async def test_invalid_upload(self):
+        """Test that uploads failing the check do not start a container"""
+        daemon = await self.start_daemon()
+
+        result = await self.executor().execute_code(b"\xff\xfe")
+
+        self.assertIn("Error checking file", result["error"])
+        self.assertEqual(daemon.containers, {})
+
+    def test_demux(self):
+        """Test splitting of the multiplexed log stream"""
+        output = CapturedOutput.create()
+        FrameDemuxer(output).feed(frame(1, b"a") + frame(2, b"b") + frame(1, b"c"))
+
+        self.assertEqual(output.stdout.text(), "ac")
+        self.assertEqual(output.stderr.text(), "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import io
+import os
+import sys
+import threading
+import time
+import zipfile
+
+from werkzeug.datastructures import FileStorage
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.batch import read_batch, run_batch
+
+
+def upload(name, content=b"print(1)\n"):
+    return FileStorage(stream=io.BytesIO(content), filename=name)
+
+
+def archive(names):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as scripts:
+        for name in names:
+            scripts.writestr(name, f"print({name!r})\n")
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename="tasks.zip")
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Tests for reading and running batches of scripts.
+    """
+
+    def test_read_files_and_archive(self):
+        """Test that uploaded files and the scripts of a zip form one batch"""
+        uploads = read_batch(
+            [upload("a.py"), upload("big.py", b"x" * 100)],
+            archive(["tasks/b.py", "tasks/.hidden.py", "tasks/readme.txt", "tasks/"]),
+            max_files=10,
+            max_file_size=10,
+        )
+
+        self.assertEqual([file.filename for file in uploads], ["a.py", "big.py", "tasks/b.py"])
+        # Read up to one byte over the limit, the security check rejects it
+        self.assertEqual(len(uploads[1].read()), 11)
+
+    def test_invalid_batches(self):
+        """Test that empty, too large and broken batches are rejected"""
+        with self.assertRaisesRegex(ValueError, "No files"):
+            read_batch([], None, max_files=10, max_file_size=100)
+        with self.assertRaisesRegex(ValueError, "at most 2"):
+            read_batch([upload("a.py")], archive(["b.py", "c.py"]), max_files=2, max_file_size=100)
+        with self.assertRaisesRegex(ValueError, "zip"):
+            read_batch([], upload("tasks.zip", b"not a zip"), max_files=2, max_file_size=100)
+
+    def test_results_stream_as_they_finish(self):
+        """Test that results arrive in completion order, tagged with their index"""
+        release_first = threading.Event()
+
+        def execute(file):
+            if file.filename == "slow.py":
+                release_first.wait(5)
+            elif file.filename == "broken.py":
+                raise RuntimeError("boom")
+            return {"output": file.filename, "error": "", "files": []}
+
+        events = run_batch([upload("slow.py"), upload("fast.py"), upload("broken.py")], execute, max_parallel=3)
+        first, second = next(events), next(events)
+        release_first.set()
+        rest = list(events)
+
+        self.assertEqual({first["filename"], second["filename"]}, {"fast.py", "broken.py"})
+        self.assertEqual(rest[0]["index"], 0)
+        self.assertEqual(rest[0]["output"], "slow.py")
+        self.assertEqual(rest[-1], {"event": "done", "count": 3})
+        broken = first if first["filename"] == "broken.py" else second
+        self.assertEqual(broken["error"], "Unexpected error: boom\n")
+
+    def test_closing_cancels_pending_scripts(self):
+        """Test that scripts not started when the client disconnects are not run"""
+        started = []
+        release = threading.Event()
+
+        def execute(file):
+            started.append(file.filename)
+            if len(started) > 1:
+                release.wait(5)
+            return {"output": "", "error": "", "files": []}
+
+        events = run_batch([upload(f"{index}.py") for index in range(5)], execute, max_parallel=1)
+        next(events)
+        events.close()
+        release.set()
+        time.sleep(0.1)
+
+        # At most the script picked up before the close runs on
+        self.assertIn(started, (["0.py"], ["0.py", "1.py"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.blob_store import BlobStore
+from Server.workspace import ArtifactLimits, VolumeWorkspace
+
+
+class TestBlobStore(unittest.TestCase):
+    """
+    Tests for the content-addressed store of created files.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = BlobStore(os.path.join(self.temp_dir, "blobs"), ttl=60)
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_put_is_content_addressed(self):
+        """Test that identical content is stored once under its digest"""
+        digest, size = self.store.put(io.BytesIO(b"\x00binary\xff"))
+        again, _ = self.store.put(io.BytesIO(b"\x00binary\xff"))
+        cut, cut_size = self.store.put(io.BytesIO(b"\x00binary\xff"), limit=3)
+
+        self.assertEqual(digest, again)
+        self.assertEqual(size, 8)
+        self.assertEqual(cut_size, 3)
+        with open(self.store.path(digest), "rb") as f:
+            self.assertEqual(f.read(), b"\x00binary\xff")
+        self.assertIsNone(self.store.path("../" + digest[3:]))
+        self.assertIsNone(self.store.path("0" * 64))
+
+    def test_prune(self):
+        """Test that blobs unused for longer than the TTL are removed"""
+        old, _ = self.store.put(io.BytesIO(b"old"))
+        used, _ = self.store.put(io.BytesIO(b"used"))
+        expired = time.time() - 120
+        os.utime(self.store.path(old), (expired, expired))
+        os.utime(self.store.path(used), (expired, expired))
+
+        self.assertTrue(self.store.touch(used))
+        self.assertEqual(self.store.prune(), 1)
+        self.assertIsNone(self.store.path(old))
+        self.assertFalse(self.store.touch(old))
+
+    def test_put_prunes_in_background(self):
+        """Test that storing a blob starts the pruning without waiting for it"""
+        old, _ = self.store.put(io.BytesIO(b"old"))
+        expired = time.time() - 120
+        os.utime(self.store.path(old), (expired, expired))
+        self.store._pruned_at -= 60
+
+        self.store.put(io.BytesIO(b"new"))
+
+        for _ in range(100):
+            if self.store.path(old) is None and not self.store._pruning:
+                break
+            time.sleep(0.01)
+        self.assertIsNone(self.store.path(old))
+        self.assertFalse(self.store._pruning)
+
+    def test_bundle_is_streamed_in_pieces(self):
+        """Test that a large blob is sent in pieces rather than as a whole"""
+        content = os.urandom(5 * BlobStore.BUNDLE_CHUNK_SIZE)
+        digest, _ = self.store.put(io.BytesIO(content))
+        manifest = self.store.put_manifest([{"filename": "large.bin", "sha256": digest}])
+
+        chunks = list(self.store.bundle(manifest))
+
+        self.assertGreater(len(chunks), 4)
+        self.assertLess(max(len(chunk) for chunk in chunks), 2 * BlobStore.BUNDLE_CHUNK_SIZE)
+        with tarfile.open(fileobj=io.BytesIO(b"".join(chunks)), mode="r:gz") as tar:
+            self.assertEqual(tar.extractfile("large.bin").read(), content)
+
+    def test_bundle(self):
+        """Test the gzip tar of the files of a result"""
+        folder = os.path.join(self.temp_dir, "job")
+        os.makedirs(folder)
+        for name, content in (("script.py", b""), ("plot.png", b"\x89PNG\x00"), ("out.txt", b"x" * 20)):
+            with open(os.path.join(folder, name), "wb") as f:
+                f.write(content)
+
+        workspace = VolumeWorkspace(
+            folder, volumes={}, artifact_limits=ArtifactLimits(max_file_size=10), artifact_store=self.store
+        )
+        files = workspace.files()
+
+        self.assertEqual([file["filename"] for file in files], ["out.txt", "plot.png"])
+        self.assertEqual(files[0]["size"], 20)
+        self.assertTrue(files[0]["truncated"])
+        self.assertEqual(files[1]["mime_type"], "image/png")
+        self.assertEqual(files[1]["url"], f"/artifacts/{files[1]['sha256']}/plot.png")
+        self.assertNotIn("content", files[1])
+
+        data = b"".join(self.store.bundle(self.store.put_manifest(files)))
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+            self.assertEqual(tar.extractfile("plot.png").read(), b"\x89PNG\x00")
+            self.assertEqual(tar.extractfile("out.txt").read(), b"x" * 10)
+        self.assertIsNone(self.store.bundle(files[1]["sha256"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Tests for the LRU cache with expiry used for API keys and check results.
+    """
+
+    def test_get_and_set(self):
+        """Test storing and reading values with hit/miss counters"""
+        cache = TTLCache(max_size=10)
+
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", False)
+        self.assertFalse(cache.get("key", default=True))
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expiry(self):
+        """Test default and per-entry lifetimes"""
+        cache = TTLCache(max_size=10, ttl=60)
+        cache.set("long", 1)
+        cache.set("short", 2, ttl=0.01)
+        time.sleep(0.02)
+
+        self.assertEqual(cache.get("long"), 1)
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(len(cache), 1)
+
+    def test_byte_limit(self):
+        """Test that entries are evicted beyond the byte limit and oversized values are not cached"""
+        cache = TTLCache(max_size=10, max_bytes=10, sizeof=len)
+        cache.set("a", "aaaa")
+        cache.set("b", "bbbb")
+        cache.set("c", "cccc")
+        cache.set("huge", "x" * 11)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "cccc")
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(cache.stats()["bytes"], 8)
+
+        cache.set("c", "cc")
+        cache.invalidate("b")
+        self.assertEqual(cache.stats()["bytes"], 2)
+
+    def test_invalidate(self):
+        """Test explicit invalidation"""
+        cache = TTLCache()
+        cache.set("key", True)
+        cache.invalidate("key")
+        cache.invalidate("missing")
+
+        self.assertIsNone(cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import sys
+import threading
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.connection_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Minimal connection object tracking whether it was closed"""
+
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class Disconnected(Exception):
+    pass
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Tests for the thread-safe database connection pool.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.connections = []
+
+        def connect():
+            conn = FakeConnection()
+            self.connections.append(conn)
+            return conn
+
+        def health_check(conn):
+            if not conn.healthy:
+                raise Disconnected()
+
+        self.pool = ConnectionPool(
+            connect=connect,
+            size=2,
+            timeout=0.1,
+            health_check=health_check,
+            health_check_interval=0,
+            is_disconnect=lambda e: isinstance(e, Disconnected),
+        )
+
+    def test_connections_are_reused(self):
+        """Test that a released connection is handed out again"""
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.connections), 1)
+
+    def test_acquire_timeout(self):
+        """Test that acquiring from an exhausted pool times out"""
+        self.pool.acquire()
+        self.pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+
+    def test_waiting_thread_gets_released_connection(self):
+        """Test that a waiting thread is woken up by a release"""
+        first = self.pool.acquire()
+        self.pool.acquire()
+        acquired = []
+
+        thread = threading.Thread(target=lambda: acquired.append(self.pool.acquire(timeout=2)))
+        thread.start()
+        self.pool.release(first)
+        thread.join()
+
+        self.assertEqual(acquired, [first])
+
+    def test_broken_connection_is_discarded(self):
+        """Test that a disconnect error drops the connection"""
+        with self.assertRaises(Disconnected):
+            with self.pool.connection() as conn:
+                raise Disconnected()
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.stats()["open"], 0)
+
+        with self.pool.connection() as new_conn:
+            self.assertIsNot(new_conn, conn)
+
+    def test_other_errors_keep_connection(self):
+        """Test that regular errors return the connection to the pool"""
+        with self.assertRaises(ValueError):
+            with self.pool.connection() as conn:
+                raise ValueError()
+
+        self.assertFalse(conn.closed)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_unhealthy_idle_connection_is_replaced(self):
+        """Test that an idle connection failing the health check is reopened"""
+        with self.pool.connection() as conn:
+            pass
+        conn.healthy = False
+
+        with self.pool.connection() as new_conn:
+            self.assertIsNot(new_conn, conn)
+
+        self.assertTrue(conn.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import itertools
+import threading
+import os
+import sys
+from unittest import mock
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.container_pool import ContainerPool
+
+
+class TestContainerPoolOwners(unittest.TestCase):
+    """
+    Tests for recycling pooled containers only for the owner of their previous jobs.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        ids = itertools.count()
+
+        def run(**kwargs):
+            container = mock.Mock(id=f"container-{next(ids)}")
+            # Keep-alive lookup and reset both succeed
+            container.exec_run.return_value = (0, b"7\n")
+            return container
+
+        docker_client = mock.Mock()
+        docker_client.containers.run.side_effect = run
+        self.pool = ContainerPool(docker_client=docker_client, image="python", volumes={}, min_size=0, max_size=2)
+
+    def test_container_is_recycled_for_its_owner(self):
+        """Test that the owner gets its previous container back"""
+        container = self.pool.acquire(owner="alice")
+        self.pool.release(container)
+
+        self.assertIs(self.pool.acquire(owner="alice"), container)
+
+    def test_container_is_not_recycled_for_other_owners(self):
+        """Test that another owner gets a new container"""
+        container = self.pool.acquire(owner="alice")
+        self.pool.release(container)
+
+        other = self.pool.acquire(owner="bob")
+
+        self.assertIsNot(other, container)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_full_pool_evicts_idle_container_of_other_owner(self):
+        """Test that a full pool replaces an idle container of another owner"""
+        first = self.pool.acquire(owner="alice")
+        second = self.pool.acquire(owner="alice")
+        self.pool.release(first)
+
+        container = self.pool.acquire(owner="bob")
+
+        self.assertNotIn(container, (first, second))
+        first.remove.assert_called_once_with(force=True)
+        self.assertEqual(self.pool.stats(), {"idle": 0, "busy": 2, "size": 2})
+
+    def test_exhausted_pool(self):
+        """Test that no container is handed out when every container is busy"""
+        self.pool.acquire(owner="alice")
+        self.pool.acquire(owner="alice")
+
+        self.assertIsNone(self.pool.acquire(owner="bob"))
+
+
+
+class TestContainerPoolTimeout(unittest.TestCase):
+    """
+    Tests for telling executions killed at the time limit from other kills.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.docker_client = mock.Mock()
+        self.docker_client.api.exec_inspect.return_value = {"ExitCode": 137}
+        self.pool = ContainerPool(docker_client=self.docker_client, image="python", volumes={})
+
+    def test_killed_at_time_limit(self):
+        """Test that a SIGKILL once the limit has passed is a timeout"""
+        self.assertTrue(self.pool.timed_out("exec", elapsed=5.2, timeout=5))
+
+    def test_killed_before_time_limit(self):
+        """Test that a SIGKILL before the limit, e.g. by the OOM killer, is not a timeout"""
+        self.assertFalse(self.pool.timed_out("exec", elapsed=0.4, timeout=5))
+
+    def test_container_is_killed_when_output_stays_open(self):
+        """Test that the host kills the container when the exec stream outlives the limit"""
+        killed = threading.Event()
+        container = mock.Mock(id="container")
+        container.kill.side_effect = killed.set
+
+        def chunks():
+            # A detached child keeps stdout open after `timeout` killed the script
+            yield b"started\n", None
+            killed.wait(5)
+
+        self.docker_client.api.exec_create.return_value = {"Id": "exec"}
+        self.docker_client.api.exec_start.return_value = chunks()
+
+        timed_out, output = self.pool.execute(container, "/tmp", ["python", "script.py"], timeout=0.1)
+
+        self.assertTrue(timed_out)
+        self.assertTrue(killed.is_set())
+        self.assertEqual(output.stdout.text(), "started\n")
+
+    def test_finished_after_time_limit(self):
+        """Test that a script exiting normally is not a timeout, however long it took"""
+        self.docker_client.api.exec_inspect.return_value = {"ExitCode": 0}
+
+        self.assertFalse(self.pool.timed_out("exec", elapsed=5.2, timeout=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+from datetime import timedelta
+from types import SimpleNamespace
+
+from requests.exceptions import ConnectionError
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.docker_client import DockerClientManager
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeManager(DockerClientManager):
+    """Manager handing out fake clients instead of connecting to a daemon."""
+
+    def __init__(self):
+        super().__init__(max_pool_size=4)
+        self.created = []
+
+    def _connect(self):
+        client = FakeClient()
+        self.created.append(client)
+        self.connects += 1
+        return client
+
+
+class TestDockerClientManager(unittest.TestCase):
+    """
+    Tests for the shared Docker client with reconnection and call timings.
+    """
+
+    def test_client_is_shared(self):
+        """Test that the client is created once and reused"""
+        manager = FakeManager()
+
+        self.assertIs(manager.client, manager.client)
+        self.assertEqual(len(manager.created), 1)
+
+    def test_reconnects_after_connection_error(self):
+        """Test that a connection error drops the client"""
+        manager = FakeManager()
+        first = manager.client
+
+        def fail(client):
+            raise ConnectionError("daemon restarted")
+
+        with self.assertRaises(ConnectionError):
+            manager.run(fail)
+
+        self.assertTrue(first.closed)
+        self.assertIsNot(manager.client, first)
+        self.assertEqual(manager.stats()["connection_errors"], 1)
+
+    def test_retry(self):
+        """Test that retried operations run again on the new client"""
+        manager = FakeManager()
+        clients = []
+
+        def operation(client):
+            clients.append(client)
+            if len(clients) == 1:
+                raise ConnectionError("broken pipe")
+            return "ok"
+
+        self.assertEqual(manager.run(operation, retry=True), "ok")
+        self.assertIsNot(clients[0], clients[1])
+
+    def test_call_timings(self):
+        """Test that calls are grouped by endpoint with ids removed"""
+        manager = FakeManager()
+        container_id = "3f2a" * 16
+
+        for status, seconds in ((201, 0.5), (404, 1.5)):
+            manager._record_response(
+                SimpleNamespace(
+                    url=f"http+docker://localhost/v1.45/containers/{container_id}/exec",
+                    request=SimpleNamespace(method="POST"),
+                    elapsed=timedelta(seconds=seconds),
+                    status_code=status,
+                )
+            )
+
+        call = manager.stats()["calls"]["POST /containers/{id}/exec"]
+        self.assertEqual(call["count"], 2)
+        self.assertEqual(call["errors"], 1)
+        self.assertEqual(call["total_time"], 2.0)
+        self.assertEqual(call["max_time"], 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import io
+import os
+import sys
+from unittest import mock
+
+from werkzeug.datastructures import FileStorage
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.cache import TTLCache
+from Server.config import Config
+from Server.executor import CodeExecutor
+from Server.python_security_checker import PythonSecurityChecker
+
+
+class TestExecutorResultCache(unittest.TestCase):
+    """
+    Tests for reusing the results of scripts that were run before.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        PythonSecurityChecker.setup()
+        self.runs = []
+        patches = [
+            mock.patch.object(Config, "WORKSPACE_MODE", "container"),
+            mock.patch.object(CodeExecutor, "result_cache", TTLCache(max_size=8)),
+            mock.patch.object(CodeExecutor, "_run_workspace", side_effect=self.run_workspace),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def run_workspace(self, workspace, limits, owner=None):
+        self.runs.append(workspace.script)
+        error = CodeExecutor.TIMEOUT_ERROR if b"sleep" in workspace.script else ""
+        return {"output": "120\n", "error": error, "files": []}, not error
+
+    def execute(self, code, **kwargs):
+        upload = FileStorage(stream=io.BytesIO(code), filename="script.py")
+        return CodeExecutor.execute_code(upload, **kwargs)
+
+    def test_result_is_reused(self):
+        """Test that a resubmitted script is answered from the cache"""
+        first = self.execute(b"print(120)\n")
+        second = self.execute(b"print(120)\n")
+
+        self.assertNotIn("cached", first)
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["output"], "120\n")
+        self.assertEqual(len(self.runs), 1)
+
+    def test_no_cache_runs_again(self):
+        """Test that the cache can be bypassed per request"""
+        self.execute(b"print(120)\n")
+        result = self.execute(b"print(120)\n", use_cache=False)
+
+        self.assertNotIn("cached", result)
+        self.assertEqual(len(self.runs), 2)
+
+    def test_slot_is_not_taken_for_cached_results(self):
+        """Test that cache hits do not wait for an execution slot"""
+        slot = mock.MagicMock()
+        self.execute(b"print(120)\n", slot=slot)
+        self.execute(b"print(120)\n", slot=slot)
+
+        self.assertEqual(slot.__enter__.call_count, 1)
+
+    def test_timed_out_results_are_not_cached(self):
+        """Test that incomplete runs are executed again"""
+        self.execute(b"import time\ntime.sleep(60)\n")
+        result = self.execute(b"import time\ntime.sleep(60)\n")
+
+        self.assertNotIn("cached", result)
+        self.assertEqual(len(self.runs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.job_queue import JobQueue, JobQueueFull
+
+
+class TestJobQueue(unittest.TestCase):
+    """
+    Tests for the asynchronous job queue.
+    """
+
+    def wait_finished(self, job_queue, job_id, timeout=5):
+        """Helper method polling a job until it has finished"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = job_queue.status(job_id)
+            if status["finished_at"] is not None:
+                return status
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish in time")
+
+    def test_submit_and_fetch_result(self):
+        """Test that a submitted job is executed and its result is kept"""
+        job_queue = JobQueue(handler=lambda x: {"output": str(x * 2)}, workers=2)
+        job_queue.start()
+
+        job_id = job_queue.submit(21)
+        status = self.wait_finished(job_queue, job_id)
+
+        self.assertEqual(status["status"], JobQueue.COMPLETED)
+        self.assertEqual(job_queue.result(job_id), {"output": "42"})
+
+    def test_failed_job(self):
+        """Test that handler exceptions are reported as failed jobs"""
+
+        def handler():
+            raise RuntimeError("boom")
+
+        job_queue = JobQueue(handler=handler, workers=1)
+        job_queue.start()
+
+        job_id = job_queue.submit()
+        status = self.wait_finished(job_queue, job_id)
+
+        self.assertEqual(status["status"], JobQueue.FAILED)
+        self.assertIn("boom", job_queue.result(job_id)["error"])
+
+    def test_unknown_job(self):
+        """Test lookup of a job that does not exist"""
+        job_queue = JobQueue(handler=lambda: {})
+
+        self.assertIsNone(job_queue.status("missing"))
+        self.assertIsNone(job_queue.result("missing"))
+
+    def test_queue_full(self):
+        """Test that submissions are rejected when the queue is at capacity"""
+        release = threading.Event()
+        job_queue = JobQueue(handler=lambda: release.wait(), workers=1, max_queued=1)
+
+        job_queue.submit()
+        with self.assertRaises(JobQueueFull):
+            job_queue.submit()
+
+        job_queue.start()
+        release.set()
+
+    def test_expired_results_are_purged(self):
+        """Test that finished jobs are dropped after the result TTL"""
+        job_queue = JobQueue(handler=lambda: {}, workers=1, result_ttl=0)
+        job_queue.start()
+
+        job_id = job_queue.submit()
+        self.wait_finished(job_queue, job_id)
+        time.sleep(0.01)
+        job_queue.submit()
+
+        self.assertIsNone(job_queue.status(job_id))
+
+
+    def test_oldest_results_are_dropped_beyond_cap(self):
+        """Test that at most max_results finished jobs are kept"""
+        job_queue = JobQueue(handler=lambda x: {"output": str(x)}, workers=1, max_results=2)
+        job_queue.start()
+
+        job_ids = []
+        for i in range(3):
+            job_ids.append(job_queue.submit(i))
+            self.wait_finished(job_queue, job_ids[-1])
+
+        self.assertIsNone(job_queue.status(job_ids[0]))
+        self.assertEqual(job_queue.result(job_ids[1]), {"output": "1"})
+        self.assertEqual(job_queue.result(job_ids[2]), {"output": "2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
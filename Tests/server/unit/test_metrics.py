@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.metrics import STAGE_DURATION, MetricsRegistry, record_timings, stage
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Tests for the metrics in the Prometheus text format.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        """Test counters with labels"""
+        counter = self.registry.counter("runs_total", "Runs", ["result"])
+        counter.inc(result="ok")
+        counter.inc(2, result="timeout")
+
+        output = self.registry.render()
+
+        self.assertIn("# TYPE runs_total counter", output)
+        self.assertIn('runs_total{result="ok"} 1', output)
+        self.assertIn('runs_total{result="timeout"} 2', output)
+        with self.assertRaises(ValueError):
+            counter.inc(stage="wait")
+
+    def test_histogram(self):
+        """Test cumulative buckets, sum and count"""
+        histogram = self.registry.histogram("stage_seconds", "Stages", ["stage"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, stage="wait")
+
+        lines = self.registry.render().splitlines()
+
+        self.assertIn('stage_seconds_bucket{stage="wait",le="0.1"} 1', lines)
+        self.assertIn('stage_seconds_bucket{stage="wait",le="1"} 2', lines)
+        self.assertIn('stage_seconds_bucket{stage="wait",le="+Inf"} 3', lines)
+        self.assertIn('stage_seconds_sum{stage="wait"} 5.55', lines)
+        self.assertIn('stage_seconds_count{stage="wait"} 3', lines)
+
+    def test_histogram_timer(self):
+        """Test that failing blocks are observed as well"""
+        histogram = self.registry.histogram("auth_seconds", "Auth")
+
+        with self.assertRaises(RuntimeError):
+            with histogram.time():
+                raise RuntimeError("database is down")
+
+        self.assertEqual(histogram.count(), 1)
+
+    def test_gauges(self):
+        """Test gauges read on rendering, a failing gauge is skipped"""
+        depth = [3]
+        self.registry.gauge("queue_depth", "Depth", lambda: depth[0])
+        self.registry.gauge("containers", "Containers", lambda: {("idle",): 1, ("busy",): 2}, ["state"])
+        self.registry.gauge("broken", "Broken", lambda: 1 / 0)
+
+        depth[0] = 5
+        output = self.registry.render()
+
+        self.assertIn("queue_depth 5", output)
+        self.assertIn('containers{state="busy"} 2', output)
+        self.assertNotIn("broken", output)
+
+    def test_counter_functions(self):
+        """Test that counters kept elsewhere are rendered with the counter type"""
+        self.registry.counter_function("lookups_total", "Lookups", lambda: {("api_key", "hits"): 4}, ["cache", "result"])
+        output = self.registry.render()
+
+        self.assertIn("# TYPE lookups_total counter", output)
+        self.assertIn('lookups_total{cache="api_key",result="hits"} 4', output)
+
+    def test_record_timings(self):
+        """Test that stages are added to the timings of the request and to the histogram"""
+        observed = STAGE_DURATION.count(stage="test_stage")
+
+        with stage("test_stage"):
+            pass
+        with record_timings() as timings:
+            for _ in range(2):
+                with stage("test_stage"):
+                    pass
+
+        self.assertEqual(list(timings), ["test_stage"])
+        self.assertGreaterEqual(timings["test_stage"], 0)
+        self.assertEqual(STAGE_DURATION.count(stage="test_stage"), observed + 3)
+
+    def test_registration_is_idempotent(self):
+        """Test that registering a metric twice returns the same metric"""
+        first = self.registry.counter("runs_total", "Runs")
+        self.assertIs(self.registry.counter("runs_total", "Runs"), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
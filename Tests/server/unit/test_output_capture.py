@@ -0,0 +1,75 @@
+import unittest
+import os
+import struct
+import sys
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.output_capture import CapturedOutput, FrameDemuxer, OutputCapture, capture_output
+
+
+def frame(stream, data):
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+class TestOutputCapture(unittest.TestCase):
+    """
+    Tests for the bounded head/tail capture of script output.
+    """
+
+    def test_short_output_is_kept(self):
+        """Test that output within the limits is returned unchanged"""
+        capture = OutputCapture(head_bytes=4, tail_bytes=4)
+        for chunk in (b"ab", b"cdef", b"g"):
+            capture.write(chunk)
+
+        self.assertEqual(capture.text(), "abcdefg")
+        self.assertEqual(capture.dropped, 0)
+
+    def test_head_and_tail(self):
+        """Test that the middle of a long output is dropped and counted"""
+        capture = OutputCapture(head_bytes=6, tail_bytes=6)
+        for line in range(1000):
+            capture.write(f"{line:03}\n".encode())
+
+        self.assertEqual(capture.text(), "000\n00\n[... 3988 bytes dropped ...]\n8\n999\n")
+        self.assertEqual(capture.size, 4000)
+
+        unlimited = OutputCapture()
+        unlimited.write(b"x" * 100000)
+        self.assertEqual(unlimited.text(), "x" * 100000)
+
+    def test_split_characters(self):
+        """Test that characters cut by head or tail are dropped instead of garbled"""
+        capture = OutputCapture(head_bytes=3, tail_bytes=3)
+        capture.write("ééééé".encode())
+
+        self.assertEqual(capture.text(), "é\n[... 4 bytes dropped ...]\né")
+
+    def test_demux_frames(self):
+        """Test that frames split across reads reach their stream, in order"""
+        output = CapturedOutput.create(combined=True)
+        demuxer = FrameDemuxer(output)
+        data = frame(1, b"out") + frame(2, b"err") + frame(1, b"put")
+
+        for offset in range(0, len(data), 5):
+            demuxer.feed(data[offset:offset + 5])
+
+        self.assertEqual(output.stdout.text(), "output")
+        self.assertEqual(output.stderr.text(), "err")
+        self.assertEqual(output.combined.text(), "outerrput")
+
+    def test_capture_output(self):
+        """Test capturing of docker-py demultiplexed chunks in one pass"""
+        output = capture_output([(b"a" * 10, None), (None, b"boom"), (b"b" * 10, None)], 2, 2)
+
+        self.assertEqual(output.stdout.dropped, 16)
+        self.assertEqual(output.stderr.text(), "boom")
+        self.assertIsNone(output.combined)
+
+        combined = capture_output([(b"1\n", None), (None, b"2\n"), (b"3\n", None)], combined=True).combined
+        self.assertEqual(combined.text(), "1\n2\n3\n")
+
+if __name__ == "__main__":
+    unittest.main()
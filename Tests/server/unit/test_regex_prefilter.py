@@ -0,0 +1,92 @@
+import unittest
+import os
+import re
+import sys
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.python_security_checker import PythonSecurityChecker
+from Server.regex_prefilter import RegexPrefilter
+
+
+class TestRegexPrefilter(unittest.TestCase):
+    """
+    Tests for the whole-file prefilter selecting candidate lines for the regex scan.
+    """
+
+    @staticmethod
+    def line_starts(content):
+        starts = [0]
+        for line in content.split("\n")[:-1]:
+            starts.append(starts[-1] + len(line) + 1)
+        return starts
+
+    def test_required_literals(self):
+        """Test extraction of fragments every match must contain"""
+        self.assertEqual(RegexPrefilter.required_literals(r"os\.system\s*\("), {"os.system"})
+        self.assertEqual(
+            RegexPrefilter.required_literals(r"(?:system|popen)\s*\("), {"system", "popen"}
+        )
+        # One branch without a fragment makes the whole alternation unusable
+        self.assertIsNone(RegexPrefilter.required_literals(r"(?:ab|\d+)"))
+        self.assertIsNone(RegexPrefilter.required_literals(r"\d+\.\d+"))
+
+    def test_combine_patterns_scopes_inline_flags(self):
+        """Test that a leading (?i) only applies to its own alternative"""
+        combined = RegexPrefilter.combine_patterns([r"(?i)secret", r"TOKEN"])
+        self.assertIsNotNone(combined.search("SECRET"))
+        self.assertIsNone(combined.search("token"))
+
+    def test_candidate_lines(self):
+        """Test that exactly the lines containing a fragment are selected"""
+        prefilter = RegexPrefilter([r"os\.system\(", r"(?i)password\s*=", r"\d{3}-\d{4}"])
+        content = "\n".join(
+            [
+                "import os",
+                "os.system('ls')",
+                "PASSWORD = 'x'",
+                "call 555-1234",
+                "print('ok')",
+            ]
+        )
+        self.assertEqual(prefilter.candidate_lines(content, self.line_starts(content)), {2, 3, 4})
+
+    def test_fallback_lines(self):
+        """Test that patterns without a fragment are only searched on the given lines"""
+        prefilter = RegexPrefilter([r"os\.system\(", r"\d{3}-\d{4}"])
+        content = "\n".join(["x = '555-1234'", "os.system('ls')", "y = 555-1234"])
+
+        self.assertEqual(prefilter.candidate_lines(content, self.line_starts(content), [1]), {1, 2})
+
+    def test_candidates_cover_all_matches(self):
+        """Test that no line matched by a checker pattern is filtered out"""
+        PythonSecurityChecker.setup()
+        content = "\n".join(
+            [
+                "import subprocess as sp",
+                "sp.call('ls', shell=True)",
+                "Eval('1')",
+                "data = open('/etc/passwd').read()",
+                "api_key = 'sk-abcdefghijklmnopqrstuvwxyz'",
+                "url = 'http://169.254.169.254/latest'",
+                "x = 1",
+            ]
+        )
+        starts = self.line_starts(content)
+        tables = (
+            (PythonSecurityChecker._regex_prefilter, PythonSecurityChecker.REGEX_PATTERNS),
+            (
+                PythonSecurityChecker._sensitive_prefilter,
+                PythonSecurityChecker.SENSITIVE_DATA_PATTERNS,
+            ),
+        )
+        for prefilter, patterns in tables:
+            candidates = prefilter.candidate_lines(content, starts)
+            for number, line in enumerate(content.split("\n"), 1):
+                if any(re.search(entry[0], line) for entry in patterns):
+                    self.assertIn(number, candidates)
+
+
+if __name__ == "__main__":
+    unittest.main()
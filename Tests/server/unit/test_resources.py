@@ -0,0 +1,93 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.config import Config
+from Server.resources import ResourceLimits, accounting_command, split_usage, tier_weight
+
+TIERS = {"free": {"weight": 1}, "pro": {"weight": 3, "mem_limit": "1g", "pids_limit": 256}}
+
+
+class TestResourceLimits(unittest.TestCase):
+    """
+    Tests for the sandbox quotas per user tier and the usage accounting.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        patch = mock.patch.object(Config, "USER_TIERS", TIERS)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_tier_overrides(self):
+        """Test that tiers override single limits of the defaults"""
+        default = ResourceLimits.default()
+        pro = ResourceLimits.for_tier("pro")
+
+        self.assertEqual(ResourceLimits.for_tier(None), default)
+        self.assertEqual(ResourceLimits.for_tier("unknown"), default)
+        self.assertEqual(pro.mem_limit, "1g")
+        self.assertEqual(pro.pids_limit, 256)
+        self.assertEqual(pro.cpus, default.cpus)
+        self.assertEqual(tier_weight("pro"), 3.0)
+        self.assertEqual(tier_weight(None), 1.0)
+
+    def test_container_options(self):
+        """Test the Docker arguments enforcing the limits"""
+        limits = ResourceLimits(mem_limit="512m", cpus=1.5, pids_limit=32, io_weight=0)
+
+        self.assertEqual(
+            limits.container_options(),
+            {"mem_limit": "512m", "memswap_limit": "512m", "nano_cpus": 1500000000, "pids_limit": 32},
+        )
+        self.assertEqual(limits.host_config()["Memory"], 512 * 1024 * 1024)
+        self.assertEqual(ResourceLimits(mem_limit="", cpus=0, pids_limit=0).container_options(), {})
+
+    def test_split_usage(self):
+        """Test that the usage report is removed from stderr"""
+        stderr = 'Traceback\n__m__{"cpu_seconds": 0.5, "peak_memory_mb": 12.0}\n'
+
+        rest, usage = split_usage(stderr, "__m__")
+
+        self.assertEqual(rest, "Traceback\n")
+        self.assertEqual(usage, {"cpu_seconds": 0.5, "peak_memory_mb": 12.0})
+        self.assertEqual(split_usage("plain\n", None), ("plain\n", None))
+
+    def test_missing_or_repeated_report_fails_accounting(self):
+        """Test that a run without exactly one valid report is not taken as zero usage"""
+        forged = '__m__{"cpu_seconds": 0}\n__m__{"cpu_seconds": 0.5, "peak_memory_mb": 12.0}\n'
+
+        for stderr in ("killed\n", forged, "__m__not json\n"):
+            rest, usage = split_usage(stderr, "__m__")
+            self.assertEqual(rest, stderr)
+            self.assertTrue(usage["accounting_failed"])
+            self.assertIsNone(usage["cpu_seconds"])
+
+    def test_accounting_command(self):
+        """Test the accounting wrapper around a real script"""
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "script.py"), "w") as f:
+                f.write("import os, sys\nprint(sorted(os.environ).count('CLOUDCODE_USAGE_MARKER'))\nsys.stderr.write('err\\n')\n")
+
+            command, environment, marker = accounting_command("script.py")
+            command[0] = sys.executable
+            process = subprocess.run(
+                command, cwd=folder, capture_output=True, text=True, env=dict(os.environ, **environment)
+            )
+
+        stderr, usage = split_usage(process.stderr, marker)
+        # The script never sees the marker
+        self.assertEqual(process.stdout, "0\n")
+        self.assertEqual(stderr, "err\n")
+        self.assertGreaterEqual(usage["cpu_seconds"], 0)
+        self.assertGreater(usage["peak_memory_mb"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,8 @@ import tempfile
 import shutil
 import sys
 import logging
+import gc
+import threading
 
 logging.disable(logging.CRITICAL)
 
@@ -153,5 +155,284 @@ exec(code)
         print("Unsafe operations test passed successfully")
 
 
+class TestSecurityCheckerAstEngine(unittest.TestCase):
+    """
+    Tests for the syntax tree based engine of PythonSecurityChecker.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        PythonSecurityChecker.setup(engine="ast")
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        PythonSecurityChecker.setup()
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine is rejected"""
+        with self.assertRaises(ValueError):
+            PythonSecurityChecker.setup(engine="unknown")
+
+    def test_detects_same_operation_types(self):
+        """Test that the AST engine reports the records of the regex engine"""
+        code = """import os
+import pickle
+import math
+
+os.system("rm -rf /tmp/test")
+result = eval("2 + 2")
+print(math.sqrt(2))
+"""
+        operations, unsafe_lines = PythonSecurityChecker._detect_unsafe_code(code)
+        types = {op["line"]: op["type"] for op in operations}
+
+        self.assertEqual(
+            types,
+            {2: "dangerous_import", 5: "os_dangerous_call", 6: "dangerous_operation"},
+        )
+        self.assertEqual(sorted(unsafe_lines), [2, 5, 6])
+        self.assertEqual(operations[1]["content"], 'os.system("rm -rf /tmp/test")')
+        self.assertEqual(
+            operations[1]["description"], "Dangerous os module call: os.system"
+        )
+
+    def test_same_records_as_regex_engine(self):
+        """Test that both engines produce identical records, including pattern table findings"""
+        code = """import os
+import pickle
+import requests
+import socket
+
+os.system("rm -rf /tmp/test")
+result = eval("2 + 2")
+data = pickle.loads(payload)
+with open('/etc/passwd') as f:
+    print(f.read())
+response = requests.get(url)
+conn = socket.create_connection(("example.com", 80))
+headers = {"Authorization": "Bearer abcdef123456"}
+password = "hunter2"
+api_key = "A1b2C3d4E5f6G7h8I9j0"
+token = "ghp_abcdefghijklmnop"
+url = "http://localhost:8080/admin"
+sys.exit(1)
+digest = hashlib.md5(b"x").hexdigest()
+scope = globals()
+encoded = base64.b64decode(blob)
+# password = "commented out"
+print(len(data))
+"""
+        ast_operations, ast_lines = PythonSecurityChecker._detect_unsafe_code(code)
+        PythonSecurityChecker.setup(engine="regex")
+        regex_operations, regex_lines = PythonSecurityChecker._detect_unsafe_code(code)
+
+        self.assertEqual(ast_operations, regex_operations)
+        self.assertEqual(sorted(ast_lines), sorted(regex_lines))
+        descriptions = {op["line"]: op["description"] for op in ast_operations}
+        self.assertEqual(descriptions[8], "Pickle serialization/deserialization")
+        self.assertEqual(descriptions[9], "Access to critical system files")
+        self.assertEqual(descriptions[13], "Bearer token exposure")
+
+    def test_collector_is_enabled_after_concurrent_analyses(self):
+        """Test that overlapping analyses on several threads leave the garbage collector enabled"""
+        code = "import os\n" + "x = [i for i in range(10)]\n" * 2000
+        threads = [
+            threading.Thread(target=PythonSecurityChecker._detect_unsafe_code, args=(code,))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(gc.isenabled())
+
+    def test_resolves_import_aliases(self):
+        """Test that calls through import aliases are detected"""
+        code = """import subprocess as sp
+from os import system as run_command
+
+sp.call(["ls", "-la"], shell=True)
+sp.run(["ls"], shell=False)
+run_command("id")
+"""
+        operations, _ = PythonSecurityChecker._detect_unsafe_code(code)
+        types = {op["line"]: op["type"] for op in operations}
+
+        self.assertEqual(
+            types, {4: "subprocess_dangerous_call", 6: "os_dangerous_call"}
+        )
+
+    def test_falls_back_to_regex_on_syntax_error(self):
+        """Test that unparsable code is still checked"""
+        code = """import os
+os.system("id")
+if True print("broken")
+"""
+        operations, _ = PythonSecurityChecker._detect_unsafe_code(code)
+
+        self.assertEqual(operations[0]["type"], "os_dangerous_call")
+
+
+class TestSecurityCheckerResultCache(unittest.TestCase):
+    """
+    Tests for the content-hash cache of PythonSecurityChecker results.
+    """
+
+    CODE = 'import os\nos.system("id")\nprint("ok")\n'
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        PythonSecurityChecker.setup(cache_size=2)
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        shutil.rmtree(self.temp_dir)
+        PythonSecurityChecker.setup()
+
+    def write_script(self, folder, content):
+        path = os.path.join(self.temp_dir, folder)
+        os.makedirs(path)
+        script = os.path.join(path, "script.py")
+        with open(script, "w") as f:
+            f.write(content)
+        return script
+
+    def test_identical_content_is_served_from_cache(self):
+        """Test that a resubmitted file reuses the stored result"""
+        first = PythonSecurityChecker.check_file(self.write_script("a", self.CODE))
+        first_operations = PythonSecurityChecker.get_unsafe_operations()
+        second = PythonSecurityChecker.check_file(self.write_script("b", self.CODE))
+
+        self.assertEqual(PythonSecurityChecker.get_unsafe_operations(), first_operations)
+        with open(first) as f1, open(second) as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        stats = PythonSecurityChecker.cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_ruleset_change_invalidates(self):
+        """Test that results are keyed by the rule-set version"""
+        regex_version = PythonSecurityChecker.ruleset_version
+        PythonSecurityChecker.setup(engine="ast", cache_size=2)
+        self.assertNotEqual(PythonSecurityChecker.ruleset_version, regex_version)
+
+    def test_eviction(self):
+        """Test that the cache stays bounded"""
+        for i in range(3):
+            PythonSecurityChecker.check_file(self.write_script(str(i), f"x = {i}\n"))
+
+        stats = PythonSecurityChecker.cache_stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_large_results_are_not_cached(self):
+        """Test that results above the byte limit are not kept"""
+        PythonSecurityChecker.setup(cache_size=2, cache_bytes=1024)
+        PythonSecurityChecker.check_file(self.write_script("small", self.CODE))
+        PythonSecurityChecker.check_file(self.write_script("large", "x = 1\n" * 1000))
+
+        stats = PythonSecurityChecker.cache_stats()
+        self.assertEqual(stats["size"], 1)
+        self.assertLessEqual(stats["bytes"], 1024)
+
+    def test_disabled(self):
+        """Test that a cache size of 0 disables caching"""
+        PythonSecurityChecker.setup(cache_size=0)
+        PythonSecurityChecker.check_file(self.write_script("a", self.CODE))
+
+        self.assertEqual(PythonSecurityChecker.cache_stats(), {})
+
+
+class TestSecurityCheckerReentrant(unittest.TestCase):
+    """
+    Tests for the reentrant check_content/scan_file API of PythonSecurityChecker.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        PythonSecurityChecker.setup(cache_size=0)
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        shutil.rmtree(self.temp_dir)
+        PythonSecurityChecker.setup()
+
+    def test_check_content(self):
+        """Test that the result carries operations, lines and safe content"""
+        result = PythonSecurityChecker.check_content('import math\nos.system("id")\n')
+
+        self.assertFalse(result.is_safe)
+        self.assertEqual(result.unsafe_lines, (2,))
+        self.assertEqual(result.unsafe_operations[0]["type"], "os_dangerous_call")
+        self.assertIn("# WARNING: Potentially unsafe code removed: os_dangerous_call", result.safe_content)
+        self.assertIsNone(result.safe_file_path)
+        self.assertTrue(PythonSecurityChecker.check_content("print(1)\n").is_safe)
+
+    def test_scan_file(self):
+        """Test that the safe file is written next to the original"""
+        script = os.path.join(self.temp_dir, "script.py")
+        with open(script, "w") as f:
+            f.write('eval("1")\n')
+
+        result = PythonSecurityChecker.scan_file(script)
+
+        self.assertEqual(result.safe_file_path, os.path.join(self.temp_dir, "script_safe.py"))
+        with open(result.safe_file_path) as f:
+            self.assertEqual(f.read(), result.safe_content)
+
+    def test_concurrent_checks_do_not_interfere(self):
+        """Test that results of parallel checks never mix"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        sources = {
+            "os_dangerous_call": 'x = 1\nos.system("id")\n' * 200,
+            "dangerous_operation": 'x = 1\neval("1")\n' * 200,
+            "dangerous_import": "x = 1\nimport pickle\n" * 200,
+        }
+
+        def check(expected):
+            result = PythonSecurityChecker.check_content(sources[expected])
+            types = {op["type"] for op in result.unsafe_operations}
+            markers = {
+                line.rsplit(": ", 1)[-1]
+                for line in result.safe_content.split("\n")
+                if line.startswith("# WARNING")
+            }
+            return expected, types, markers
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            for expected, types, markers in pool.map(check, list(sources) * 10):
+                self.assertEqual(types, {expected})
+                self.assertEqual(markers, {expected})
+
+
+class TestSecurityCheckerScanWorkers(unittest.TestCase):
+    """
+    Tests for scanning in worker processes.
+    """
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        PythonSecurityChecker.setup()
+
+    def test_workers_return_same_result(self):
+        """Test that a worker process produces the in-process result"""
+        code = 'import pickle\nos.system("id")\nprint("ok")\n'
+        PythonSecurityChecker.setup(cache_size=0)
+        expected = PythonSecurityChecker.check_content(code)
+
+        PythonSecurityChecker.setup(cache_size=0, scan_workers=1)
+        self.assertIsNotNone(PythonSecurityChecker._scan_pool)
+        self.assertEqual(PythonSecurityChecker.check_content(code), expected)
+
+        PythonSecurityChecker.shutdown_workers()
+        self.assertIsNone(PythonSecurityChecker._scan_pool)
+        self.assertEqual(PythonSecurityChecker.check_content(code), expected)
+
+
 if __name__ == "__main__":
     unittest.main()
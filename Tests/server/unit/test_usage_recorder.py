@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+import threading
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.usage_recorder import UsageRecorder
+
+
+class TestUsageRecorder(unittest.TestCase):
+    """
+    Tests for the background writer of usage records.
+    """
+
+    def test_records_are_written_in_batches(self):
+        """Test that queued records are written by the recorder thread, several at once"""
+        batches = []
+        recorder = UsageRecorder(write=batches.append, batch_size=10)
+
+        for i in range(5):
+            recorder.record(f"key-{i}", "free", {"cpu_seconds": i}, False)
+        recorder.start()
+        recorder.flush()
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual([record["client_key"] for record in batches[0]], [f"key-{i}" for i in range(5)])
+
+    def test_record_never_blocks_when_full(self):
+        """Test that records beyond the pending limit are dropped"""
+        release = threading.Event()
+        recorder = UsageRecorder(write=lambda batch: release.wait(), max_pending=2)
+
+        for _ in range(3):
+            recorder.record("key", None, None, True)
+
+        self.assertEqual(recorder.dropped, 1)
+        self.assertEqual(recorder.pending(), 2)
+        release.set()
+
+    def test_write_errors_are_survived(self):
+        """Test that a failing batch does not stop the recorder"""
+        written = []
+
+        def write(batch):
+            if not written:
+                written.append(None)
+                raise RuntimeError("database down")
+            written.extend(batch)
+
+        recorder = UsageRecorder(write=write, batch_size=1)
+        recorder.start()
+        recorder.record("lost", None, None, False)
+        recorder.flush()
+        recorder.record("kept", None, None, False)
+        recorder.flush()
+
+        self.assertEqual(written[1]["client_key"], "kept")
+
+
+if __name__ == "__main__":
+    unittest.main()
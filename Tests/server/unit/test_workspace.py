@@ -0,0 +1,151 @@
+import unittest
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, root_dir)
+
+from Server.workspace import ArtifactLimits, ContainerWorkspace, VolumeWorkspace
+
+
+class DirectoryContainer:
+    """Container stand-in whose file system is a local directory."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def put_archive(self, path, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            tar.extractall(os.path.join(self.root, path.lstrip("/")))
+        return True
+
+    def get_archive(self, path):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            tar.add(os.path.join(self.root, path.lstrip("/")), arcname=os.path.basename(path))
+        data = buffer.getvalue()
+        # Streamed in small chunks, like the archive endpoint of the daemon
+        return (data[offset:offset + 1000] for offset in range(0, len(data), 1000)), {}
+
+    def run(self, workdir, files):
+        folder = os.path.join(self.root, workdir.lstrip("/"))
+        for name, content in files.items():
+            path = os.path.join(folder, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+
+
+class TestWorkspaces(unittest.TestCase):
+    """
+    Tests for the volume and in-container job workspaces.
+    """
+
+    def setUp(self):
+        """Preparation before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Cleanup after each test"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_container_workspace_round_trip(self):
+        """Test that the script is uploaded and created files are read back"""
+        container = DirectoryContainer(self.temp_dir)
+        workspace = ContainerWorkspace(root="/workspace", script=b"print('hi')\n")
+
+        workspace.upload(container)
+        script = os.path.join(self.temp_dir, workspace.workdir.lstrip("/"), "script.py")
+        with open(script, "rb") as f:
+            self.assertEqual(f.read(), b"print('hi')\n")
+
+        self.assertEqual(workspace.files(), [])
+        container.run(workspace.workdir, {"out.txt": "result", "nested/skip.txt": "x"})
+        workspace.collect(container)
+
+        self.assertEqual(workspace.files(), [{"filename": "out.txt", "content": "result"}])
+
+    def test_container_workspaces_are_unique(self):
+        """Test that every job gets its own folder"""
+        first = ContainerWorkspace(root="/workspace", script=b"")
+        second = ContainerWorkspace(root="/workspace", script=b"")
+
+        self.assertNotEqual(first.workdir, second.workdir)
+        self.assertTrue(first.workdir.startswith("/workspace/"))
+        self.assertEqual(first.volumes, {})
+
+    def test_digest(self):
+        """Test that workspaces are identified by the script they run"""
+        folder = os.path.join(self.temp_dir, "job")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "script.py"), "wb") as f:
+            f.write(b"print(1)\n")
+
+        volume = VolumeWorkspace(folder, volumes={})
+        container = ContainerWorkspace(root="/workspace", script=b"print(1)\n")
+
+        self.assertEqual(volume.digest(), container.digest())
+        self.assertNotEqual(
+            container.digest(), ContainerWorkspace(root="/workspace", script=b"print(2)\n").digest()
+        )
+
+    def test_volume_workspace(self):
+        """Test listing and cleanup of a host folder"""
+        folder = os.path.join(self.temp_dir, "job")
+        os.makedirs(folder)
+        for name in ("script.py", "out.txt"):
+            with open(os.path.join(folder, name), "w") as f:
+                f.write(name)
+
+        workspace = VolumeWorkspace(folder, volumes={"uploads": {"bind": "/uploads"}})
+
+        self.assertEqual(workspace.files(), [{"filename": "out.txt", "content": "out.txt"}])
+        workspace.cleanup()
+        self.assertFalse(os.path.exists(folder))
+
+    def test_artifact_limits(self):
+        """Test that large files are cut and files past the limits are only counted"""
+        limits = ArtifactLimits(max_files=3, max_file_size=10, max_total_size=25)
+        files = {"a.txt": "x" * 100, "b.txt": "short", "c.txt": "é" * 10, "d.txt": "late", "e.txt": "late"}
+
+        container = DirectoryContainer(self.temp_dir)
+        in_container = ContainerWorkspace(root="/workspace", script=b"", artifact_limits=limits)
+        container.run(in_container.workdir, files)
+        in_container.collect(container)
+
+        folder = os.path.join(self.temp_dir, "job")
+        DirectoryContainer(folder).run("/", files)
+        on_volume = VolumeWorkspace(folder, volumes={}, artifact_limits=limits)
+
+        for workspace in (in_container, on_volume):
+            result = sorted(workspace.files(), key=lambda file: file["filename"])
+            self.assertEqual(
+                result,
+                [
+                    {"filename": "a.txt", "content": "x" * 10, "truncated": True, "size": 100},
+                    {"filename": "b.txt", "content": "short"},
+                    # 10 bytes left in total, the cut character is dropped
+                    {"filename": "c.txt", "content": "é" * 5, "truncated": True, "size": 20},
+                ],
+            )
+            self.assertEqual(workspace.files_omitted, 2)
+
+    def test_binary_artifact(self):
+        """Test that files that are not UTF-8 do not fail the collection"""
+        folder = os.path.join(self.temp_dir, "job")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "data.bin"), "wb") as f:
+            f.write(b"ok\xff")
+
+        workspace = VolumeWorkspace(folder, volumes={})
+
+        self.assertEqual(workspace.files(), [{"filename": "data.bin", "content": "ok\ufffd"}])
+        self.assertEqual(workspace.files_omitted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
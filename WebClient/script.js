@@ -20,7 +20,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let currentFile = null;
     let currentFileUrl = null;
 
-    const backendProcessUrl = 'http://localhost:5000/process-code';
+    const backendStreamUrl = 'http://localhost:5000/process-code/stream';
 
     function showLoading() {
         loadingIndicator.classList.add('visible');
@@ -47,13 +47,38 @@ document.addEventListener('DOMContentLoaded', () => {
         fileInfoContainer.style.display = 'none';
     }
 
-    function displayResult(data) {
+    function createStreamView() {
         resultOutput.innerHTML = '<h3>Console Output:</h3>';
-        resultOutput.innerHTML += `<pre>${data.output}</pre>`;
 
-        if (data.error && data.error.trim()) {
-            resultOutput.innerHTML += '<h3>Errors:</h3>';
-            resultOutput.innerHTML += `<pre style="color: red;">${data.error}</pre>`;
+        const output = document.createElement('pre');
+        resultOutput.appendChild(output);
+
+        const errorsTitle = document.createElement('h3');
+        errorsTitle.textContent = 'Errors:';
+        errorsTitle.style.display = 'none';
+        resultOutput.appendChild(errorsTitle);
+
+        const errors = document.createElement('pre');
+        errors.style.color = 'red';
+        errors.style.display = 'none';
+        resultOutput.appendChild(errors);
+
+        return { output, errorsTitle, errors };
+    }
+
+    function appendError(view, text) {
+        view.errorsTitle.style.display = '';
+        view.errors.style.display = '';
+        view.errors.textContent += text;
+    }
+
+    function handleStreamEvent(view, event) {
+        if (event.event === 'stdout') {
+            view.output.textContent += event.data;
+        } else if (event.event === 'stderr') {
+            appendError(view, event.data);
+        } else if (event.event === 'done' && event.error && event.error.trim()) {
+            appendError(view, event.error);
         }
     }
 
@@ -79,40 +104,54 @@ document.addEventListener('DOMContentLoaded', () => {
         formData.append('codeFile', selectedFile, selectedFile.name);
 
         try {
-            const xhr = new XMLHttpRequest();
-            xhr.open('POST', backendProcessUrl, true);
-            xhr.setRequestHeader('Authorization', 'Bearer ' + apiKey);
+            const response = await fetch(backendStreamUrl, {
+                method: 'POST',
+                headers: { 'Authorization': 'Bearer ' + apiKey },
+                body: formData
+            });
 
-            xhr.onload = function () {
+            if (!response.ok) {
                 hideLoading();
-                if (xhr.status >= 200 && xhr.status < 300) {
-                    try {
-                        const data = JSON.parse(xhr.responseText);
-                        resultOutput.style.color = 'green';
-                        displayResult(data);
-                    } catch (jsonError) {
-                        resultOutput.textContent = 'Помилка: Не вдалося розібрати відповідь сервера як JSON.';
-                        resultOutput.style.color = 'red';
-                    }
-                } else {
-                    let errorMessage = `Помилка ${xhr.status}: ${xhr.statusText}`;
-                    if (xhr.status === 401) { errorMessage = 'Помилка 401: Неправильний або відсутній API ключ. Доступ заборонено.'; }
-                    else if (xhr.status === 403) { errorMessage = 'Помилка 403: API ключ не має дозволу на цю операцію.'; }
-                    else if (xhr.status === 400) { errorMessage = `Помилка 400: Неправильний запит.`; }
-                    else if (xhr.status === 500) { errorMessage = `Помилка 500: Внутрішня помилка сервера.`; }
-
-                    resultOutput.textContent = errorMessage;
-                    resultOutput.style.color = 'red';
-                }
-            };
+                let errorMessage = `Помилка ${response.status}: ${response.statusText}`;
+                if (response.status === 401) { errorMessage = 'Помилка 401: Неправильний або відсутній API ключ. Доступ заборонено.'; }
+                else if (response.status === 403) { errorMessage = 'Помилка 403: API ключ не має дозволу на цю операцію.'; }
+                else if (response.status === 400) { errorMessage = `Помилка 400: Неправильний запит.`; }
+                else if (response.status === 500) { errorMessage = `Помилка 500: Внутрішня помилка сервера.`; }
 
-            xhr.onerror = function () {
-                hideLoading();
-                resultOutput.textContent = `Помилка мережі або виконання запиту.`;
+                resultOutput.textContent = errorMessage;
                 resultOutput.style.color = 'red';
-            };
+                return;
+            }
+
+            hideLoading();
+            resultOutput.style.color = 'green';
+            const view = createStreamView();
+
+            // The server sends one JSON event per line while the script is running
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+
+                for (const line of lines) {
+                    if (line.trim()) {
+                        handleStreamEvent(view, JSON.parse(line));
+                    }
+                }
+            }
 
-            xhr.send(formData);
+            if (buffer.trim()) {
+                handleStreamEvent(view, JSON.parse(buffer));
+            }
 
         } catch (error) {
             hideLoading();
@@ -0,0 +1,21 @@
+# Production server: gunicorn -c gunicorn.conf.py
+# The application is created in every worker after fork (no preload), each
+# worker owns its container pool, database pool, caches and admission limits.
+from Server.config import Config
+
+wsgi_app = "Server.wsgi:create_app()"
+bind = f"0.0.0.0:{Config.PORT}"
+workers = Config.SERVER_WORKERS
+# Threads serve requests waiting for an execution slot and open output streams
+worker_class = "gthread"
+threads = Config.SERVER_THREADS
+preload_app = False
+graceful_timeout = Config.EXECUTION_TIMEOUT + 20
+accesslog = "-"
+
+
+def worker_exit(server, worker):
+    # Removes the pooled sandbox containers of the worker
+    from Server import wsgi
+
+    wsgi.shutdown()
@@ -0,0 +1,7 @@
+from Server.async_server import AsyncCodeExecutionServer
+from Server.config import Config
+
+if __name__ == "__main__":
+    Config.init()  # Initializing the configuration
+    server = AsyncCodeExecutionServer()
+    server.run()
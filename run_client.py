@@ -9,5 +9,8 @@ if __name__ == "__main__":
 	# Sending files in parallel
 	client.send_parallel()
 
-	# Sending infinite task
-	client.send_single_task("Tasks/.infinite_task.py")
+	# Sending all files in one batch request
+	client.send_batch()
+
+	# Sending infinite task, its output is printed while it runs
+	client.send_single_task("Tasks/.infinite_task.py", stream=True)